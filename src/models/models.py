@@ -128,4 +128,36 @@ class PriorityStocks(Base):
     )
 
     def __repr__(self):
-        return f"<PriorityStocks(Ticker='{self.Ticker}', Prix_actuel={self.Prix_actuel}, Date_collecte='{self.Date_collecte}')>"
\ No newline at end of file
+        return f"<PriorityStocks(Ticker='{self.Ticker}', Prix_actuel={self.Prix_actuel}, Date_collecte='{self.Date_collecte}')>"
+
+class ModelPortfolio(Base):
+    """Définition d'un portefeuille modèle (poids cibles par ticker)"""
+    __tablename__ = 'model_portfolios'
+
+    id = Column(Integer, primary_key=True)
+    Nom = Column(String, nullable=False, unique=True)
+    Description = Column(String)
+    Capital_initial = Column(Float, default=1_000_000)
+    Date_creation = Column(DateTime, default=lambda: datetime.utcnow())
+    Date_modification = Column(DateTime, default=lambda: datetime.utcnow(), onupdate=lambda: datetime.utcnow())
+
+    # Positions du portefeuille (supprimées avec lui)
+    positions = relationship("ModelPortfolioPosition", back_populates="portfolio", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<ModelPortfolio(Nom='{self.Nom}', positions={len(self.positions)})>"
+
+class ModelPortfolioPosition(Base):
+    """Poids cible d'un ticker dans un portefeuille modèle"""
+    __tablename__ = 'model_portfolio_positions'
+
+    id = Column(Integer, primary_key=True)
+    portfolio_id = Column(Integer, ForeignKey('model_portfolios.id'), nullable=False)
+    Ticker = Column(String, nullable=False)
+    Poids = Column(Float, nullable=False)
+
+    portfolio = relationship("ModelPortfolio", back_populates="positions")
+
+    __table_args__ = (
+        Index('idx_model_position_portfolio_ticker', 'portfolio_id', 'Ticker', unique=True),
+    )
@@ -0,0 +1,54 @@
+from datetime import datetime
+import logging
+from src.config.database import get_db
+from src.models.models import ModelPortfolio, ModelPortfolioPosition
+
+logger = logging.getLogger(__name__)
+
+def save_model_portfolio(name, weights, initial_value=1_000_000, description=None):
+    """Crée ou remplace un portefeuille modèle ; weights : {ticker: poids} (normalisés à 1)"""
+    weights = {ticker: float(weight) for ticker, weight in dict(weights).items() if weight and weight > 0}
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f"Le portefeuille {name} n'a aucun poids positif")
+
+    with get_db() as db:
+        portfolio = db.query(ModelPortfolio).filter(ModelPortfolio.Nom == name).one_or_none()
+        if portfolio is None:
+            portfolio = ModelPortfolio(Nom=name)
+            db.add(portfolio)
+        portfolio.Description = description
+        portfolio.Capital_initial = float(initial_value)
+        portfolio.Date_modification = datetime.utcnow()
+        # Anciennes positions supprimées avant insertion (index unique portefeuille / ticker)
+        portfolio.positions.clear()
+        db.flush()
+        portfolio.positions = [
+            ModelPortfolioPosition(Ticker=ticker, Poids=weight / total)
+            for ticker, weight in weights.items()
+        ]
+        logger.info(f"Portefeuille modèle {name} enregistré ({len(weights)} positions)")
+
+def load_model_portfolios():
+    """Définitions enregistrées : {nom: {'capital', 'description', 'created', 'weights': {ticker: poids}}}"""
+    with get_db() as db:
+        portfolios = db.query(ModelPortfolio).order_by(ModelPortfolio.Nom).all()
+        return {
+            portfolio.Nom: {
+                'capital': portfolio.Capital_initial,
+                'description': portfolio.Description,
+                'created': portfolio.Date_creation,
+                'weights': {position.Ticker: position.Poids for position in portfolio.positions}
+            }
+            for portfolio in portfolios
+        }
+
+def delete_model_portfolio(name):
+    """Supprime un portefeuille modèle et ses positions"""
+    with get_db() as db:
+        portfolio = db.query(ModelPortfolio).filter(ModelPortfolio.Nom == name).one_or_none()
+        if portfolio is None:
+            return False
+        db.delete(portfolio)
+        logger.info(f"Portefeuille modèle {name} supprimé")
+        return True
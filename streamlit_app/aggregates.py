@@ -0,0 +1,189 @@
+# aggregates.py
+import threading
+from collections import OrderedDict
+import numpy as np
+from filter_index import make_filter_key
+
+# Sommes partielles combinables entre cellules (secteur x pays)
+ADDITIVE_COLUMNS = ['Capitalisation_boursiere', 'Rendement_du_dividende', 'Variation_52_semaines']
+
+class AggregateEngine:
+    """Agrégats du marché précalculés une fois par version de données"""
+
+    def __init__(self, market_data, filter_index, top_k=10, max_cached=512):
+        self.market_data = market_data
+        self.filter_index = filter_index
+        self.top_k = top_k
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._build_partials()
+        self._build_rankings()
+
+        # Médiane globale (non combinable, calculée une seule fois)
+        self.global_median_per = float(np.nanmedian(market_data['PER_historique'].to_numpy(dtype='float64')))
+
+    def _build_partials(self):
+        """Sommes et effectifs par cellule secteur x pays, puis agrégats par secteur et par pays"""
+        df = self.market_data
+        grouped = df.groupby(['Secteur', 'Pays'], observed=True, sort=False)
+
+        partials = grouped[ADDITIVE_COLUMNS].sum()
+        counts = grouped[ADDITIVE_COLUMNS].count().add_suffix('_count')
+        partials = partials.join(counts)
+        partials['nb_companies'] = grouped.size()
+        self.cell_partials = partials
+
+        # Matrice des cellules pour la combinaison vectorisée
+        self._cell_sectors = partials.index.get_level_values('Secteur').astype(str).to_numpy()
+        self._cell_countries = partials.index.get_level_values('Pays').astype(str).to_numpy()
+        self._cell_values = partials.to_numpy(dtype='float64')
+        self._cell_columns = {col: i for i, col in enumerate(partials.columns)}
+
+        self.sector_rollup = self._finalize_rollup(partials.groupby(level='Secteur', observed=True).sum())
+        self.country_rollup = self._finalize_rollup(partials.groupby(level='Pays', observed=True).sum())
+
+    @staticmethod
+    def _finalize_rollup(sums):
+        """Ajoute les moyennes et le poids de chaque groupe aux sommes partielles"""
+        rollup = sums.copy()
+        rollup['avg_yield'] = rollup['Rendement_du_dividende'] / rollup['Rendement_du_dividende_count']
+        rollup['avg_variation'] = rollup['Variation_52_semaines'] / rollup['Variation_52_semaines_count']
+        rollup['weight'] = (rollup['Capitalisation_boursiere'] / rollup['Capitalisation_boursiere'].sum() * 100).round(2)
+        return rollup.sort_values('Capitalisation_boursiere', ascending=False)
+
+    def _build_rankings(self):
+        """Classements top-K utilisés par les points marquants"""
+        df = self.market_data
+        k = self.top_k
+        self.best_performers = df.nlargest(k, 'Variation_52_semaines')[
+            ['Ticker', 'Nom_complet', 'Variation_52_semaines']
+        ]
+        self.worst_performers = df.nsmallest(k, 'Variation_52_semaines')[
+            ['Ticker', 'Nom_complet', 'Variation_52_semaines']
+        ]
+        self.highest_dividends = df.nlargest(k, 'Rendement_du_dividende')[
+            ['Ticker', 'Nom_complet', 'Rendement_du_dividende']
+        ]
+
+    def _cached(self, key, compute):
+        """Mémoïsation LRU partagée entre sessions"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = compute()
+        with self._lock:
+            self._cache[key] = value
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return value
+
+    def highlights(self, n=5):
+        """Points marquants du marché servis depuis les classements précalculés"""
+        n = min(n, self.top_k)
+        return {
+            'best_performers': self.best_performers.head(n),
+            'worst_performers': self.worst_performers.head(n),
+            'highest_dividends': self.highest_dividends.head(n),
+            'sector_allocation': self.sector_rollup['weight'].sort_index().rename(None)
+        }
+
+    def market_metrics(self, sectors=None, countries=None, cap_range=None):
+        """Métriques du marché pour une combinaison de filtres"""
+        key = make_filter_key(sectors, countries, cap_range)
+        return self._cached(('metrics', key), lambda: self._compute_metrics(key))
+
+    def _compute_metrics(self, key):
+        sectors, countries, cap_range = key
+        cap_is_full = (
+            cap_range is None or
+            len(self.filter_index.cap_positions(*cap_range)) == self.filter_index.size
+        )
+
+        if cap_is_full:
+            # Combinaison des sommes partielles des cellules retenues
+            selected = np.ones(len(self._cell_values), dtype=bool)
+            if sectors:
+                selected &= np.isin(self._cell_sectors, list(sectors))
+            if countries:
+                selected &= np.isin(self._cell_countries, list(countries))
+            totals = self._cell_values[selected].sum(axis=0)
+            col = self._cell_columns
+            metrics = {
+                'nb_companies': int(totals[col['nb_companies']]),
+                'total_market_cap': totals[col['Capitalisation_boursiere']],
+                'avg_yield': _safe_ratio(totals[col['Rendement_du_dividende']],
+                                         totals[col['Rendement_du_dividende_count']]),
+                'avg_variation': _safe_ratio(totals[col['Variation_52_semaines']],
+                                             totals[col['Variation_52_semaines_count']])
+            }
+        else:
+            # Filtre de capitalisation partiel : calcul direct sur les positions sélectionnées
+            positions = self.filter_index.lookup(sectors, countries, cap_range)
+            data = self.market_data.iloc[positions]
+            metrics = {
+                'nb_companies': len(data),
+                'total_market_cap': data['Capitalisation_boursiere'].sum(),
+                'avg_yield': data['Rendement_du_dividende'].mean(),
+                'avg_variation': data['Variation_52_semaines'].mean()
+            }
+
+        metrics['med_per'] = self.median_per(sectors, countries, cap_range)
+        return metrics
+
+    def median_per(self, sectors=None, countries=None, cap_range=None):
+        """Médiane des PER (non combinable) : calcul mis en cache par filtre"""
+        key = make_filter_key(sectors, countries, cap_range)
+        if not key[0] and not key[1] and (
+            key[2] is None or len(self.filter_index.cap_positions(*key[2])) == self.filter_index.size
+        ):
+            return self.global_median_per
+
+        def compute():
+            positions = self.filter_index.lookup(*key)
+            if len(positions) == 0:
+                return np.nan
+            values = self.market_data['PER_historique'].to_numpy(dtype='float64')[positions]
+            return float(np.nanmedian(values))
+
+        return self._cached(('median_per', key), compute)
+
+    def valuation_by_sector(self, per_range, div_range):
+        """Moyennes de valorisation par secteur et profil radar normalisé, par plage de filtres"""
+        key = ('valuation', tuple(per_range), tuple(div_range))
+        return self._cached(key, lambda: self._compute_valuation(per_range, div_range))
+
+    def _compute_valuation(self, per_range, div_range):
+        df = self.market_data
+        per = df['PER_historique']
+        dividend = df['Rendement_du_dividende']
+        mask = (
+            (per > 0) & (per < 100) &
+            (per >= per_range[0]) & (per <= per_range[1]) &
+            (dividend >= div_range[0] / 100) & (dividend <= div_range[1] / 100)
+        )
+        filtered_data = df[mask]
+
+        sector_metrics = filtered_data.groupby('Secteur', observed=True).agg({
+            'PER_historique': 'mean',
+            'Rendement_du_dividende': 'mean',
+            'Ratio_cours_valeur_comptable': 'mean',
+            'Capitalisation_boursiere': 'mean',
+            'Nombre_d_avis_analystes': 'mean'
+        }).round(2)
+
+        # Normalisation min-max pour le graphique radar
+        radar_metrics = sector_metrics.copy()
+        for column in radar_metrics.columns:
+            if column != 'Nombre_d_avis_analystes':
+                max_val = radar_metrics[column].max()
+                min_val = radar_metrics[column].min()
+                radar_metrics[column] = (radar_metrics[column] - min_val) / (max_val - min_val)
+
+        return filtered_data, sector_metrics, radar_metrics
+
+def _safe_ratio(total, count):
+    """Moyenne à partir d'une somme et d'un effectif (NaN si vide)"""
+    return total / count if count else np.nan
@@ -1,10 +1,9 @@
 # app.py
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from market_analyzer import MarketAnalyzer
+from market_analyzer import get_market_analyzer
 from utils import add_news_ticker, render_footer
 
 def configure_page():
@@ -170,8 +169,6 @@ def create_market_summary(market_data):
 
 def main():
     configure_page()
-    from utils import initialize_ticker_data
-    initialize_ticker_data()
     
     # Bandeau d'actualités avec variations en temps réel
     add_news_ticker()
@@ -185,7 +182,7 @@ def main():
     # Séparateur
     st.markdown("---")
     
-    analyzer = MarketAnalyzer()
+    analyzer = get_market_analyzer()
     selected_stocks = load_selected_stocks()
     
     if analyzer.market_data is not None and selected_stocks is not None:
@@ -330,10 +327,9 @@ def main():
                     step=5.0
                 )
                 
-                filtered_data = analyzer.market_data[
-                    (analyzer.market_data['Capitalisation_boursiere'] >= cap_filter[0] * 1e9) &
-                    (analyzer.market_data['Capitalisation_boursiere'] <= cap_filter[1] * 1e9)
-                ]
+                filtered_data = analyzer.get_filtered_data(
+                    cap_range=(cap_filter[0] * 1e9, cap_filter[1] * 1e9)
+                )
                 
                 # Distribution des capitalisations par secteur avec échelle log
                 fig_box = go.Figure()
@@ -354,17 +350,10 @@ def main():
                 )
                 st.plotly_chart(fig_box, use_container_width=True)
                 
-                # Treemap avec échelle de couleur logarithmique
-                fig_treemap = px.treemap(
-                    filtered_data,
-                    path=['Secteur', 'Industrie', 'Nom_complet'],
-                    values='Capitalisation_boursiere',
-                    color='Capitalisation_boursiere',
-                    color_continuous_scale='Viridis',
-                    color_continuous_midpoint=np.median(filtered_data['Capitalisation_boursiere']),
-                    title='Répartition détaillée des capitalisations'
+                # Treemap mise en cache par plage, traîne des petites capitalisations regroupée
+                fig_treemap = analyzer.create_capitalisation_treemap(
+                    (cap_filter[0] * 1e9, cap_filter[1] * 1e9)
                 )
-                fig_treemap.update_layout(height=600)
                 st.plotly_chart(fig_treemap, use_container_width=True)
                 
             elif analysis_type == "Performance":
@@ -434,12 +423,6 @@ def main():
             elif analysis_type == "Valorisation":
                 st.info("ℹ️ Les PER extrêmes (>100) sont exclus pour une meilleure lisibilité")
                 
-                # Filtrage des valeurs extrêmes
-                filtered_data = analyzer.market_data[
-                    (analyzer.market_data['PER_historique'] > 0) &
-                    (analyzer.market_data['PER_historique'] < 100)
-                ]
-                
                 # Contrôles pour les filtres
                 col1, col2 = st.columns(2)
                 with col1:
@@ -459,12 +442,10 @@ def main():
                         step=0.5
                     )
                 
-                filtered_data = filtered_data[
-                    (filtered_data['PER_historique'] >= per_range[0]) &
-                    (filtered_data['PER_historique'] <= per_range[1]) &
-                    (filtered_data['Rendement_du_dividende'] >= div_range[0]/100) &
-                    (filtered_data['Rendement_du_dividende'] <= div_range[1]/100)
-                ]
+                # Données filtrées, moyennes sectorielles et profil radar mis en cache par plage
+                filtered_data, sector_metrics, radar_metrics = analyzer.aggregates.valuation_by_sector(
+                    per_range, div_range
+                )
                 
                 # Graphique de dispersion amélioré
                 fig_scatter = px.scatter(
@@ -494,13 +475,6 @@ def main():
                 
                 # Métriques de valorisation moyennes par secteur
                 st.subheader("Métriques moyennes par secteur")
-                sector_metrics = filtered_data.groupby('Secteur').agg({
-                    'PER_historique': 'mean',
-                    'Rendement_du_dividende': 'mean',
-                    'Ratio_cours_valeur_comptable': 'mean',
-                    'Capitalisation_boursiere': 'mean',
-                    'Nombre_d_avis_analystes': 'mean'
-                }).round(2)
                 
                 # Formater le DataFrame pour l'affichage
                 sector_metrics_display = sector_metrics.copy()
@@ -523,14 +497,6 @@ def main():
                 # Ajouter un graphique radar pour comparer les secteurs
                 st.subheader("Comparaison multifactorielle par secteur")
                 
-                # Normaliser les données pour le graphique radar
-                radar_metrics = sector_metrics.copy()
-                for column in radar_metrics.columns:
-                    if column != 'Nombre_d_avis_analystes':
-                        max_val = radar_metrics[column].max()
-                        min_val = radar_metrics[column].min()
-                        radar_metrics[column] = (radar_metrics[column] - min_val) / (max_val - min_val)
-                
                 fig_radar = go.Figure()
                 
                 for sector in radar_metrics.index:
@@ -0,0 +1,161 @@
+# backtest.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+from risk_engine import TRADING_DAYS, drawdown_stats
+from result_cache import ResultCache
+
+# Calendriers de rééquilibrage : libellé -> période pandas (None : achat-conservation)
+REBALANCING_SCHEDULES = {
+    "Aucun": None,
+    "Mensuel": 'M',
+    "Trimestriel": 'Q'
+}
+
+INITIAL_VALUE = 1_000_000
+
+def equal_weight(date, history):
+    """Poids égaux sur tous les actifs cotés"""
+    return np.ones(history.shape[1])
+
+def static_weights(weights):
+    """Fonction de poids constante (score, sortie de l'optimiseur...)"""
+    weights = np.asarray(weights, dtype='float64')
+    return lambda date, history: weights
+
+# Historique minimal (séances) avant d'estimer des poids ; équipondéré en deçà
+MIN_FIT_HISTORY = 60
+
+def expanding_weights(closes, fit, min_history=MIN_FIT_HISTORY):
+    """Poids réestimés à chaque rééquilibrage sur les seuls cours connus à cette date
+
+    closes : cours (dates × actifs) pouvant précéder le début du backtest ; fit : fonction
+    cours -> poids. Sans historique suffisant ou si l'estimation échoue, les derniers poids
+    estimés (équipondéré au départ) sont conservés.
+    """
+    last = {'weights': np.ones(closes.shape[1])}
+
+    def weight_fn(date, history):
+        known = closes.loc[:date]
+        if len(known) > min_history:
+            try:
+                last['weights'] = np.asarray(fit(known), dtype='float64')
+            except ValueError:
+                pass
+        return last['weights']
+
+    return weight_fn
+
+def rebalancing_positions(index, schedule):
+    """Positions des premières séances de chaque période (la première séance est toujours incluse)"""
+    if schedule is None or len(index) == 0:
+        return np.array([0])
+    periods = index.to_period(schedule)
+    starts = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+    return np.concatenate([[0], starts])
+
+def run_backtest(prices, weight_fn=equal_weight, schedule=None, threshold=None, cost=0.0,
+                 dividends=None, initial_value=INITIAL_VALUE):
+    """Backtest d'une allocation rééquilibrée, segment par segment entre deux rééquilibrages
+
+    prices : cours (dates × actifs) dans une même devise ; dividends : dividendes par action
+    (mêmes dimensions), versés en espèces et réinvestis au rééquilibrage suivant.
+    threshold : écart absolu de poids déclenchant un rééquilibrage anticipé ; cost : coût
+    proportionnel au montant échangé.
+    """
+    filled = prices.ffill()
+    P = filled.to_numpy(dtype='float64')
+    listed = ~np.isnan(P)
+    P0 = np.nan_to_num(P)
+    D = np.zeros_like(P0) if dividends is None else \
+        np.nan_to_num(dividends.reindex(index=prices.index, columns=prices.columns).to_numpy(dtype='float64'))
+    n_days, n_assets = P.shape
+
+    values = np.empty(n_days)
+    cash_path = np.empty(n_days)
+    scheduled = rebalancing_positions(prices.index, schedule)
+    holdings = np.zeros(n_assets)
+    cash = float(initial_value)
+    rebalances, total_costs, total_dividends = [], 0.0, 0.0
+
+    i = 0
+    while i < n_days:
+        # Dividendes détachés le jour du rééquilibrage : dus aux positions détenues la veille
+        if i > 0:
+            detached = float(D[i] @ holdings)
+            cash += detached
+            total_dividends += detached
+
+        # Rééquilibrage : poids cibles sur les actifs cotés, coûts sur le montant échangé
+        value = cash + holdings @ P0[i]
+        target = np.where(listed[i], np.asarray(weight_fn(prices.index[i], filled.iloc[:i + 1]), dtype='float64'), 0.0)
+        target = np.clip(target, 0, None)
+        target = target / target.sum() if target.sum() > 0 else target
+        trade_cost = cost * np.abs(target * value - holdings * P0[i]).sum()
+        value -= trade_cost
+        total_costs += trade_cost
+        with np.errstate(divide='ignore', invalid='ignore'):
+            holdings = np.where(listed[i], target * value / P[i], 0.0)
+        cash = value - holdings @ P0[i]
+        rebalances.append(pd.Series(target, index=prices.columns, name=prices.index[i]))
+
+        # Segment jusqu'au prochain rééquilibrage prévu : positions constantes, calcul matriciel
+        later = scheduled[scheduled > i]
+        end = later[0] if len(later) else n_days
+        segment_dividends = D[i:end] @ holdings
+        segment_dividends[0] = 0.0
+        segment_cash = cash + np.cumsum(segment_dividends)
+        segment_values = P0[i:end] @ holdings + segment_cash
+
+        # Rééquilibrage anticipé à la première séance où un poids s'écarte trop de sa cible
+        if threshold is not None and end - i > 1:
+            weights = P0[i:end] * holdings / segment_values[:, None]
+            drift = np.abs(weights - target).max(axis=1)
+            breaches = np.flatnonzero(drift[1:] > threshold)
+            if len(breaches):
+                end = i + 1 + breaches[0]
+                segment_values = segment_values[:end - i]
+                segment_cash = segment_cash[:end - i]
+                segment_dividends = segment_dividends[:end - i]
+
+        values[i:end] = segment_values
+        cash_path[i:end] = segment_cash
+        total_dividends += segment_dividends.sum()
+        cash = segment_cash[-1]
+        i = end
+
+    values = pd.Series(values, index=prices.index)
+    returns = values.pct_change().dropna()
+    years = max(len(values) / TRADING_DAYS, 1 / TRADING_DAYS)
+    drawdowns = drawdown_stats(values.to_numpy())
+    return {
+        'values': values,
+        'cash': pd.Series(cash_path, index=prices.index),
+        'weights': pd.DataFrame(rebalances),
+        'rebalances': len(rebalances),
+        'costs': total_costs,
+        'dividends': total_dividends,
+        'total_return': float(values.iloc[-1] / initial_value - 1),
+        'cagr': float((values.iloc[-1] / initial_value) ** (1 / years) - 1),
+        'volatility': float(returns.std() * np.sqrt(TRADING_DAYS)),
+        'max_drawdown': drawdowns['max_drawdown']
+    }
+
+class BacktestEngine:
+    """Backtests mis en cache par jeu de paramètres"""
+
+    def __init__(self, max_cached=64):
+        self._results = ResultCache(max_cached)
+
+    def run(self, key, load, weight_fn, schedule=None, threshold=None, cost=0.0):
+        """Résultat en cache par (données et stratégie, paramètres) ; `load` fournit (cours, dividendes)"""
+        def compute():
+            prices, dividends = load()
+            return run_backtest(prices, weight_fn, schedule, threshold, cost, dividends)
+
+        return self._results.get_or_run((key, schedule, threshold, cost), compute)
+
+@st.cache_resource
+def get_backtest_engine():
+    """Cache des backtests partagé par toutes les sessions"""
+    return BacktestEngine()
@@ -0,0 +1,115 @@
+# clustering.py
+import numpy as np
+import pandas as pd
+from scipy.cluster.hierarchy import linkage, leaves_list, fcluster
+from scipy.spatial.distance import squareform
+import streamlit as st
+from result_cache import ResultCache
+
+# Nombre de groupes de corrélation par défaut
+DEFAULT_CLUSTERS = 8
+
+# Méthode d'agrégation hiérarchique (distance moyenne entre groupes)
+LINKAGE_METHOD = 'average'
+
+# Côté maximal de la carte de chaleur envoyée au navigateur (blocs moyennés au-delà)
+MAX_HEATMAP_SIDE = 150
+
+def correlation_matrix(returns):
+    """Corrélations (actifs × actifs) en un produit matriciel sur les rendements centrés réduits"""
+    R = returns.to_numpy(dtype='float64')
+    centered = R - R.mean(axis=0)
+    std = centered.std(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        standardized = centered / std
+    standardized[:, ~(std > 0)] = 0.0
+    corr = standardized.T @ standardized / max(len(R) - 1, 1)
+    np.fill_diagonal(corr, 1.0)
+    return pd.DataFrame(corr, index=returns.columns, columns=returns.columns)
+
+def correlation_distance(corr):
+    """Distance de corrélation sqrt((1 - ρ) / 2), nulle pour des actifs parfaitement corrélés"""
+    return np.sqrt(np.clip(0.5 * (1 - corr), 0.0, 1.0))
+
+def diversification_ratio(weights, volatility, covariance):
+    """Moyenne pondérée des volatilités / volatilité du portefeuille (1 : aucune diversification)"""
+    w = np.asarray(weights, dtype='float64')
+    w = w / w.sum()
+    vol = float(np.sqrt(w @ np.asarray(covariance, dtype='float64') @ w))
+    return float(w @ np.asarray(volatility, dtype='float64')) / vol if vol > 0 else np.nan
+
+def cluster_correlations(correlation, n_clusters=DEFAULT_CLUSTERS, weights=None):
+    """Ordre hiérarchique, groupes et matrice réordonnée d'une matrice de corrélation"""
+    assets = correlation.columns
+    corr = np.nan_to_num(correlation.to_numpy(dtype='float64'), nan=0.0)
+    np.fill_diagonal(corr, 1.0)
+    n = len(assets)
+
+    if n > 2:
+        distances = squareform(correlation_distance(corr), checks=False)
+        tree = linkage(distances, method=LINKAGE_METHOD)
+        order = leaves_list(tree)
+        labels = fcluster(tree, min(n_clusters, n), criterion='maxclust')
+    else:
+        order = np.arange(n)
+        labels = np.ones(n, dtype=int)
+
+    w = np.full(n, 1 / n) if weights is None else np.asarray(weights, dtype='float64') / np.sum(weights)
+    labels = pd.Series(labels, index=assets, name='groupe')
+
+    # Corrélation moyenne à l'intérieur de chaque groupe et poids cumulé
+    summary = []
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels.to_numpy() == label)
+        block = corr[np.ix_(members, members)]
+        size = len(members)
+        intra = (block.sum() - size) / (size * (size - 1)) if size > 1 else np.nan
+        summary.append({
+            'groupe': int(label),
+            'valeurs': size,
+            'poids': float(w[members].sum()),
+            'correlation_moyenne': float(intra),
+            'membres': ', '.join(assets[members][:8]) + (' …' if size > 8 else '')
+        })
+    off_diagonal = (corr.sum() - n) / (n * (n - 1)) if n > 1 else np.nan
+
+    ordered_assets = assets[order]
+    return {
+        'order': ordered_assets,
+        'labels': labels,
+        'ordered': pd.DataFrame(corr[np.ix_(order, order)], index=ordered_assets, columns=ordered_assets),
+        'clusters': pd.DataFrame(summary).sort_values('poids', ascending=False),
+        'average_correlation': float(off_diagonal)
+    }
+
+def block_average(ordered, max_side=MAX_HEATMAP_SIDE):
+    """Réduit une matrice réordonnée en blocs moyennés (libellés : premier actif de chaque bloc)"""
+    n = len(ordered)
+    if n <= max_side:
+        return ordered
+    edges = np.linspace(0, n, max_side + 1).astype(int)[:-1]
+    values = ordered.to_numpy(dtype='float64')
+    sums = np.add.reduceat(np.add.reduceat(values, edges, axis=0), edges, axis=1)
+    sizes = np.diff(np.append(edges, n))
+    labels = [f"{ordered.index[start]} (+{size - 1})" if size > 1 else ordered.index[start]
+              for start, size in zip(edges, sizes)]
+    return pd.DataFrame(sums / np.outer(sizes, sizes), index=labels, columns=labels)
+
+def diversifiers(correlation, holdings, n=20):
+    """Candidats les moins corrélés aux positions : corrélation moyenne et maximale avec elles"""
+    columns = correlation.columns
+    held = columns.isin(holdings)
+    if not held.any() or held.all():
+        return pd.DataFrame(columns=['Ticker', 'correlation_moyenne', 'correlation_max'])
+    block = np.nan_to_num(correlation.to_numpy(dtype='float64')[np.ix_(~held, held)])
+    table = pd.DataFrame({
+        'Ticker': columns[~held],
+        'correlation_moyenne': block.mean(axis=1),
+        'correlation_max': block.max(axis=1)
+    })
+    return table.nsmallest(n, 'correlation_moyenne')
+
+@st.cache_resource
+def get_clustering_cache():
+    """Analyses de corrélation partagées par toutes les sessions, par (matrice et sa version, début, paramètres)"""
+    return ResultCache(max_cached=16)
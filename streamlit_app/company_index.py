@@ -0,0 +1,101 @@
+# company_index.py
+import re
+import unicodedata
+import pandas as pd
+
+# Formes juridiques ignorées par la recherche approchée sur les noms
+LEGAL_SUFFIXES = {
+    'inc', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited', 'plc', 'sa', 'se', 'nv',
+    'ag', 'ab', 'asa', 'spa', 'holding', 'holdings', 'group', 'groupe', 'the'
+}
+
+NAME_COLUMNS = ('Nom_complet', 'Nom complet')
+
+def normalize_name(name):
+    """Nom canonique : sans accents, ponctuation ni forme juridique, en minuscules"""
+    if not isinstance(name, str):
+        return ''
+    text = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    text = text.replace('&', ' and ')
+    words = [w for w in re.split(r'[^a-z0-9]+', text) if w and w not in LEGAL_SUFFIXES]
+    return ' '.join(words)
+
+class CompanyIndex:
+    """Index ticker / nom / nom normalisé construits une fois, recherches en temps constant"""
+
+    def __init__(self, companies=None, data=None):
+        companies = dict(companies or {})
+        data = data if data is not None else pd.DataFrame()
+        self.data = data
+
+        # ticker -> position de la ligne (première occurrence)
+        self.row_by_ticker = {}
+        if 'Ticker' in data.columns:
+            tickers = data['Ticker'].astype(str).str.strip()
+            self.row_by_ticker = dict(zip(tickers.iloc[::-1], range(len(data) - 1, -1, -1)))
+
+        # nom -> ticker et ticker -> nom (dictionnaire des valeurs suivies prioritaire)
+        self.ticker_by_name = {}
+        self.name_by_ticker = {}
+        # nom normalisé -> position de la ligne, pour retrouver une ligne dont le ticker diffère
+        self.row_by_key = {}
+        name_column = next((c for c in NAME_COLUMNS if c in data.columns), None)
+        if name_column is not None:
+            for ticker, position in self.row_by_ticker.items():
+                name = data[name_column].iat[position]
+                if isinstance(name, str):
+                    self.ticker_by_name.setdefault(name.strip(), ticker)
+                    self.name_by_ticker.setdefault(ticker, name.strip())
+                    self.row_by_key.setdefault(normalize_name(name), position)
+        for name, ticker in companies.items():
+            self.ticker_by_name[name] = ticker
+            self.name_by_ticker[ticker] = name
+
+        # nom normalisé -> ticker pour la recherche approchée
+        self.ticker_by_key = {}
+        for name, ticker in self.ticker_by_name.items():
+            key = normalize_name(name)
+            if key:
+                self.ticker_by_key.setdefault(key, ticker)
+
+    def __len__(self):
+        return len(self.name_by_ticker)
+
+    def __contains__(self, ticker):
+        return ticker in self.name_by_ticker or ticker in self.row_by_ticker
+
+    def name(self, ticker):
+        """Nom de l'entreprise d'un ticker"""
+        return self.name_by_ticker.get(ticker)
+
+    def ticker(self, name):
+        """Ticker d'un nom exact, puis d'un nom normalisé"""
+        ticker = self.ticker_by_name.get(name)
+        if ticker is None:
+            ticker = self.ticker_by_key.get(normalize_name(name))
+        return ticker
+
+    def row(self, ticker):
+        """Ligne des données chargées pour un ticker, None si absent"""
+        position = self.row_by_ticker.get(ticker)
+        if position is None:
+            return None
+        return self.data.iloc[position]
+
+    def row_for_name(self, name):
+        """Ligne des données chargées dont le nom normalisé correspond, None si absente"""
+        position = self.row_by_key.get(normalize_name(name))
+        if position is None:
+            return None
+        return self.data.iloc[position]
+
+    def find(self, query):
+        """Résout un ticker ou un nom d'entreprise (exact puis normalisé) en ticker"""
+        if not isinstance(query, str):
+            return None
+        query = query.strip()
+        if query in self:
+            return query
+        if query.upper() in self:
+            return query.upper()
+        return self.ticker(query)
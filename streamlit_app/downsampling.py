@@ -0,0 +1,75 @@
+# downsampling.py
+import numpy as np
+import pandas as pd
+
+# Budgets de points envoyés au navigateur
+MAX_CANDLES = 400
+MAX_LINE_POINTS = 1000
+
+# Résolutions disponibles pour les bougies, de la plus fine à la plus grossière
+OHLC_RESOLUTIONS = [
+    (None, 1, "quotidiennes"),
+    ('W-FRI', 5, "hebdomadaires"),
+    ('ME', 21, "mensuelles")
+]
+
+def resample_ohlcv(bars, rule):
+    """Agrège des barres quotidiennes en barres hebdomadaires ou mensuelles"""
+    aggregations = {
+        'Open': 'first',
+        'High': 'max',
+        'Low': 'min',
+        'Close': 'last',
+        'Volume': 'sum'
+    }
+    if 'Dividends' in bars.columns:
+        aggregations['Dividends'] = 'sum'
+    resampled = bars.resample(rule).agg(aggregations)
+    return resampled.dropna(subset=['Close'])
+
+def downsample_ohlcv(bars, max_points=MAX_CANDLES):
+    """Choisit la résolution la plus fine qui respecte le budget de points"""
+    for rule, days_per_bar, label in OHLC_RESOLUTIONS:
+        if len(bars) / days_per_bar <= max_points:
+            break
+    if rule is None:
+        return bars, label
+    return resample_ohlcv(bars, rule), label
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets : indices des points conservant la forme de la courbe"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    # Bornes des seaux intermédiaires (premier et dernier points toujours conservés)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+    for i in range(threshold - 2):
+        start, stop = edges[i], edges[i + 1]
+        # Point moyen du seau suivant
+        next_start, next_stop = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+
+        # Aire des triangles (point retenu précédent, candidat, moyenne suivante)
+        areas = np.abs(
+            (x[selected] - avg_x) * (y[start:stop] - y[selected]) -
+            (x[selected] - x[start:stop]) * (avg_y - y[selected])
+        )
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+def downsample_series(series, max_points=MAX_LINE_POINTS):
+    """Réduit une série temporelle à max_points par LTTB (NaN ignorés)"""
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    x = series.index.asi8 if isinstance(series.index, pd.DatetimeIndex) else np.arange(len(series))
+    return series.iloc[lttb(x, series.to_numpy(), max_points)]
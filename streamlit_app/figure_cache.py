@@ -0,0 +1,80 @@
+# figure_cache.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+# Nombre maximal de feuilles affichées par défaut dans les treemaps
+TREEMAP_MAX_LEAVES = 500
+
+OTHERS_LABEL = "Autres"
+
+class FigureCache:
+    """Cache LRU de figures Plotly sérialisées, clé (version des données, filtres, type de graphique)"""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, data_version, filter_key, chart_type, build):
+        """Retourne la figure en cache ou la construit puis la sérialise"""
+        key = (data_version, filter_key, chart_type)
+        with self._lock:
+            serialized = self._figures.get(key)
+            if serialized is not None:
+                self._figures.move_to_end(key)
+
+        if serialized is None:
+            serialized = build().to_json()
+            with self._lock:
+                self._figures[key] = serialized
+                if len(self._figures) > self.max_entries:
+                    self._figures.popitem(last=False)
+
+        return pio.from_json(serialized)
+
+    def payload_size(self, data_version, filter_key, chart_type):
+        """Taille en octets de la figure envoyée au navigateur (None si absente du cache)"""
+        with self._lock:
+            serialized = self._figures.get((data_version, filter_key, chart_type))
+        return len(serialized) if serialized is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+
+def collapse_long_tail(df, max_leaves=TREEMAP_MAX_LEAVES, group_columns=('Secteur', 'Industrie'),
+                       leaf_column='Nom_complet', value_column='Capitalisation_boursiere',
+                       color_column='Score'):
+    """Regroupe les plus petites valeurs en un nœud « Autres » par industrie (niveau de détail)"""
+    if max_leaves is None or len(df) <= max_leaves:
+        return df
+
+    group_columns = list(group_columns)
+    values = df[value_column].to_numpy(dtype='float64')
+    keep = np.zeros(len(df), dtype=bool)
+    keep[np.argsort(-values, kind='stable')[:max_leaves]] = True
+
+    kept = df.iloc[np.flatnonzero(keep)]
+    tail = df.iloc[np.flatnonzero(~keep)]
+
+    # Agrégation de la traîne : somme des capitalisations, score pondéré par la capitalisation
+    tail = tail.assign(_weighted=tail[color_column].astype('float64') * tail[value_column])
+    grouped = tail.groupby(group_columns, observed=True)
+    others = grouped.agg(
+        **{
+            value_column: (value_column, 'sum'),
+            '_weighted': ('_weighted', 'sum'),
+            '_count': (value_column, 'size')
+        }
+    ).reset_index()
+    others[color_column] = others['_weighted'] / others[value_column].where(others[value_column] > 0)
+    others[leaf_column] = OTHERS_LABEL + " (" + others['_count'].astype(str) + ")"
+    others = others.drop(columns=['_weighted', '_count'])
+
+    # Les dimensions catégorielles sont repassées en texte pour la concaténation
+    kept = kept.astype({col: str for col in group_columns})
+    others = others.astype({col: str for col in group_columns})
+    return pd.concat([kept, others], ignore_index=True)
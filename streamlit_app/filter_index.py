@@ -0,0 +1,91 @@
+# filter_index.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+def make_filter_key(sectors=None, countries=None, cap_range=None):
+    """Clé canonique d'une combinaison de filtres (indépendante de l'ordre de sélection)"""
+    return (
+        frozenset(sectors or ()),
+        frozenset(countries or ()),
+        tuple(float(bound) for bound in cap_range) if cap_range else None
+    )
+
+class FilterIndex:
+    """Index précalculé des filtres secteur / pays / capitalisation sur l'univers préparé"""
+
+    def __init__(self, market_data, max_cached=256):
+        self.size = len(market_data)
+        self.max_cached = max_cached
+
+        # Positions des lignes pour chaque secteur et chaque pays
+        self.sector_positions = self._build_positions(market_data['Secteur'])
+        self.country_positions = self._build_positions(market_data['Pays'])
+
+        # Capitalisations triées pour les recherches par intervalle (searchsorted)
+        caps = market_data['Capitalisation_boursiere'].to_numpy(dtype='float64')
+        self._cap_order = np.argsort(caps, kind='stable')
+        self._sorted_caps = caps[self._cap_order]
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_positions(series):
+        """Regroupe les positions des lignes par valeur en un seul tri"""
+        codes, uniques = pd.factorize(series, sort=True)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        return {
+            value: order[bounds[i]:bounds[i + 1]]
+            for i, value in enumerate(uniques)
+        }
+
+    def cap_positions(self, cap_min=None, cap_max=None):
+        """Positions des lignes dont la capitalisation est dans [cap_min, cap_max]"""
+        start = 0 if cap_min is None else np.searchsorted(self._sorted_caps, cap_min, side='left')
+        stop = self.size if cap_max is None else np.searchsorted(self._sorted_caps, cap_max, side='right')
+        return self._cap_order[start:stop]
+
+    def lookup(self, sectors=None, countries=None, cap_range=None):
+        """Positions (triées) des lignes satisfaisant la combinaison de filtres"""
+        key = make_filter_key(sectors, countries, cap_range)
+        with self._lock:
+            positions = self._cache.get(key)
+            if positions is not None:
+                self._cache.move_to_end(key)
+                return positions
+
+        positions = self._compute(*key)
+        positions.flags.writeable = False
+
+        with self._lock:
+            self._cache[key] = positions
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return positions
+
+    def _compute(self, sectors, countries, cap_range):
+        """Intersection des ensembles de positions via un masque booléen"""
+        selected = np.ones(self.size, dtype=bool)
+
+        if sectors:
+            selected &= self._mask_from(self.sector_positions, sectors)
+        if countries:
+            selected &= self._mask_from(self.country_positions, countries)
+        if cap_range:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self.cap_positions(*cap_range)] = True
+            selected &= mask
+
+        return np.flatnonzero(selected)
+
+    def _mask_from(self, positions_by_value, values):
+        """Masque des lignes appartenant à l'une des valeurs sélectionnées"""
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            positions = positions_by_value.get(value)
+            if positions is not None:
+                mask[positions] = True
+        return mask
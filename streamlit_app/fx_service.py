@@ -0,0 +1,127 @@
+# fx_service.py
+import threading
+from datetime import datetime, timedelta
+import pandas as pd
+import streamlit as st
+from history_store import get_history_store
+
+# Taux de repli (EUR pour une unité de devise) si les cours de change sont indisponibles
+FALLBACK_RATES = {
+    'EUR': 1.0,
+    'USD': 0.93,
+    'KRW': 0.000696,
+    'JPY': 0.00622,
+    'GBP': 1.17,
+    'CHF': 1.07,
+    'CNY': 0.129,
+    'HKD': 0.119,
+    'TWD': 0.0295,
+    'SGD': 0.69,
+    'BRL': 0.186,
+    'CAD': 0.69,
+    'AUD': 0.605,
+    'INR': 0.0112,
+    'ZAR': 0.049,
+    'NOK': 0.085,
+}
+
+# Cotations en sous-unités (pence, cents) : devise principale et facteur de conversion
+SUBUNITS = {
+    'GBp': ('GBP', 0.01),
+    'GBX': ('GBP', 0.01),
+    'ZAc': ('ZAR', 0.01),
+    'ILA': ('ILS', 0.01),
+}
+
+# Durée de validité des derniers taux
+LATEST_RATES_TTL = timedelta(hours=1)
+
+def main_currency(currency):
+    """Devise principale d'une cotation (GBp -> GBP)"""
+    return SUBUNITS.get(currency, (currency, 1.0))[0]
+
+def subunit_factor(currency):
+    """Facteur des cotations en sous-unités (GBp -> 0.01)"""
+    return SUBUNITS.get(currency, (currency, 1.0))[1]
+
+def fx_ticker(currency):
+    """Ticker Yahoo de la paire devise/EUR (EUR pour une unité de devise)"""
+    return f"{currency}EUR=X"
+
+class FXService:
+    """Table quotidienne des taux de change vers l'EUR, source unique pour le marché et le portefeuille"""
+
+    def __init__(self, store=None):
+        self.store = store or get_history_store()
+        self._latest = None
+        self._latest_at = None
+        self._lock = threading.Lock()
+
+    def rates_table(self, currencies, start, end=None, fetch=True):
+        """Taux quotidiens (dates × devises principales), paires téléchargées en lot et stockées localement
+
+        fetch=False : lecture du seul stock local (abonnés du stock d'historiques).
+        """
+        currencies = sorted({main_currency(c) for c in currencies if isinstance(c, str)})
+        foreign = [c for c in currencies if c != 'EUR']
+
+        rates = pd.DataFrame(dtype='float64')
+        if foreign:
+            try:
+                pairs = self.store.close_matrix([fx_ticker(c) for c in foreign], start, end, adjusted=False,
+                                                 fetch=fetch)
+                rates = pairs.rename(columns={fx_ticker(c): c for c in foreign})
+            except Exception:
+                rates = pd.DataFrame(dtype='float64')
+
+        if rates.empty:
+            rates = pd.DataFrame(index=pd.DatetimeIndex([pd.Timestamp(start).normalize()]))
+        rates = rates.reindex(columns=currencies).sort_index().ffill()
+        if 'EUR' in currencies:
+            rates['EUR'] = 1.0
+
+        # Devises sans cotation : taux de repli constant
+        for currency in foreign:
+            if rates[currency].isna().all() and currency in FALLBACK_RATES:
+                rates[currency] = FALLBACK_RATES[currency]
+        return rates.bfill()
+
+    def latest_rates(self):
+        """Derniers taux connus pour toutes les devises suivies (repli sur les constantes)"""
+        with self._lock:
+            if self._latest is not None and datetime.now() - self._latest_at < LATEST_RATES_TTL:
+                return dict(self._latest)
+
+        table = self.rates_table(FALLBACK_RATES.keys(), datetime.now() - timedelta(days=14))
+        latest = dict(FALLBACK_RATES)
+        if not table.empty:
+            last = table.ffill().iloc[-1].dropna()
+            latest.update({currency: float(rate) for currency, rate in last.items()})
+
+        with self._lock:
+            self._latest = latest
+            self._latest_at = datetime.now()
+        return dict(latest)
+
+    def price_rate(self, currency):
+        """Taux à appliquer à un cours coté dans la devise (sous-unités comprises)"""
+        rate = self.latest_rates().get(main_currency(currency))
+        return rate * subunit_factor(currency) if rate is not None else None
+
+    def convert_to_eur(self, prices, currencies):
+        """Convertit une matrice de cours (dates × tickers) en EUR par jointure as-of, en une opération"""
+        if prices.empty:
+            return prices
+        currencies = pd.Series(currencies).reindex(prices.columns).fillna('EUR')
+        rates = self.rates_table(currencies.unique(), prices.index.min() - timedelta(days=7), prices.index.max())
+
+        # Jointure as-of : dernier taux connu à chaque date de cotation
+        rates = rates.reindex(rates.index.union(prices.index)).ffill().bfill().reindex(prices.index)
+        rate_matrix = rates[currencies.map(main_currency).to_numpy()].to_numpy()
+        factors = currencies.map(subunit_factor).to_numpy()
+        return prices * (rate_matrix * factors)
+
+@st.cache_resource
+def get_fx_service():
+    """Service de change partagé par toutes les sessions"""
+    return FXService()
@@ -0,0 +1,354 @@
+# history_store.py
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import yfinance as yf
+import streamlit as st
+
+# Un fichier Feather (Arrow IPC non compressé, lisible par memory-map) par ticker
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'history')
+COVERAGE_FILE = '_coverage.json'
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+
+# Délai avant de redemander une plage déjà tentée mais non couverte (séance du jour, échec, jour férié)
+FETCH_TTL = timedelta(hours=1)
+
+def _to_day(value):
+    """Date calendaire (Timestamp normalisé sans fuseau)"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.normalize()
+
+def merge_ranges(ranges):
+    """Fusionne des intervalles de dates [début, fin] qui se chevauchent ou se touchent"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+def missing_ranges(covered, start, end):
+    """Intervalles de [start, end] non couverts par les plages déjà stockées"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+def split_dates(bars):
+    """Dates de division d'actions présentes dans des barres (ratio différent de 0 et de 1)"""
+    if 'Stock Splits' not in bars:
+        return pd.DatetimeIndex([])
+    splits = bars['Stock Splits'].fillna(0.0)
+    return pd.DatetimeIndex(bars.index[(splits > 0) & (splits != 1)])
+
+def adjusted_close(bars):
+    """Clôtures ajustées des dividendes (méthode Yahoo), calculées localement à partir des barres brutes
+
+    Les barres stockées sont toutes à l'échelle de la dernière division connue (le stock
+    retélécharge l'historique d'un ticker à chaque nouvelle division) : seul l'ajustement
+    des dividendes reste à appliquer.
+    """
+    close = bars['Close']
+    if 'Dividends' not in bars or close.empty:
+        return close
+    previous_close = close.shift(1)
+    ratio = (1 - bars['Dividends'].fillna(0) / previous_close).where(bars['Dividends'] > 0, 1.0).fillna(1.0)
+    # Facteur appliqué à chaque date : produit des ratios des dividendes postérieurs
+    factor = ratio[::-1].cumprod()[::-1].shift(-1, fill_value=1.0)
+    return close * factor
+
+class HistoryStore:
+    """Historique OHLCV local par ticker, avec suivi des plages couvertes et rapatriement des seuls trous"""
+
+    def __init__(self, root=HISTORY_DIR, downloader=None):
+        self.root = root
+        self.downloader = downloader or self._download
+        self._lock = threading.RLock()
+        self._listeners = []
+        # Plages tentées récemment : {ticker: [(début, fin, heure de la tentative)]}, en mémoire
+        self._attempts = {}
+        os.makedirs(self.root, exist_ok=True)
+        self._coverage = self._load_coverage()
+
+    def subscribe(self, listener):
+        """Appelle `listener({ticker: première date ajoutée ou réécrite})` après chaque ajout de barres"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    # --- Fichiers et plages couvertes ---
+
+    def _path(self, ticker):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', ticker) + '.feather')
+
+    def _load_coverage(self):
+        path = os.path.join(self.root, COVERAGE_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path) as f:
+                raw = json.load(f)
+            return {
+                ticker: [(pd.Timestamp(start), pd.Timestamp(end)) for start, end in ranges]
+                for ticker, ranges in raw.items()
+            }
+        except (OSError, ValueError):
+            return {}
+
+    def _save_coverage(self):
+        path = os.path.join(self.root, COVERAGE_FILE)
+        raw = {
+            ticker: [[start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')] for start, end in ranges]
+            for ticker, ranges in self._coverage.items()
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(raw, f)
+        os.replace(tmp_path, path)
+
+    def coverage(self, ticker):
+        """Plages de dates déjà stockées pour un ticker"""
+        return list(self._coverage.get(ticker, []))
+
+    def tickers(self):
+        """Tickers ayant un historique stocké"""
+        return list(self._coverage)
+
+    # --- Planification et téléchargement des trous ---
+
+    def _recent_attempts(self, ticker, now):
+        """Plages demandées il y a moins de FETCH_TTL (traitées comme couvertes jusque-là)"""
+        attempts = [a for a in self._attempts.get(ticker, []) if now - a[2] < FETCH_TTL]
+        if attempts:
+            self._attempts[ticker] = attempts
+        else:
+            self._attempts.pop(ticker, None)
+        return [(start, end) for start, end, _ in attempts]
+
+    def plan_fetches(self, tickers, start, end):
+        """Regroupe les tickers par trou identique : une requête groupée par trou"""
+        start, end = _to_day(start), _to_day(end)
+        now = datetime.now()
+        plan = {}
+        for ticker in tickers:
+            covered = merge_ranges(self._coverage.get(ticker, []) + self._recent_attempts(ticker, now))
+            for gap in missing_ranges(covered, start, end):
+                plan.setdefault(gap, []).append(ticker)
+        return plan
+
+    @staticmethod
+    def _download(tickers, start, end):
+        """Barres quotidiennes brutes + dividendes/splits de plusieurs tickers en une requête"""
+        data = yf.download(
+            list(tickers),
+            start=start,
+            end=end + timedelta(days=1),
+            interval="1d",
+            auto_adjust=False,
+            actions=True,
+            group_by='ticker',
+            progress=False,
+            threads=True
+        )
+        frames = {}
+        if data is None or data.empty:
+            return frames
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                bars = data[ticker]
+            else:
+                bars = data
+            bars = bars.reindex(columns=OHLCV_COLUMNS).dropna(subset=['Close'])
+            if bars.index.tz is not None:
+                bars.index = bars.index.tz_localize(None)
+            frames[ticker] = bars
+        return frames
+
+    def ensure(self, tickers, start, end=None):
+        """Rapatrie uniquement les plages manquantes, en requêtes groupées par trou"""
+        today = _to_day(datetime.now())
+        end = min(_to_day(end), today) if end is not None else today
+        start = _to_day(start)
+        if start > end:
+            return
+
+        appended = {}
+        with self._lock:
+            plan = self.plan_fetches(tickers, start, end)
+            covered_changed = False
+            rescaled = set()
+            for (gap_start, gap_end), gap_tickers in plan.items():
+                frames = self.downloader(gap_tickers, gap_start, gap_end)
+                attempted_at = datetime.now()
+                for ticker in gap_tickers:
+                    # Toute tentative est mémorisée : pas de nouvelle requête avant FETCH_TTL
+                    self._attempts.setdefault(ticker, []).append((gap_start, gap_end, attempted_at))
+                    bars = frames.get(ticker)
+                    if bars is None or bars.empty:
+                        # Échec réseau, ticker inconnu ou jours sans cotation : plage non couverte
+                        continue
+                    if self._new_split(ticker, bars):
+                        rescaled.add(ticker)
+                    self._append(ticker, bars)
+                    first = _to_day(bars.index.min())
+                    appended[ticker] = min(appended.get(ticker, first), first)
+                    # La séance du jour n'est pas définitive : elle sera redemandée après FETCH_TTL
+                    covered_end = min(gap_end, today - timedelta(days=1))
+                    if covered_end >= gap_start:
+                        self._coverage[ticker] = merge_ranges(
+                            self._coverage.get(ticker, []) + [(gap_start, covered_end)]
+                        )
+                        covered_changed = True
+            for ticker in rescaled:
+                appended[ticker] = self._refetch(ticker, today)
+                covered_changed = True
+            if covered_changed:
+                self._save_coverage()
+            listeners = list(self._listeners)
+
+        # Abonnés notifiés hors verrou (indicateurs incrémentaux)
+        if appended:
+            for listener in listeners:
+                try:
+                    listener(appended)
+                except Exception:
+                    pass
+
+    def _new_split(self, ticker, bars):
+        """Vrai si des barres téléchargées portent une division absente du fichier et postérieure à ses barres
+
+        Yahoo n'ajuste les cours des divisions qu'à la date du téléchargement : les barres déjà
+        stockées avant une division sont à l'ancienne échelle, les nouvelles à la nouvelle.
+        """
+        splits = split_dates(bars)
+        if splits.empty:
+            return False
+        existing = self._read(ticker)
+        if existing is None or existing.empty:
+            return False
+        splits = splits.difference(split_dates(existing))
+        return bool(len(splits)) and splits.max() > existing.index[0]
+
+    def _refetch(self, ticker, today):
+        """Retélécharge tout l'historique stocké d'un ticker après une division (barres remplacées)
+
+        Retourne la première date stockée : les abonnés reconstruisent leurs séries depuis celle-ci.
+        En cas d'échec, fichier et plages couvertes sont abandonnés plutôt que mêlés d'échelles.
+        """
+        existing = self._read(ticker)
+        ranges = self._coverage.get(ticker, [])
+        start = min([_to_day(existing.index[0])] + [r[0] for r in ranges])
+        bars = self.downloader([ticker], start, today).get(ticker)
+        self._attempts.setdefault(ticker, []).append((start, today, datetime.now()))
+        if bars is None or bars.empty:
+            os.remove(self._path(ticker))
+            self._coverage.pop(ticker, None)
+            return start
+        self._write(ticker, self._normalize(bars))
+        covered_end = today - timedelta(days=1)
+        self._coverage[ticker] = [(start, covered_end)] if covered_end >= start else []
+        return start
+
+    @staticmethod
+    def _normalize(bars):
+        bars = bars.copy()
+        bars.index = pd.DatetimeIndex(bars.index).tz_localize(None) if bars.index.tz is not None \
+            else pd.DatetimeIndex(bars.index)
+        bars.index.name = 'Date'
+        return bars[~bars.index.duplicated(keep='last')].sort_index()
+
+    def _append(self, ticker, bars):
+        """Fusionne de nouvelles barres dans le fichier du ticker (écriture atomique)"""
+        bars = self._normalize(bars)
+        existing = self._read(ticker)
+        if existing is not None:
+            bars = bars.combine_first(existing)
+        self._write(ticker, bars)
+
+    def _write(self, ticker, bars):
+        path = self._path(ticker)
+        tmp_path = path + '.tmp'
+        table = pa.Table.from_pandas(bars.reindex(columns=OHLCV_COLUMNS).astype('float64'), preserve_index=True)
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+    # --- Lecture ---
+
+    def _read(self, ticker, start=None, end=None):
+        """Lecture memory-map du fichier puis tranche [start, end] par recherche dichotomique"""
+        path = self._path(ticker)
+        if not os.path.exists(path):
+            return None
+        table = feather.read_table(path, memory_map=True)
+        if start is not None or end is not None:
+            dates = table.column('Date').to_numpy()
+            lo = 0 if start is None else np.searchsorted(dates, np.datetime64(_to_day(start)), side='left')
+            hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(_to_day(end)), side='right')
+            table = table.slice(lo, hi - lo)
+        return table.to_pandas()
+
+    def history(self, ticker, start, end=None, fetch=True):
+        """Barres quotidiennes d'un ticker sur [start, end], sans réseau si la plage est déjà stockée"""
+        if fetch:
+            self.ensure([ticker], start, end)
+        bars = self._read(ticker, start, end)
+        if bars is None:
+            return pd.DataFrame(columns=OHLCV_COLUMNS)
+        return bars
+
+    def close_matrix(self, tickers, start, end=None, adjusted=True, fetch=True):
+        """Matrice de clôtures (dates × tickers) depuis le stock local, trous rapatriés en lot"""
+        tickers = list(tickers)
+        if fetch:
+            self.ensure(tickers, start, end)
+        columns = {}
+        for ticker in tickers:
+            bars = self._read(ticker)
+            if bars is None or bars.empty:
+                continue
+            # L'ajustement est calculé sur tout l'historique stocké avant de trancher
+            close = adjusted_close(bars) if adjusted else bars['Close']
+            columns[ticker] = close.loc[_to_day(start):_to_day(end) if end is not None else None]
+        if not columns:
+            return pd.DataFrame(columns=tickers, dtype='float64')
+        return pd.DataFrame(columns).reindex(columns=tickers)
+
+    def dividend_matrix(self, tickers, start, end=None):
+        """Dividendes par action (dates × tickers), nuls hors dates de détachement"""
+        tickers = list(tickers)
+        self.ensure(tickers, start, end)
+        columns = {}
+        for ticker in tickers:
+            bars = self._read(ticker, start, end)
+            if bars is not None and not bars.empty:
+                columns[ticker] = bars['Dividends']
+        if not columns:
+            return pd.DataFrame(columns=tickers, dtype='float64')
+        return pd.DataFrame(columns).reindex(columns=tickers).fillna(0.0)
+
+@st.cache_resource
+def get_history_store():
+    """Stock d'historiques partagé par toutes les sessions du processus"""
+    return HistoryStore()
@@ -1,18 +1,42 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-from utils import prepare_market_data
+import urllib.request
+from datetime import datetime
+from aggregates import AggregateEngine
+from figure_cache import FigureCache, collapse_long_tail, TREEMAP_MAX_LEAVES
+from filter_index import FilterIndex, make_filter_key
+from utils import prepare_market_data, compact_market_data, memory_report, MARKET_COLUMNS
+from scoring import ScoringEngine, DEFAULT_SCORE_CONFIG
+
+DATA_URL = 'https://raw.githubusercontent.com/thidescac25/Finance-Co/refs/heads/main/data/stocks_data.csv'
 
 class MarketAnalyzer:
-    def __init__(self):
-        self.market_data = None
+    def __init__(self, data_version=None, compact=False):
+        self.data_version = data_version
+        self.compact = compact
+        self._market_data = None
+        self._extra_columns = {}
+        self._filter_index = None
+        self._aggregates = None
+        self._scoring = None
+        self.figure_cache = FigureCache()
         self.load_and_clean_data()
+
+    @property
+    def market_data(self):
+        """Données du marché préparées (partagées en lecture seule)"""
+        return self._market_data
         
     def load_and_clean_data(self):
         """Charge et nettoie les données du marché"""
         try:
-            # Chargement des données
-            df = pd.read_csv('https://raw.githubusercontent.com/thidescac25/Finance-Co/refs/heads/main/data/stocks_data.csv')
+            # Chargement des données (colonnes utiles uniquement en mode compact)
+            if self.compact:
+                df = pd.read_csv(DATA_URL, usecols=lambda col: col in MARKET_COLUMNS)
+            else:
+                df = pd.read_csv(DATA_URL)
             
             # Nettoyage des données
             df = prepare_market_data(df)
@@ -20,22 +44,111 @@ class MarketAnalyzer:
             if 'Rendement_du_dividende' in df.columns:
                 df['Rendement_du_dividende'] = df['Rendement_du_dividende']
 
-            self.market_data = df
+            if self.compact:
+                df = compact_market_data(df)
+
+            self._market_data = df
             
         except Exception as e:
             st.error(f"Erreur lors du chargement des données : {str(e)}")
-            self.market_data = pd.DataFrame()
+            self._market_data = pd.DataFrame()
     
-    def create_market_overview(self, filtered_data=None):
+    @property
+    def filter_index(self):
+        """Index des filtres, construit une fois par version de données"""
+        if self._filter_index is None:
+            self._filter_index = FilterIndex(self._market_data)
+        return self._filter_index
+
+    @property
+    def aggregates(self):
+        """Moteur d'agrégats (cumuls, classements, médianes), construit une fois par version"""
+        if self._aggregates is None:
+            self._aggregates = AggregateEngine(self._market_data, self.filter_index)
+        return self._aggregates
+
+    @property
+    def scoring(self):
+        """Moteur de scores multi-facteurs, résultats en cache par configuration"""
+        if self._scoring is None:
+            self._scoring = ScoringEngine(self._market_data, self.load_columns)
+        return self._scoring
+
+    def get_scores(self, config=DEFAULT_SCORE_CONFIG):
+        """Score composite de chaque valeur pour une configuration de facteurs"""
+        return self.scoring.scores(config)
+
+    def get_score_ranking(self, config=DEFAULT_SCORE_CONFIG, sectors=None, countries=None, cap_range=None, n=None):
+        """Classement par score des valeurs retenues par les filtres, avec la note de chaque facteur"""
+        positions = self.filter_index.lookup(sectors, countries, cap_range)
+        return self.scoring.ranking(config, positions, n)
+
+    def get_filtered_data(self, sectors=None, countries=None, cap_range=None):
+        """Sélection par positions des lignes correspondant aux filtres"""
+        positions = self.filter_index.lookup(sectors, countries, cap_range)
+        return self._market_data.iloc[positions]
+
+    def load_columns(self, columns):
+        """Charge à la demande des colonnes absentes du mode compact, alignées sur market_data"""
+        missing = [col for col in columns
+                   if col not in self._market_data.columns and col not in self._extra_columns]
+        if missing:
+            extra = pd.read_csv(DATA_URL, usecols=['Ticker'] + missing).set_index('Ticker')
+            for col in missing:
+                self._extra_columns[col] = extra[col]
+        
+        result = pd.DataFrame(index=self._market_data.index)
+        for col in columns:
+            if col in self._market_data.columns:
+                result[col] = self._market_data[col]
+            else:
+                result[col] = self._market_data['Ticker'].map(self._extra_columns[col])
+        return result
+
+    def memory_report(self):
+        """Rapport mémoire par colonne des données du marché"""
+        return memory_report(self._market_data)
+
+    def create_market_overview(self, filtered_data=None, max_leaves=TREEMAP_MAX_LEAVES):
         """Crée les visualisations du marché"""
         df = filtered_data if filtered_data is not None else self.market_data
         
         if df is None or df.empty:
             return None, None, None
 
-        # Treemap
-        fig_treemap = px.treemap(
+        # Treemap (mise en cache uniquement pour l'univers complet, seul cas identifiable par une clé)
+        if filtered_data is None:
+            fig_treemap = self.figure_cache.get_or_build(
+                self.data_version, make_filter_key(), ('overview_treemap', max_leaves),
+                lambda: self._build_overview_treemap(df, max_leaves)
+            )
+        else:
+            fig_treemap = self._build_overview_treemap(df, max_leaves)
+
+        # Distribution des PER
+        fig_per = px.box(
             df,
+            x='Secteur',
+            y='PER_historique',
+            title='Distribution des PER par secteur'
+        )
+        fig_per.update_layout(height=400)
+
+        # Distribution des rendements
+        fig_returns = px.histogram(
+            df,
+            x='Variation_52_semaines',
+            nbins=50,
+            title='Distribution des rendements sur 52 semaines'
+        )
+        fig_returns.update_layout(height=400)
+
+        return fig_treemap, fig_per, fig_returns
+    
+    def _build_overview_treemap(self, df, max_leaves):
+        """Treemap des capitalisations par score, traîne des petites valeurs regroupée"""
+        fig_treemap = px.treemap(
+            collapse_long_tail(df, max_leaves),
             path=['Secteur', 'Industrie', 'Nom_complet'],
             values='Capitalisation_boursiere',
             color='Score',
@@ -65,30 +178,57 @@ class MarketAnalyzer:
             <extra></extra>
             """
         )
+        return fig_treemap
 
-        # Distribution des PER
-        fig_per = px.box(
-            df,
-            x='Secteur',
-            y='PER_historique',
-            title='Distribution des PER par secteur'
+    def create_score_treemap(self, sectors=None, countries=None, cap_range=None, max_leaves=TREEMAP_MAX_LEAVES,
+                             score_config=DEFAULT_SCORE_CONFIG):
+        """Cartographie filtrée colorée par score, mise en cache par filtres et configuration du score"""
+        def build():
+            data = self.get_filtered_data(sectors, countries, cap_range)
+            data = data.assign(Score=self.get_scores(score_config).reindex(data.index))
+            fig = px.treemap(
+                collapse_long_tail(data, max_leaves),
+                path=['Secteur', 'Industrie', 'Nom_complet'],
+                values='Capitalisation_boursiere',
+                color='Score',
+                color_continuous_scale='RdYlBu',
+                hover_data=['Ticker', 'Prix_actuel', 'PER_historique', 'Rendement_du_dividende'],
+                title='Cartographie du Marché par Capitalisation'
+            )
+            fig.update_layout(height=600)
+            return fig
+
+        return self.figure_cache.get_or_build(
+            self.data_version, make_filter_key(sectors, countries, cap_range), ('score_treemap', max_leaves, score_config),
+            build
         )
-        fig_per.update_layout(height=400)
 
-        # Distribution des rendements
-        fig_returns = px.histogram(
-            df,
-            x='Variation_52_semaines',
-            nbins=50,
-            title='Distribution des rendements sur 52 semaines'
+    def create_capitalisation_treemap(self, cap_range, max_leaves=TREEMAP_MAX_LEAVES):
+        """Répartition détaillée des capitalisations (échelle Viridis), mise en cache par plage"""
+        def build():
+            filtered_data = self.get_filtered_data(cap_range=cap_range)
+            fig_treemap = px.treemap(
+                collapse_long_tail(filtered_data, max_leaves, color_column='Capitalisation_boursiere'),
+                path=['Secteur', 'Industrie', 'Nom_complet'],
+                values='Capitalisation_boursiere',
+                color='Capitalisation_boursiere',
+                color_continuous_scale='Viridis',
+                color_continuous_midpoint=np.median(filtered_data['Capitalisation_boursiere']),
+                title='Répartition détaillée des capitalisations'
+            )
+            fig_treemap.update_layout(height=600)
+            return fig_treemap
+
+        return self.figure_cache.get_or_build(
+            self.data_version, make_filter_key(cap_range=cap_range), ('cap_treemap', max_leaves), build
         )
-        fig_returns.update_layout(height=400)
 
-        return fig_treemap, fig_per, fig_returns
-    
     def calculate_market_metrics(self, filtered_data=None):
         """Calcule les métriques du marché"""
-        df = filtered_data if filtered_data is not None else self.market_data
+        if filtered_data is None:
+            return self.aggregates.market_metrics() if not self._market_data.empty else {}
+        
+        df = filtered_data
         
         if df is None or df.empty:
             return {}
@@ -101,45 +241,60 @@ class MarketAnalyzer:
             'avg_variation': df['Variation_52_semaines'].mean()
         }
     
+    def get_market_metrics(self, sectors=None, countries=None, cap_range=None):
+        """Métriques du marché pour des filtres, servies par les agrégats précalculés"""
+        if self._market_data is None or self._market_data.empty:
+            return {}
+        return self.aggregates.market_metrics(sectors, countries, cap_range)
+    
     def get_market_highlights(self):
         """Récupère les points marquants du marché"""
-        df = self.market_data
-        
-        # Plus fortes hausses/baisses sur 52 semaines
-        best_performers = df.nlargest(5, 'Variation_52_semaines')[
-            ['Ticker', 'Nom_complet', 'Variation_52_semaines']
-        ]
-        worst_performers = df.nsmallest(5, 'Variation_52_semaines')[
-            ['Ticker', 'Nom_complet', 'Variation_52_semaines']
-        ]
-        
-        # Plus gros dividendes
-        highest_dividends = df.nlargest(5, 'Rendement_du_dividende')[
-            ['Ticker', 'Nom_complet', 'Rendement_du_dividende']
-        ]
-        
-        # Répartition par secteur
-        sector_allocation = df.groupby('Secteur')['Capitalisation_boursiere'].sum()
-        sector_allocation = (sector_allocation / sector_allocation.sum() * 100).round(2)
-        
-        return {
-            'best_performers': best_performers,
-            'worst_performers': worst_performers,
-            'highest_dividends': highest_dividends,
-            'sector_allocation': sector_allocation
-        }
+        return self.aggregates.highlights(n=5)
 
     def create_sector_sunburst(self):
         """Crée un graphique sunburst des secteurs et industries"""
-        df = self.market_data
-        
-        fig = px.sunburst(
-            df,
-            path=['Secteur', 'Industrie'],
-            values='Capitalisation_boursiere',
-            color='Score',
-            color_continuous_scale='RdYlBu',
-        )
+        def build():
+            fig = px.sunburst(
+                self.market_data,
+                path=['Secteur', 'Industrie'],
+                values='Capitalisation_boursiere',
+                color='Score',
+                color_continuous_scale='RdYlBu',
+            )
+            
+            fig.update_layout(height=500)
+            return fig
         
-        fig.update_layout(height=500)
-        return fig
\ No newline at end of file
+        return self.figure_cache.get_or_build(self.data_version, make_filter_key(), 'sunburst', build)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_data_version():
+    """Identifie la version du snapshot de données (ETag du CSV publié)"""
+    try:
+        request = urllib.request.Request(DATA_URL, method='HEAD')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            version = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if version:
+                return version.strip('"')
+    except Exception:
+        pass
+    # À défaut, une version par jour (le snapshot est actualisé quotidiennement)
+    return datetime.now().strftime('%Y-%m-%d')
+
+@st.cache_resource(max_entries=2, show_spinner="Chargement des données du marché...")
+def _load_market_analyzer(data_version, compact):
+    """Construit l'analyseur une seule fois par version de données pour tout le processus"""
+    return MarketAnalyzer(data_version=data_version, compact=compact)
+
+def get_market_analyzer(compact=True):
+    """Retourne l'analyseur partagé entre toutes les pages et sessions"""
+    analyzer = _load_market_analyzer(get_data_version(), compact)
+    if analyzer.market_data is None or analyzer.market_data.empty:
+        # Ne pas conserver un chargement en échec : nouvelle tentative au prochain rerun
+        _load_market_analyzer.clear()
+    return analyzer
+
+def invalidate_market_analyzer():
+    """Force le rechargement des données à l'arrivée d'un nouveau snapshot"""
+    get_data_version.clear()
+    _load_market_analyzer.clear()
@@ -0,0 +1,98 @@
+# monte_carlo.py
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import streamlit as st
+from risk_engine import TRADING_DAYS
+from result_cache import ResultCache
+
+SIMULATION_METHODS = {
+    "Bootstrap historique": 'bootstrap',
+    "Mouvement brownien géométrique": 'gbm'
+}
+
+# Trajectoires simulées par lot (borne la mémoire d'un lot : lot × jours)
+BATCH_SIZE = 2000
+
+# Au-delà, les lots sont répartis sur un pool de processus
+PARALLEL_THRESHOLD = 50_000
+MAX_PROCESSES = 4
+
+# Un point conservé toutes les N séances pour les éventails (la valeur finale est toujours gardée)
+CHECKPOINT_STEP = 5
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+def checkpoint_days(horizon):
+    """Séances conservées : 0, toutes les CHECKPOINT_STEP séances, et l'horizon"""
+    return np.unique(np.append(np.arange(0, horizon + 1, CHECKPOINT_STEP), horizon))
+
+def _simulate_batch(task):
+    """Simule un lot de trajectoires de valeur avec son propre flux aléatoire (exécutable dans un processus)"""
+    method, params, n_paths, horizon, seed, initial_value = task
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        # Tirage avec remise des rendements quotidiens historiques du portefeuille
+        history = params['returns']
+        daily = history[rng.integers(0, len(history), size=(n_paths, horizon))]
+    else:
+        # Log-rendements gaussiens du portefeuille (volatilité issue de la covariance des actifs)
+        shocks = rng.standard_normal((n_paths, horizon))
+        daily = np.expm1(params['drift'] + params['volatility'] * shocks)
+
+    values = initial_value * np.cumprod(1 + daily, axis=1)
+    values = np.hstack([np.full((n_paths, 1), float(initial_value)), values])
+    return values[:, checkpoint_days(horizon)].astype('float32')
+
+def gbm_parameters(mean_returns, covariance, weights):
+    """Dérive et volatilité quotidiennes du portefeuille à partir des estimations annualisées
+
+    Les corrélations entrent par wᵀΣw : la somme pondérée de log-rendements gaussiens
+    corrélés est elle-même gaussienne, ce qui évite de simuler chaque actif.
+    """
+    w = np.asarray(weights, dtype='float64')
+    w = w / w.sum()
+    cov = np.asarray(covariance, dtype='float64') / TRADING_DAYS
+    mu = np.asarray(mean_returns, dtype='float64') / TRADING_DAYS
+    variance = float(w @ cov @ w)
+    return {'drift': float(w @ mu) - 0.5 * variance, 'volatility': np.sqrt(variance)}
+
+def simulate(method, params, horizon, n_paths, seed=42, initial_value=1_000_000, parallel=True):
+    """Trajectoires de valeur aux séances de contrôle ; résultat identique en série ou en parallèle"""
+    sizes = [BATCH_SIZE] * (n_paths // BATCH_SIZE)
+    if n_paths % BATCH_SIZE:
+        sizes.append(n_paths % BATCH_SIZE)
+    # Un flux indépendant par lot : reproductible quel que soit le découpage entre processus
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(method, params, size, horizon, s, initial_value) for size, s in zip(sizes, seeds)]
+
+    workers = min(MAX_PROCESSES, os.cpu_count() or 1)
+    if parallel and workers > 1 and n_paths >= PARALLEL_THRESHOLD:
+        # spawn : pas de fork d'un serveur multi-thread
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            batches = list(pool.map(_simulate_batch, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        batches = [_simulate_batch(task) for task in tasks]
+    return np.vstack(batches)
+
+def summarize(paths, horizon, initial_value):
+    """Éventail de percentiles par séance et distribution de la valeur finale"""
+    days = checkpoint_days(horizon)
+    fan = pd.DataFrame(np.percentile(paths, PERCENTILES, axis=0).T, index=days, columns=PERCENTILES)
+    terminal = paths[:, -1].astype('float64')
+    return {
+        'fan': fan,
+        'terminal': terminal,
+        'mean': float(terminal.mean()),
+        'median': float(np.median(terminal)),
+        'prob_loss': float((terminal < initial_value).mean()),
+        'var_95': float(initial_value - np.percentile(terminal, 5)),
+    }
+
+@st.cache_resource
+def get_simulation_cache():
+    """Projections partagées par toutes les sessions, par (matrice et sa version, début, méthode, horizon, trajectoires, graine)"""
+    return ResultCache(max_cached=16)
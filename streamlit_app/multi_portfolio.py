@@ -0,0 +1,153 @@
+# multi_portfolio.py
+import logging
+import os
+import sys
+from datetime import timedelta
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import streamlit as st
+from risk_engine import TRADING_DAYS, RISK_FREE_RATE, VAR_LEVEL
+from result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+# Racine du dépôt : le paquet src (modèles et accès à la base) n'est pas sous streamlit_app
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+# Durée de validité des définitions lues en base (vidée à chaque enregistrement)
+SAVED_PORTFOLIOS_TTL = timedelta(minutes=10)
+
+def weight_matrix(definitions, tickers=None):
+    """Matrice des poids (portefeuilles × tickers), lignes normalisées à 1
+
+    definitions : {nom: {ticker: poids}} ; tickers : colonnes imposées (union des
+    tickers des définitions par défaut).
+    """
+    weights = pd.DataFrame.from_dict(
+        {name: pd.Series(w, dtype='float64') for name, w in definitions.items()}, orient='index'
+    )
+    if tickers is not None:
+        weights = weights.reindex(columns=list(tickers))
+    weights = weights.fillna(0.0).clip(lower=0.0)
+    totals = weights.sum(axis=1)
+    return weights[totals > 0].div(totals[totals > 0], axis=0)
+
+@st.cache_data(ttl=SAVED_PORTFOLIOS_TTL, show_spinner=False)
+def load_saved_portfolios():
+    """Portefeuilles modèles enregistrés en base ({} si la base n'est pas disponible)
+
+    Mis en cache : la page ne se connecte à la base qu'une fois par SAVED_PORTFOLIOS_TTL,
+    même si l'hôte est injoignable.
+    """
+    try:
+        from sqlalchemy.exc import SQLAlchemyError
+        from src.models.portfolios import load_model_portfolios
+    except ImportError as e:
+        logger.warning(f"Portefeuilles enregistrés indisponibles (import) : {str(e)}")
+        return {}
+    try:
+        return load_model_portfolios()
+    except SQLAlchemyError as e:
+        logger.warning(f"Portefeuilles enregistrés indisponibles (base de données) : {str(e)}")
+        return {}
+
+def save_portfolio_definition(name, weights, initial_value, description=None):
+    """Enregistre une définition en base puis invalide le cache des définitions"""
+    from src.models.portfolios import save_model_portfolio
+    save_model_portfolio(name, weights, initial_value, description)
+    load_saved_portfolios.clear()
+
+def evaluate_portfolios(closes, weights, capital, benchmark=None, risk_free=RISK_FREE_RATE, level=VAR_LEVEL):
+    """Courbes de valeur et risque de K portefeuilles en produits matriciels sur la matrice partagée
+
+    closes : cours en EUR (dates × N) ; weights : poids (K × N) ; capital : K montants initiaux.
+    Les positions sont achetées à la première date puis conservées (comme `simulate_buy_and_hold`) ;
+    toutes les statistiques sont calculées sur ces mêmes courbes de valeur.
+    """
+    names = weights.index
+    assets = weights.columns
+    closes = closes.reindex(columns=assets)
+    W = weights.to_numpy(dtype='float64')
+    capital = np.broadcast_to(np.asarray(capital, dtype='float64'), (len(names),))
+
+    # Nombre d'actions de chaque portefeuille (K × N) au premier cours connu
+    filled = closes.ffill().bfill().to_numpy(dtype='float64')
+    first = filled[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(first > 0, W * capital[:, None] / first, 0.0)
+    equity = np.nan_to_num(filled) @ shares.T
+
+    # Rendements quotidiens des courbes (dates × K)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        P = equity[1:] / equity[:-1] - 1
+    P = np.nan_to_num(P, nan=0.0, posinf=0.0, neginf=0.0)
+    n_days = P.shape[0]
+    returns_index = closes.index[1:]
+
+    annual_return = P.mean(axis=0) * TRADING_DAYS
+    volatility = P.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS) if n_days > 1 else np.full(len(names), np.nan)
+    daily_rf = risk_free / TRADING_DAYS
+    downside = np.sqrt(np.mean(np.minimum(P - daily_rf, 0) ** 2, axis=0) * TRADING_DAYS)
+
+    # VaR / CVaR historiques quotidiennes (pertes positives), colonne par colonne en bloc
+    alpha = 1 - level
+    var_hist = -np.quantile(P, alpha, axis=0)
+    tail = P <= -var_hist
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cvar_hist = -np.where(tail, P, 0.0).sum(axis=0) / tail.sum(axis=0)
+    cvar_hist = np.where(np.isfinite(cvar_hist), cvar_hist, var_hist)
+    z = NormalDist().inv_cdf(alpha)
+    var_param = -(P.mean(axis=0) + z * P.std(axis=0, ddof=1))
+
+    # Drawdown maximum des courbes affichées (plus haut courant par colonne)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    max_drawdown = np.nan_to_num(drawdown).min(axis=0) if len(equity) else np.zeros(len(names))
+
+    # Bêta de chaque courbe : une régression par colonne, en un produit matriciel
+    beta = np.full(len(names), np.nan)
+    if benchmark is not None and n_days:
+        b = benchmark.reindex(returns_index).fillna(0.0).to_numpy(dtype='float64')
+        b_centered = b - b.mean()
+        b_var = b_centered @ b_centered
+        if b_var > 0:
+            beta = (P - P.mean(axis=0)).T @ b_centered / b_var
+
+    final = equity[-1] if len(equity) else capital
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary = pd.DataFrame({
+            'valeur_initiale': capital,
+            'valeur_finale': final,
+            'performance': final / capital - 1,
+            'rendement': annual_return,
+            'volatilite': volatility,
+            'sharpe': np.where(volatility > 0, (annual_return - risk_free) / volatility, np.nan),
+            'sortino': np.where(downside > 0, (annual_return - risk_free) / downside, np.nan),
+            'beta': beta,
+            'var_historique': var_hist,
+            'cvar_historique': cvar_hist,
+            'var_parametrique': var_param,
+            'max_drawdown': max_drawdown,
+            'positions': (W > 0).sum(axis=1)
+        }, index=names)
+
+    return {
+        'weights': weights,
+        'shares': pd.DataFrame(shares, index=names, columns=assets),
+        'equity': pd.DataFrame(equity, index=closes.index, columns=names),
+        'returns': pd.DataFrame(P, index=returns_index, columns=names),
+        'summary': summary
+    }
+
+def value_portfolios(shares, prices):
+    """Valeur actuelle de chaque portefeuille : actions (K × N) @ cours en EUR (N)"""
+    p = prices.reindex(shares.columns).to_numpy(dtype='float64')
+    return pd.Series(shares.to_numpy() @ np.nan_to_num(p), index=shares.index, name='valeur_actuelle')
+
+@st.cache_resource
+def get_multi_portfolio_engine():
+    """Évaluations multi-portefeuilles partagées par toutes les sessions, par (matrice et sa version, début, poids, capitaux)"""
+    return ResultCache(max_cached=16)
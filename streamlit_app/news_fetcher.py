@@ -0,0 +1,122 @@
+# news_fetcher.py
+import calendar
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+import feedparser
+import requests
+import streamlit as st
+
+# Délai maximal d'une requête de flux (connexion + lecture)
+FEED_TIMEOUT = 4
+
+# Délai global d'une agrégation : la page n'attend jamais plus longtemps
+NEWS_DEADLINE = 6
+
+# Durée pendant laquelle les entrées d'un flux sont réutilisées sans requête
+FEED_TTL = 600
+
+MAX_WORKERS = 12
+
+USER_AGENT = "Mozilla/5.0 (compatible; Finance-Co news reader)"
+
+def parse_entries(content):
+    """Entrées d'un flux RSS/Atom sous forme de dictionnaires simples, horodatées en UTC"""
+    feed = feedparser.parse(content)
+    feed_title = feed.feed.get('title') if hasattr(feed, 'feed') else None
+    entries = []
+    for entry in feed.entries:
+        published = entry.get('published_parsed') or entry.get('updated_parsed')
+        if not entry.get('title') or published is None:
+            continue
+        source = entry.get('source')
+        entries.append({
+            'title': entry.title,
+            'link': entry.get('link', ''),
+            'published': datetime.utcfromtimestamp(calendar.timegm(published)),
+            'source': source.get('title') if source else (feed_title or 'Source financière')
+        })
+    return entries
+
+class NewsFetcher:
+    """Récupération parallèle des flux, bornée dans le temps, avec GET conditionnel et cache par flux"""
+
+    def __init__(self, ttl=FEED_TTL, timeout=FEED_TIMEOUT, max_workers=MAX_WORKERS):
+        self.ttl = ttl
+        self.timeout = timeout
+        # Pool persistant : un flux qui dépasse le délai global termine en arrière-plan et remplit le cache
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="news-fetch")
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = USER_AGENT
+        self._feeds = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def cached(self, url):
+        """Entrées connues d'un flux, même périmées (liste vide si jamais chargé)"""
+        feed = self._feeds.get(url)
+        return feed['entries'] if feed else []
+
+    def _is_fresh(self, url):
+        feed = self._feeds.get(url)
+        return feed is not None and (datetime.now() - feed['checked_at']).total_seconds() < self.ttl
+
+    def fetch_feed(self, url):
+        """Télécharge un flux ; 304 Not Modified réutilise les entrées déjà analysées"""
+        feed = self._feeds.get(url)
+        headers = {}
+        if feed is not None:
+            if feed.get('etag'):
+                headers['If-None-Match'] = feed['etag']
+            if feed.get('modified'):
+                headers['If-Modified-Since'] = feed['modified']
+
+        try:
+            response = self._session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and feed is not None:
+                entries = feed['entries']
+            elif response.ok:
+                entries = parse_entries(response.content)
+            else:
+                entries = feed['entries'] if feed else []
+            self._feeds[url] = {
+                'entries': entries,
+                'checked_at': datetime.now(),
+                'etag': response.headers.get('ETag') or (feed or {}).get('etag'),
+                'modified': response.headers.get('Last-Modified') or (feed or {}).get('modified')
+            }
+            return entries
+        except (requests.RequestException, ValueError):
+            return self.cached(url)
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def _submit(self, url):
+        """Une seule requête en cours par flux"""
+        with self._lock:
+            future = self._inflight.get(url)
+            if future is None or future.done():
+                future = self._pool.submit(self.fetch_feed, url)
+                self._inflight[url] = future
+        return future
+
+    def fetch_all(self, urls, deadline=NEWS_DEADLINE):
+        """Entrées de tous les flux en au plus `deadline` secondes ; les flux en retard servent leur cache"""
+        futures = {url: self._submit(url) for url in urls if not self._is_fresh(url)}
+        if futures:
+            wait(futures.values(), timeout=deadline)
+
+        results = {}
+        for url in urls:
+            future = futures.get(url)
+            if future is not None and future.done() and future.exception() is None:
+                results[url] = future.result()
+            else:
+                results[url] = self.cached(url)
+        return results
+
+@st.cache_resource
+def get_news_fetcher():
+    """Récupérateur de flux partagé par toutes les sessions"""
+    return NewsFetcher()
@@ -0,0 +1,204 @@
+# news_index.py
+import hashlib
+import re
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import quote_plus
+import streamlit as st
+from company_index import normalize_name
+from news_fetcher import get_news_fetcher
+
+# Période d'ingestion des flux en arrière-plan
+NEWS_REFRESH_INTERVAL = 600
+
+# Délai accordé à un cycle d'ingestion complet
+INGEST_DEADLINE = 60
+
+# Durée de conservation des entrées dans l'index
+NEWS_RETENTION = timedelta(days=7)
+
+# Fenêtre affichée par défaut sur la page entreprise
+NEWS_WINDOW = timedelta(hours=48)
+
+# Nombre de tickers par flux Yahoo multi-valeurs
+YAHOO_BATCH = 10
+
+# Flux généralistes partagés par toutes les valeurs
+MARKET_FEEDS = [
+    "https://feeds.marketwatch.com/marketwatch/realtimeheadlines",
+    "https://feeds.marketwatch.com/marketwatch/marketpulse",
+    "https://www.investing.com/rss/news_25.rss",
+]
+
+# Noms d'usage absents des raisons sociales
+NEWS_ALIASES = {
+    "GOOGL": ["Google"],
+    "AMZN": ["Amazon"],
+    "BAC": ["BofA"],
+    "CP": ["CPKC"],
+    "CFR.SW": ["Richemont"],
+    "EL.PA": ["Essilor"],
+    "URW.PA": ["Unibail"],
+    "GTT.PA": ["GTT"],
+    "GBLB.BR": ["GBL"],
+    "IHG.L": ["IHG"],
+    "RR.L": ["Rolls-Royce"],
+    "MQG.AX": ["Macquarie"],
+    "DTE.DE": ["Telekom"],
+    "VIE.PA": ["Veolia"],
+}
+
+def entry_key(entry):
+    """Empreinte de déduplication : titre normalisé (même article relayé par plusieurs flux), à défaut lien"""
+    basis = normalize_name(entry.get('title')) or entry.get('link', '')
+    return hashlib.sha1(basis.encode('utf-8')).hexdigest()
+
+def universe_feeds(companies):
+    """Flux à ingérer pour tout l'univers : généralistes, Yahoo par lots, recherche Google par valeur"""
+    tickers = list(companies.values())
+    feeds = list(MARKET_FEEDS)
+    for i in range(0, len(tickers), YAHOO_BATCH):
+        symbols = ','.join(tickers[i:i + YAHOO_BATCH])
+        feeds.append(f"https://feeds.finance.yahoo.com/rss/2.0/headline?s={symbols}&region=US&lang=en-US")
+    for name in companies:
+        feeds.append(f"https://news.google.com/rss/search?q={quote_plus(name + ' stock')}&hl=en")
+    return feeds
+
+class EntityMatcher:
+    """Reconnaissance de toutes les valeurs suivies dans un titre, en un seul passage sur ses mots"""
+
+    def __init__(self, companies, aliases=NEWS_ALIASES):
+        # Premier mot -> phrases candidates (mots, ticker), les plus longues d'abord
+        self._phrases = {}
+        for name, ticker in companies.items():
+            for alias in [name] + aliases.get(ticker, []):
+                words = normalize_name(alias).split()
+                # "Deere & Company" -> "deere and" : connecteur final retiré
+                while words and words[-1] in ('and', 'of'):
+                    words.pop()
+                words = tuple(words)
+                if words:
+                    self._phrases.setdefault(words[0], []).append((words, ticker))
+        for candidates in self._phrases.values():
+            candidates.sort(key=lambda c: len(c[0]), reverse=True)
+
+        # Tickers américains cités tels quels (majuscules, au moins trois lettres) : "IBM", "QCOM"
+        self._symbols = {
+            ticker: ticker for ticker in companies.values()
+            if '.' not in ticker and ticker.isalpha() and len(ticker) >= 3
+        }
+
+    def match(self, title):
+        """Tickers cités dans le titre"""
+        found = set()
+        words = normalize_name(title).split()
+        for i, word in enumerate(words):
+            for phrase, ticker in self._phrases.get(word, ()):
+                if tuple(words[i:i + len(phrase)]) == phrase:
+                    found.add(ticker)
+                    break
+        for token in re.findall(r'\b[A-Z]{3,}\b', title or ''):
+            ticker = self._symbols.get(token)
+            if ticker is not None:
+                found.add(ticker)
+        return found
+
+class NewsIndex:
+    """Index des actualités dédupliquées de tout l'univers, interrogé par ticker"""
+
+    def __init__(self, companies, fetcher=None, feeds=None):
+        self.companies = dict(companies)
+        self.fetcher = fetcher or get_news_fetcher()
+        self.feeds = feeds or universe_feeds(self.companies)
+        self.matcher = EntityMatcher(self.companies)
+        self.updated_at = None
+        self.ingestor = None
+        self._entries = {}
+        self._by_ticker = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """Vrai après le premier cycle d'ingestion"""
+        return self.updated_at is not None
+
+    def add_entries(self, entries):
+        """Ajoute des entrées (les doublons sont ignorés) ; retourne le nombre de nouvelles entrées"""
+        added = 0
+        with self._lock:
+            for entry in entries:
+                key = entry_key(entry)
+                if key in self._entries:
+                    continue
+                tickers = self.matcher.match(entry['title'])
+                self._entries[key] = dict(entry, tickers=tickers)
+                for ticker in tickers:
+                    self._by_ticker.setdefault(ticker, set()).add(key)
+                added += 1
+        return added
+
+    def prune(self, now=None):
+        """Retire les entrées plus anciennes que la durée de conservation"""
+        cutoff = (now or datetime.utcnow()) - NEWS_RETENTION
+        with self._lock:
+            expired = [key for key, entry in self._entries.items() if entry['published'] < cutoff]
+            for key in expired:
+                for ticker in self._entries.pop(key)['tickers']:
+                    self._by_ticker[ticker].discard(key)
+
+    def ingest(self):
+        """Un cycle : tous les flux partagés récupérés une fois, puis indexés"""
+        feeds = self.fetcher.fetch_all(self.feeds, deadline=INGEST_DEADLINE)
+        for entries in feeds.values():
+            self.add_entries(entries)
+        self.prune()
+        self.updated_at = datetime.now()
+
+    def news_for(self, ticker, window=NEWS_WINDOW, limit=None):
+        """Actualités d'une valeur, des plus récentes aux plus anciennes (horodatage réel)"""
+        cutoff = datetime.utcnow() - window
+        with self._lock:
+            entries = [self._entries[key] for key in self._by_ticker.get(ticker, ())]
+        entries = sorted(
+            (e for e in entries if e['published'] >= cutoff),
+            key=lambda e: e['published'],
+            reverse=True
+        )[:limit]
+        return [
+            {
+                'title': e['title'],
+                'link': e['link'],
+                'date': e['published'].strftime("%d/%m/%Y %H:%M"),
+                'source': e['source']
+            }
+            for e in entries
+        ]
+
+class NewsIngestor(threading.Thread):
+    """Thread d'arrière-plan qui alimente périodiquement l'index d'actualités"""
+
+    def __init__(self, index, interval=NEWS_REFRESH_INTERVAL):
+        super().__init__(name="news-ingestor", daemon=True)
+        self.index = index
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                self.index.ingest()
+            except Exception:
+                pass
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+
+@st.cache_resource
+def get_news_index():
+    """Index d'actualités unique pour le processus, alimenté en arrière-plan"""
+    from stock_analyzer import TRACKED_COMPANIES
+    index = NewsIndex(TRACKED_COMPANIES)
+    index.ingestor = NewsIngestor(index)
+    index.ingestor.start()
+    return index
@@ -0,0 +1,220 @@
+# optimizer.py
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+import streamlit as st
+from risk_engine import RISK_FREE_RATE
+from result_cache import ResultCache
+
+# Nombre de points de la frontière efficiente
+FRONTIER_POINTS = 25
+
+# Taille du nuage de portefeuilles aléatoires
+RANDOM_PORTFOLIOS = 5000
+
+SOLVER_OPTIONS = {'maxiter': 500, 'ftol': 1e-9}
+
+def random_portfolios(mean_returns, covariance, n=RANDOM_PORTFOLIOS, seed=42, risk_free=RISK_FREE_RATE):
+    """Nuage de portefeuilles long-only tirés uniformément sur le simplexe (rendement, volatilité, Sharpe)"""
+    rng = np.random.default_rng(seed)
+    mu = np.asarray(mean_returns, dtype='float64')
+    cov = np.asarray(covariance, dtype='float64')
+    weights = rng.dirichlet(np.ones(len(mu)), size=n)
+    returns = weights @ mu
+    # Variance de chaque portefeuille : diag(W Σ Wᵀ) sans former la matrice n × n
+    volatility = np.sqrt(np.einsum('ij,jk,ik->i', weights, cov, weights))
+    return pd.DataFrame({
+        'rendement': returns,
+        'volatilite': volatility,
+        'sharpe': (returns - risk_free) / volatility
+    })
+
+class PortfolioOptimizer:
+    """Optimisation moyenne-variance sous contraintes (long-only, plafonds par valeur et par secteur)"""
+
+    def __init__(self, mean_returns, covariance, sectors=None, long_only=True,
+                 max_weight=None, sector_caps=None, risk_free=RISK_FREE_RATE):
+        self.assets = list(covariance.columns)
+        self.mu = np.asarray(pd.Series(mean_returns).reindex(self.assets), dtype='float64')
+        self.cov = np.asarray(covariance, dtype='float64')
+        # Covariance normalisée pour le solveur (tolérance absolue sur des variances de l'ordre de 1e-4)
+        self.scaled_cov = self.cov / np.mean(np.diag(self.cov))
+        self.risk_free = risk_free
+        n = len(self.assets)
+
+        lower = 0.0 if long_only else -1.0
+        upper = max_weight if max_weight is not None else 1.0
+        if upper * n < 1 - 1e-9:
+            raise ValueError(f"Plafond par valeur de {upper:.0%} insuffisant pour {n} valeurs")
+        self.bounds = [(lower, upper)] * n
+
+        self.lower, self.upper = lower, upper
+
+        # Plafonds sectoriels : matrice d'appartenance (secteurs × actifs) et plafonds
+        self.sector_matrix = np.zeros((0, n))
+        self.sector_limits = np.zeros(0)
+        if sector_caps:
+            sectors = pd.Series(sectors).reindex(self.assets).fillna('Non classifié')
+            if isinstance(sector_caps, (int, float)):
+                sector_caps = {sector: float(sector_caps) for sector in sectors.unique()}
+            # Capacité réelle d'un secteur : son plafond, limité par le plafond par valeur de ses membres
+            counts = sectors.value_counts()
+            capacity = sum(min(sector_caps.get(s, 1.0), count * upper) for s, count in counts.items())
+            if capacity < 1 - 1e-9:
+                raise ValueError(
+                    f"Plafonds insuffisants pour investir 100 % du capital "
+                    f"(au plus {capacity:.0%} avec ces plafonds par valeur et par secteur)"
+                )
+            capped = [s for s in sector_caps if (sectors == s).any()]
+            self.sector_matrix = np.array([(sectors == s).to_numpy(dtype='float64') for s in capped]).reshape(-1, n)
+            self.sector_limits = np.array([sector_caps[s] for s in capped], dtype='float64')
+
+        # Contraintes linéaires : somme des poids = 1, plafonds sectoriels (plafond - somme >= 0)
+        self.constraints = [{'type': 'eq', 'fun': lambda w: w.sum() - 1, 'jac': lambda w: np.ones((1, n))}]
+        if len(self.sector_limits):
+            self.constraints.append({
+                'type': 'ineq',
+                'fun': lambda w: self.sector_limits - self.sector_matrix @ w,
+                'jac': lambda w: -self.sector_matrix
+            })
+
+    def _start(self):
+        """Point de départ réalisable : équipondéré"""
+        return np.full(len(self.assets), 1 / len(self.assets))
+
+    def _solve(self, objective, jacobian, extra_constraints=(), start=None):
+        result = minimize(
+            objective,
+            self._start() if start is None else start,
+            jac=jacobian,
+            method='SLSQP',
+            bounds=self.bounds,
+            constraints=self.constraints + list(extra_constraints),
+            options=SOLVER_OPTIONS
+        )
+        if not result.success:
+            raise ValueError(f"Optimisation non convergée : {result.message}")
+        return result.x
+
+    def stats(self, weights):
+        """Rendement, volatilité et Sharpe annualisés d'un vecteur de poids"""
+        ret = float(weights @ self.mu)
+        vol = float(np.sqrt(weights @ self.cov @ weights))
+        return {'rendement': ret, 'volatilite': vol, 'sharpe': (ret - self.risk_free) / vol if vol > 0 else np.nan}
+
+    def min_variance(self):
+        """Portefeuille de variance minimale"""
+        cov = self.scaled_cov
+        return self._solve(lambda w: w @ cov @ w, lambda w: 2 * cov @ w)
+
+    def max_sharpe(self):
+        """Portefeuille tangent (ratio de Sharpe maximal), reformulé en programme quadratique convexe
+
+        Avec y = κ·w et (μ - rf)·y = 1, maximiser le Sharpe revient à minimiser yᵀΣy ;
+        les contraintes de somme et de plafonds deviennent linéaires en (y, κ).
+        """
+        excess = self.mu - self.risk_free
+        if not (excess > 0).any():
+            return self.min_variance()
+        n = len(self.assets)
+        cov = self.scaled_cov
+
+        constraints = [
+            {'type': 'eq', 'fun': lambda x: excess @ x[:n] - 1,
+             'jac': lambda x: np.append(excess, 0.0)[None, :]},
+            {'type': 'eq', 'fun': lambda x: x[:n].sum() - x[n],
+             'jac': lambda x: np.append(np.ones(n), -1.0)[None, :]},
+        ]
+        if self.upper < 1:
+            # y_i <= plafond · κ
+            cap_jac = np.hstack([-np.eye(n), np.full((n, 1), self.upper)])
+            constraints.append({'type': 'ineq', 'fun': lambda x: self.upper * x[n] - x[:n], 'jac': lambda x: cap_jac})
+        if len(self.sector_limits):
+            sector_jac = np.hstack([-self.sector_matrix, self.sector_limits[:, None]])
+            constraints.append({
+                'type': 'ineq',
+                'fun': lambda x: self.sector_limits * x[n] - self.sector_matrix @ x[:n],
+                'jac': lambda x: sector_jac
+            })
+
+        # Départ : portefeuille équipondéré remis à l'échelle
+        w0 = self._start()
+        kappa0 = 1 / max(excess @ w0, 1e-6)
+        lower = None if self.lower < 0 else 0.0
+        result = minimize(
+            lambda x: x[:n] @ cov @ x[:n],
+            np.append(w0 * kappa0, kappa0),
+            jac=lambda x: np.append(2 * cov @ x[:n], 0.0),
+            method='SLSQP',
+            bounds=[(lower, None)] * n + [(0.0, None)],
+            constraints=constraints,
+            options=SOLVER_OPTIONS
+        )
+        if not result.success or result.x[n] <= 0:
+            raise ValueError(f"Optimisation du ratio de Sharpe non convergée : {result.message}")
+        # Retour aux poids : w = y / κ (somme des y égale à κ)
+        return result.x[:n] / result.x[n]
+
+    def risk_parity(self):
+        """Portefeuille à contributions au risque égales"""
+        n = len(self.assets)
+
+        def objective(w):
+            contributions = w * (self.cov @ w)
+            return float(np.sum((contributions / contributions.sum() - 1 / n) ** 2))
+
+        def jacobian(w):
+            cov_w = self.cov @ w
+            contributions = w * cov_w
+            total = contributions.sum()
+            d = 2 * (contributions / total - 1 / n)
+            return (d * cov_w + self.cov @ (d * w)) / total - 2 * (d @ contributions) * cov_w / total ** 2
+
+        # Départ inverse-volatilité, proche de la solution
+        inverse_vol = 1 / np.sqrt(np.diag(self.cov))
+        return self._solve(objective, jacobian, start=inverse_vol / inverse_vol.sum())
+
+    def max_return(self):
+        """Portefeuille de rendement maximal sous les contraintes (borne haute de la frontière)"""
+        return self._solve(lambda w: -(w @ self.mu), lambda w: -self.mu)
+
+    def efficient_frontier(self, n_points=FRONTIER_POINTS):
+        """Frontière efficiente : variance minimale pour des rendements cibles croissants"""
+        low = self.min_variance()
+        high = self.max_return()
+        targets = np.linspace(low @ self.mu, high @ self.mu, n_points)
+        points = []
+        weights = low
+        cov = self.scaled_cov
+        for target in targets:
+            try:
+                weights = self._solve(
+                    lambda w: w @ cov @ w,
+                    lambda w: 2 * cov @ w,
+                    extra_constraints=[{'type': 'eq', 'fun': lambda w, t=target: w @ self.mu - t, 'jac': lambda w: self.mu}],
+                    start=weights  # départ à chaud depuis le point précédent
+                )
+            except ValueError:
+                # Cible non atteinte par le solveur : point omis plutôt qu'approché
+                continue
+            points.append(self.stats(weights))
+        return pd.DataFrame(points)
+
+    def run(self, n_points=FRONTIER_POINTS, n_random=RANDOM_PORTFOLIOS):
+        """Frontière, portefeuilles remarquables et nuage aléatoire"""
+        portfolios = {
+            'Variance minimale': self.min_variance(),
+            'Sharpe maximal': self.max_sharpe(),
+            'Parité de risque': self.risk_parity()
+        }
+        return {
+            'frontier': self.efficient_frontier(n_points),
+            'weights': pd.DataFrame(portfolios, index=self.assets),
+            'portfolios': pd.DataFrame({name: self.stats(w) for name, w in portfolios.items()}).T,
+            'cloud': random_portfolios(self.mu, self.cov, n_random, risk_free=self.risk_free)
+        }
+
+@st.cache_resource
+def get_optimization_cache():
+    """Optimisations partagées par toutes les sessions, par (matrice et sa version, début, contraintes)"""
+    return ResultCache(max_cached=32)
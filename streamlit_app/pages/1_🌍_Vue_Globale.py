@@ -1,9 +1,10 @@
 # pages/1_🌍_Vue_Globale.py
 import streamlit as st
-import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from market_analyzer import MarketAnalyzer
+from market_analyzer import get_market_analyzer, invalidate_market_analyzer
+from figure_cache import TREEMAP_MAX_LEAVES
+from scoring import FACTOR_CATALOG, NORMALIZATIONS, make_score_config
 from utils import add_news_ticker, render_footer
 
 def configure_page():
@@ -83,8 +84,8 @@ def main():
     add_news_ticker()
     st.title("🌍 Vue Globale du Marché")
     
-    # Initialisation de l'analyseur
-    analyzer = MarketAnalyzer()
+    # Analyseur partagé (chargé une seule fois par version de données)
+    analyzer = get_market_analyzer()
     
     if analyzer.market_data is not None and not analyzer.market_data.empty:
         # Filtres dans la barre latérale
@@ -116,22 +117,54 @@ def main():
                 max_value=int(max_cap/1e6),
                 value=(int(min_cap/1e6), int(max_cap/1e6))
             )
+            
+            # Niveau de détail de la cartographie
+            detail_level = st.select_slider(
+                "Niveau de détail (valeurs affichées)",
+                options=[100, 250, 500, 1000, "Toutes"],
+                value=TREEMAP_MAX_LEAVES,
+                help="Les plus petites capitalisations sont regroupées en « Autres » par industrie"
+            )
+            max_leaves = None if detail_level == "Toutes" else detail_level
+
+            # Composition du score (facteurs, poids, normalisation)
+            st.header("Score")
+            selected_factors = st.multiselect(
+                "Facteurs",
+                options=list(FACTOR_CATALOG),
+                default=['PER_historique', 'Rendement_du_dividende'],
+                format_func=lambda column: FACTOR_CATALOG[column][0]
+            )
+            default_weights = {'PER_historique': 40, 'Rendement_du_dividende': 60}
+            factor_weights = {
+                column: st.slider(
+                    f"Poids {FACTOR_CATALOG[column][0]} (%)", 0, 100, default_weights.get(column, 50), step=5
+                )
+                for column in selected_factors
+            }
+            normalization = st.radio("Normalisation", list(NORMALIZATIONS), horizontal=True)
+            by_sector = st.checkbox("Normaliser au sein de chaque secteur")
+            try:
+                score_config = make_score_config(factor_weights, NORMALIZATIONS[normalization], by_sector)
+            except ValueError as e:
+                st.warning(str(e))
+                score_config = None
+            
+            st.caption(f"Version des données : {analyzer.data_version}")
+            if st.button("🔄 Recharger les données"):
+                invalidate_market_analyzer()
+                st.rerun()
         
-        # Application des filtres
-        filtered_data = analyzer.market_data.copy()
-        
-        if selected_sectors:
-            filtered_data = filtered_data[filtered_data['Secteur'].isin(selected_sectors)]
-        if selected_countries:
-            filtered_data = filtered_data[filtered_data['Pays'].isin(selected_countries)]
-        if cap_range:
-            filtered_data = filtered_data[
-                (filtered_data['Capitalisation_boursiere'] >= cap_range[0] * 1e6) &
-                (filtered_data['Capitalisation_boursiere'] <= cap_range[1] * 1e6)
-            ]
+        # Application des filtres via l'index précalculé (positions mises en cache par combinaison)
+        filters = dict(
+            sectors=selected_sectors,
+            countries=selected_countries,
+            cap_range=(cap_range[0] * 1e6, cap_range[1] * 1e6) if cap_range else None
+        )
+        filtered_data = analyzer.get_filtered_data(**filters)
         
-        # Métriques principales en cards modernes
-        metrics = analyzer.calculate_market_metrics(filtered_data)
+        # Métriques principales en cards modernes (agrégats précalculés)
+        metrics = analyzer.get_market_metrics(**filters)
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
@@ -181,13 +214,17 @@ def main():
                 
                 with col1:
                     st.markdown("""
-                    Le score affiché dans la cartographie est un indicateur composite (0-100) qui combine :
+                    Le score affiché dans la cartographie est un indicateur composite (0-100) dont
+                    la composition se règle dans la barre latérale. Par défaut, il combine :
                     - **40%** : PER (Price Earnings Ratio)
                         - Un PER plus bas donne un meilleur score
                         - Reflète la valorisation de l'entreprise
                     - **60%** : Rendement du dividende
                         - Un rendement plus élevé donne un meilleur score
                         - Reflète la rémunération des actionnaires
+
+                    Chaque facteur est noté par son rang (percentile) ou son z-score, sur tout
+                    l'univers ou au sein du secteur ; un PER négatif ou manquant reçoit une note neutre.
                     
                     🎯 **Interprétation des couleurs :**
                     - 🔵 Bleu foncé : Score élevé (entreprise potentiellement intéressante)
@@ -198,19 +235,10 @@ def main():
                 with col2:
                     st.plotly_chart(analyzer.create_sector_sunburst(), use_container_width=True)
 
-            # Treemap amélioré
-            fig_treemap = px.treemap(
-                filtered_data,
-                path=['Secteur', 'Industrie', 'Nom_complet'],
-                values='Capitalisation_boursiere',
-                color='Score',
-                color_continuous_scale='RdYlBu',
-                hover_data=['Ticker', 'Prix_actuel', 'PER_historique', 'Rendement_du_dividende'],
-                title='Cartographie du Marché par Capitalisation'
-            )
-            
-            fig_treemap.update_layout(height=600)
-            st.plotly_chart(fig_treemap, use_container_width=True)
+            # Treemap amélioré (figure mise en cache, traîne regroupée selon le niveau de détail)
+            if score_config is not None:
+                fig_treemap = analyzer.create_score_treemap(max_leaves=max_leaves, score_config=score_config, **filters)
+                st.plotly_chart(fig_treemap, use_container_width=True)
         
         with tab2:
             # Création d'un subplot avec 2 graphiques côte à côte
@@ -276,6 +304,27 @@ def main():
                 ),
                 height=400
             )
+            
+            # Classement par score (notes par facteur issues du moteur de scores en cache)
+            if score_config is not None:
+                st.subheader("Classement par score")
+                ranking = analyzer.get_score_ranking(score_config, n=50, **filters)
+                note_columns = ranking.columns.difference(['Ticker', 'Nom_complet', 'Secteur'])
+                st.dataframe(
+                    ranking.style.format({col: '{:.1f}' for col in note_columns}).background_gradient(
+                        subset=['Score'], cmap='RdYlBu'
+                    ),
+                    hide_index=True,
+                    height=400
+                )
+            
+            with st.expander("💾 Empreinte mémoire des données"):
+                report = analyzer.memory_report()
+                st.caption(f"Total : {report['Octets'].sum() / 1e6:.2f} Mo")
+                st.dataframe(
+                    report.style.format({'Octets': '{:,.0f}', 'Part (%)': '{:.1f}'}),
+                    use_container_width=True
+                )
     
     else:
         st.error("Aucune donnée n'a pu être chargée. Veuillez vérifier le fichier de données.")
@@ -1,8 +1,12 @@
 import streamlit as st
+import pandas as pd
 from datetime import datetime, timedelta
 from portfolio_analyzer import PortfolioAnalyzer, add_technical_analysis
-from portfolio_manager import PortfolioManager
-from utils import add_news_ticker, render_footer
+from portfolio_manager import PortfolioManager, BACKTEST_STRATEGIES, OPTIMIZED_STRATEGIES, IN_SAMPLE_STRATEGIES
+from backtest import REBALANCING_SCHEDULES
+from monte_carlo import SIMULATION_METHODS
+from clustering import DEFAULT_CLUSTERS
+from utils import add_news_ticker, render_footer, format_age
 
 def configure_page():
     st.set_page_config(
@@ -86,11 +90,14 @@ def main():
         st.error("Impossible de charger les données du portefeuille")
         return
     
-    # Date de valorisation
-    st.caption(f"Valorisation au {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    
-    # Calculer la valeur actuelle du portefeuille
+    # Calculer la valeur actuelle du portefeuille (cours lus dans le magasin partagé)
     valeur_totale, variation = tracker.get_current_portfolio_value()
+    
+    # Date de valorisation et âge des cours
+    st.caption(
+        f"Valorisation au {datetime.now().strftime('%d/%m/%Y %H:%M')} · "
+        f"cours actualisés {format_age(tracker.get_quotes_age())}"
+    )
 
     # KPIs principaux
     kpi1, kpi2, kpi3, kpi4, kpi5 = st.columns(5)
@@ -106,12 +113,20 @@ def main():
         )
 
     with kpi2:
-        beta_portfolio = portfolio['Bêta'].mean()
+        # Bêta réalisé face à l'indice de référence, à défaut moyenne des bêtas du CSV
+        try:
+            beta_portfolio = tracker.get_risk_report()['beta']
+        except Exception:
+            beta_portfolio = float('nan')
+        beta_label = "Risque marché (réalisé)"
+        if pd.isna(beta_portfolio):
+            beta_portfolio = portfolio['Bêta'].mean()
+            beta_label = "Risque marché"
         getattr(st, "info")(
             f"""
             **📊 Beta**
             ### {beta_portfolio:.2f}
-            Risque marché
+            {beta_label}
             """
         )
 
@@ -145,7 +160,10 @@ def main():
         )
 
     # Onglets
-    tab1, tab2, tab3 = st.tabs(["📈 Vue d'ensemble", "📊 Performance", "💫 Simulation"])
+    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
+        ["📈 Vue d'ensemble", "📊 Performance", "💫 Simulation", "🎯 Optimisation", "🧬 Diversification",
+         "🗂️ Portefeuilles modèles"]
+    )
     
     with tab1:
         # Vue d'ensemble du portefeuille
@@ -229,6 +247,195 @@ def main():
         </style>
         """, unsafe_allow_html=True)
 
+        # Backtest de stratégies rééquilibrées depuis la date choisie
+        st.subheader("🧪 Backtest de stratégies")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            strategy = st.selectbox("Stratégie", BACKTEST_STRATEGIES)
+        with col2:
+            schedule_label = st.selectbox("Rééquilibrage", list(REBALANCING_SCHEDULES) + ["Seuil"])
+        with col3:
+            threshold = st.slider("Seuil d'écart de poids (%)", 1, 10, 2,
+                                  disabled=schedule_label != "Seuil") / 100
+        with col4:
+            cost_bps = st.number_input("Coûts de transaction (pb)", 0, 100, 10)
+
+        try:
+            backtest = tracker.run_backtest(
+                date_invested,
+                strategy=strategy,
+                schedule=REBALANCING_SCHEDULES.get(schedule_label),
+                threshold=threshold if schedule_label == "Seuil" else None,
+                cost_bps=cost_bps
+            )
+            st.plotly_chart(tracker.create_backtest_chart(backtest, strategy), use_container_width=True)
+            bt1, bt2, bt3, bt4, bt5 = st.columns(5)
+            bt1.metric("Performance", f"{backtest['total_return']:+.2%}")
+            bt2.metric("Rendement annualisé", f"{backtest['cagr']:+.2%}")
+            bt3.metric("Volatilité", f"{backtest['volatility']:.2%}")
+            bt4.metric("Drawdown maximum", f"{backtest['max_drawdown']:.2%}")
+            bt5.metric("Dividendes / coûts", f"{backtest['dividends']:,.0f}€", f"-{backtest['costs']:,.0f}€")
+            st.caption(f"{backtest['rebalances']} rééquilibrage(s), dividendes réinvestis au rééquilibrage suivant")
+            if strategy in OPTIMIZED_STRATEGIES:
+                st.caption("Poids réestimés à chaque rééquilibrage sur les seuls cours connus à cette date.")
+            if strategy in IN_SAMPLE_STRATEGIES:
+                st.warning("Courbe in-sample : le Score du jour est appliqué à tout l'historique "
+                           "(biais d'anticipation, à ne pas lire comme une performance réalisable).")
+        except ValueError as e:
+            st.warning(str(e))
+
+        # Projection Monte Carlo de la valeur du portefeuille
+        st.subheader("🔮 Projection Monte Carlo")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            method_label = st.selectbox("Méthode", list(SIMULATION_METHODS))
+        with col2:
+            years = st.slider("Horizon (années)", 1, 10, 1)
+        with col3:
+            n_paths = st.select_slider("Trajectoires", [1_000, 10_000, 50_000, 100_000], value=10_000)
+
+        with st.spinner("Simulation en cours..."):
+            projection = tracker.get_projection(SIMULATION_METHODS[method_label], years, n_paths)
+        st.plotly_chart(tracker.create_projection_charts(projection), use_container_width=True)
+        mc1, mc2, mc3, mc4 = st.columns(4)
+        mc1.metric("Valeur médiane", f"{projection['median']:,.0f}€")
+        mc2.metric("Valeur moyenne", f"{projection['mean']:,.0f}€")
+        mc3.metric("Probabilité de perte", f"{projection['prob_loss']:.1%}")
+        mc4.metric("VaR 95 % à l'horizon", f"{projection['var_95']:,.0f}€")
+
+    with tab4:
+        col1, col2 = st.columns(2)
+        with col1:
+            max_weight = st.slider("Poids maximal par valeur (%)", 2, 100, 10) / 100
+        with col2:
+            sector_cap = st.slider("Poids maximal par secteur (%)", 10, 100, 40) / 100
+
+        try:
+            with st.spinner("Optimisation en cours..."):
+                optimization = tracker.get_optimization(
+                    max_weight=max_weight if max_weight < 1 else None,
+                    sector_cap=sector_cap if sector_cap < 1 else None
+                )
+            risk = tracker.get_risk_report()
+            current = {
+                'rendement': risk['annual_return'],
+                'volatilite': risk['volatility'],
+                'sharpe': risk['sharpe']
+            }
+            st.plotly_chart(tracker.create_frontier_chart(optimization, current), use_container_width=True)
+
+            st.subheader("Portefeuilles optimaux")
+            st.dataframe(
+                optimization['portfolios'].style.format({
+                    'rendement': '{:.2%}',
+                    'volatilite': '{:.2%}',
+                    'sharpe': '{:.2f}'
+                }),
+                use_container_width=True
+            )
+            weights = optimization['weights']
+            weights = weights[(weights > 0.001).any(axis=1)].sort_values('Sharpe maximal', ascending=False)
+            st.dataframe(
+                weights.style.format('{:.2%}').background_gradient(cmap='YlOrRd'),
+                use_container_width=True,
+                height=400
+            )
+        except ValueError as e:
+            st.warning(str(e))
+
+    with tab5:
+        n_clusters = st.slider("Nombre de groupes de corrélation", 2, 15, DEFAULT_CLUSTERS)
+        clustering = tracker.get_clustering(n_clusters)
+
+        div1, div2, div3 = st.columns(3)
+        div1.metric("Ratio de diversification", f"{clustering['diversification_ratio']:.2f}")
+        div2.metric("Corrélation moyenne", f"{clustering['average_correlation']:.2f}")
+        div3.metric("Groupes", f"{len(clustering['clusters'])}")
+        st.plotly_chart(
+            tracker.create_correlation_heatmap(clustering, "Corrélations des positions (ordre hiérarchique)"),
+            use_container_width=True
+        )
+        st.dataframe(
+            clustering['clusters'].style.format({'poids': '{:.1%}', 'correlation_moyenne': '{:.2f}'}),
+            hide_index=True,
+            use_container_width=True
+        )
+
+        # Univers filtré : recherche de candidats peu corrélés aux positions
+        st.subheader("Candidats de l'univers")
+        universe_size = st.select_slider("Univers analysé (plus grandes capitalisations)",
+                                         options=[100, 250, 500, 1000, "Tout"], value=250)
+        if st.button("Analyser l'univers"):
+            st.session_state['universe_size'] = universe_size
+        if st.session_state.get('universe_size') is not None:
+            size = st.session_state['universe_size']
+            with st.spinner("Analyse des corrélations de l'univers..."):
+                universe = tracker.get_universe_clustering(None if size == "Tout" else size, n_clusters)
+            st.plotly_chart(
+                tracker.create_correlation_heatmap(universe, f"Corrélations de l'univers ({len(universe['order'])} valeurs)"),
+                use_container_width=True
+            )
+            st.dataframe(
+                universe['candidates'][['Ticker', 'Nom_complet', 'Secteur', 'groupe', 'correlation_moyenne',
+                                        'correlation_max', 'Score']].style.format({
+                    'correlation_moyenne': '{:.2f}',
+                    'correlation_max': '{:.2f}',
+                    'Score': '{:.1f}'
+                }),
+                hide_index=True,
+                use_container_width=True
+            )
+
+    with tab6:
+        # Stratégies sur les positions et portefeuilles enregistrés, évalués ensemble
+        try:
+            with st.spinner("Évaluation des portefeuilles..."):
+                models = tracker.get_portfolios_report()
+            st.plotly_chart(tracker.create_portfolios_chart(models), use_container_width=True)
+            summary = models['summary'].assign(valeur_actuelle=models['current'])
+            st.dataframe(
+                summary[['valeur_initiale', 'valeur_actuelle', 'performance', 'rendement', 'volatilite',
+                         'sharpe', 'beta', 'var_historique', 'max_drawdown', 'positions']].style.format({
+                    'valeur_initiale': '{:,.0f}€',
+                    'valeur_actuelle': '{:,.0f}€',
+                    'performance': '{:+.2%}',
+                    'rendement': '{:.2%}',
+                    'volatilite': '{:.2%}',
+                    'sharpe': '{:.2f}',
+                    'beta': '{:.2f}',
+                    'var_historique': '{:.2%}',
+                    'max_drawdown': '{:.2%}'
+                }),
+                use_container_width=True
+            )
+            st.caption(
+                "Toutes les statistiques sont calculées sur les courbes achat-conservation affichées. "
+                "Les stratégies optimisées sont estimées sur les seuls cours antérieurs au début de la période."
+            )
+            if models['in_sample']:
+                st.warning(
+                    "Évaluation in-sample (poids connus après le début de la période) : "
+                    + ", ".join(models['in_sample'])
+                )
+        except ValueError as e:
+            st.warning(str(e))
+
+        # Enregistrement des poids d'une stratégie comme portefeuille modèle
+        st.subheader("Enregistrer un portefeuille modèle")
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col1:
+            model_strategy = st.selectbox("Stratégie source", BACKTEST_STRATEGIES, key='model_strategy')
+        with col2:
+            model_name = st.text_input("Nom du portefeuille", value=f"{model_strategy} {datetime.now():%Y-%m-%d}")
+        with col3:
+            st.markdown("<br>", unsafe_allow_html=True)  # Espacement
+            if st.button("💾 Enregistrer"):
+                try:
+                    tracker.save_model_portfolio(model_name, model_strategy)
+                    st.success(f"Portefeuille {model_name} enregistré")
+                except Exception as e:
+                    st.error(f"Enregistrement impossible : {str(e)}")
+
     render_footer()
 
 if __name__ == "__main__":
@@ -1,8 +1,12 @@
 import streamlit as st
-import yfinance as yf
+import pandas as pd
 import plotly.graph_objects as go
 from utils import add_news_ticker, render_footer
-from stock_analyzer import StockAnalyzer
+from stock_analyzer import get_stock_analyzer
+from news_index import get_news_index
+from history_store import get_history_store
+from downsampling import downsample_ohlcv
+from rolling_metrics import get_rolling_metrics, MOVING_AVERAGES, VOLATILITY_WINDOW, BETA_WINDOW
 
 def configure_page():
     st.set_page_config(
@@ -144,7 +148,7 @@ def main():
     add_news_ticker()
     st.title("🏢 Analyse des Entreprises")
     
-    analyzer = StockAnalyzer()
+    analyzer = get_stock_analyzer()
 
     selected_company = st.selectbox(
         "Sélectionnez une entreprise",
@@ -229,6 +233,8 @@ def main():
                         with cols[1]:
                             st.caption(f"Date: {article['date']}")
                         st.markdown(f"[Lire l'article]({article['link']})")
+            elif not get_news_index().ready:
+                st.info("Indexation des actualités en cours, elles seront disponibles dans quelques instants.")
             else:
                 st.info("Aucune actualité récente disponible.")
 
@@ -260,17 +266,26 @@ def main():
 
             periode = st.radio(
                 "Période",
-                ["1 mois", "6 mois", "1 an"],
+                ["1 mois", "6 mois", "1 an", "5 ans", "10 ans", "Max"],
                 horizontal=True
             )
             
             periods_map = {
-                "1 mois": "1mo",
-                "6 mois": "6mo",
-                "1 an": "1y"
+                "1 mois": pd.DateOffset(months=1),
+                "6 mois": pd.DateOffset(months=6),
+                "1 an": pd.DateOffset(years=1),
+                "5 ans": pd.DateOffset(years=5),
+                "10 ans": pd.DateOffset(years=10),
+                "Max": None
             }
             
-            hist = yf.Ticker(ticker).history(period=periods_map[periode])
+            # Historique lu dans le stock local : seules les séances manquantes sont téléchargées
+            offset = periods_map[periode]
+            start_date = pd.Timestamp.now().normalize() - offset if offset is not None else pd.Timestamp('1970-01-01')
+            hist = get_history_store().history(ticker, start_date)
+            
+            # Résolution choisie selon le budget de bougies (quotidien, hebdomadaire ou mensuel)
+            hist, resolution = downsample_ohlcv(hist)
             
             fig = go.Figure()
             fig.add_trace(go.Candlestick(
@@ -281,9 +296,25 @@ def main():
                 close=hist['Close'],
                 name=ticker
             ))
+
+            # Moyennes mobiles précalculées, lues aux dates des bougies
+            # Bêta mesuré face au benchmark converti dans la devise de cotation
+            row = analyzer.index.row(ticker)
+            currency = row.get('Devise') if row is not None else None
+            indicators = get_rolling_metrics().series(ticker, start_date, currency if isinstance(currency, str) else None)
+            if not indicators.empty:
+                for window, color in zip(MOVING_AVERAGES, ['#ff7f0e', '#9467bd', '#7f7f7f']):
+                    average = indicators[f'ma_{window}'].reindex(hist.index, method='ffill')
+                    fig.add_trace(go.Scatter(
+                        x=hist.index,
+                        y=average,
+                        mode='lines',
+                        name=f"MM {window}",
+                        line=dict(color=color, width=1)
+                    ))
             
             fig.update_layout(
-                title=f"Evolution du cours - {periode}",
+                title=f"Evolution du cours - {periode} (bougies {resolution})",
                 yaxis_title="Prix ($)",
                 xaxis_title="Date",
                 height=500
@@ -291,6 +322,13 @@ def main():
             
             st.plotly_chart(fig, use_container_width=True)
 
+            if not indicators.empty:
+                latest = indicators.iloc[-1]
+                ind_col1, ind_col2, ind_col3 = st.columns(3)
+                ind_col1.metric(f"Volatilité ({VOLATILITY_WINDOW} séances)", f"{latest['volatility']:.1%}")
+                ind_col2.metric(f"Bêta ({BETA_WINDOW} séances)", f"{latest['beta']:.2f}")
+                ind_col3.metric("Drawdown courant", f"{latest['drawdown']:.1%}")
+
     render_footer()
 
 if __name__ == "__main__":
@@ -2,10 +2,43 @@
 
 # Imports standard
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+# Colonnes du portefeuille -> clés des métriques
+METRIC_COLUMNS = {
+    'Prix actuel': 'prix',
+    'Variation 52 semaines': 'variation',
+    'Bêta': 'beta',
+    'Volume': 'volume',
+    'PER historique': 'per',
+    'Rendement du dividende': 'rendement',
+    'Capitalisation boursière': 'capitalisation',
+    'Secteur': 'secteur',
+    'Pays': 'pays'
+}
+
+# Ratios comparés à la moyenne et à la médiane du secteur
+SECTOR_RATIOS = ['per', 'beta', 'rendement', 'variation']
+
+# Libellés : métrique -> (source, seuil bas, seuil haut, (bas, moyen, haut))
+LABEL_RULES = {
+    'momentum': ('variation', -20, 20, ("Faible", "Neutre", "Fort")),
+    'valorisation': ('per', 15, 30, ("Attractive", "Moyenne", "Élevée")),
+    'risque': ('beta', 0.8, 1.2, ("Faible", "Moyen", "Élevé"))
+}
+
+def evaluate_labels(values, low, high, labels):
+    """Libellés de toute une colonne en une passe (« Non disponible » si manquant)"""
+    values = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+    return np.select(
+        [np.isnan(values), values < low, values > high],
+        ["Non disponible", labels[0], labels[2]],
+        default=labels[1]
+    )
+
 class PortfolioAnalyzer:
     """Analyseur pour le portefeuille spécifique"""
     
@@ -14,84 +47,41 @@ class PortfolioAnalyzer:
         portfolio_data: DataFrame contenant les données du portefeuille
         """
         self.stocks = portfolio_data
-        self.metrics = {}
         self._calculate_portfolio_metrics()
     
     def _calculate_portfolio_metrics(self):
-        """Calcule les métriques pour chaque action du portefeuille"""
-        for _, row in self.stocks.iterrows():
-            ticker = row['Ticker']
-            self.metrics[ticker] = {
-                'prix': row['Prix actuel'],
-                'variation': row['Variation 52 semaines'],
-                'beta': row['Bêta'],
-                'volume': row['Volume'],
-                'per': row['PER historique'],
-                'rendement': row['Rendement du dividende'],
-                'capitalisation': row['Capitalisation boursière'],
-                'secteur': row['Secteur'],
-                'pays': row['Pays']
-            }
+        """Métriques, libellés et références sectorielles de toutes les actions, en colonnes"""
+        metrics = self.stocks.set_index('Ticker')[list(METRIC_COLUMNS)].rename(columns=METRIC_COLUMNS)
+        # Un ticker en double garde sa dernière ligne
+        metrics = metrics[~metrics.index.duplicated(keep='last')]
+        for label, (source, low, high, labels) in LABEL_RULES.items():
+            metrics[label] = evaluate_labels(metrics[source], low, high, labels)
+        self.metrics = metrics
+        
+        # Moyenne et médiane de chaque ratio par secteur, en un seul regroupement
+        ratios = self.stocks.rename(columns=METRIC_COLUMNS)
+        ratios[SECTOR_RATIOS] = ratios[SECTOR_RATIOS].apply(pd.to_numeric, errors='coerce')
+        self.sector_stats = ratios.groupby('secteur', observed=True)[SECTOR_RATIOS].agg(['mean', 'median'])
+        self._records = metrics.to_dict('index')
     
     def get_stock_metrics(self, ticker):
         """Obtient les métriques pour une action"""
-        if ticker not in self.metrics:
-            return None
-            
-        metrics = self.metrics[ticker]
-        stock_data = self.stocks[self.stocks['Ticker'] == ticker].iloc[0]
-        
-        return {
-            'prix': metrics['prix'],
-            'variation': metrics['variation'],
-            'beta': metrics['beta'],
-            'volume': metrics['volume'],
-            'per': metrics['per'],
-            'rendement': metrics['rendement'],
-            'capitalisation': metrics['capitalisation'],
-            'secteur': metrics['secteur'],
-            'pays': metrics['pays'],
-            'momentum': self._evaluate_momentum(metrics['variation']),
-            'valorisation': self._evaluate_valuation(metrics['per']),
-            'risque': self._evaluate_risk(metrics['beta'])
-        }
-    
-    def _evaluate_momentum(self, variation):
-        """Évalue le momentum basé sur la variation"""
-        if pd.isna(variation):
-            return "Non disponible"
-        if variation > 20:
-            return "Fort"
-        elif variation < -20:
-            return "Faible"
-        return "Neutre"
+        metrics = self._records.get(ticker)
+        return dict(metrics) if metrics is not None else None
     
-    def _evaluate_valuation(self, per):
-        """Évalue la valorisation basée sur le PER"""
-        if pd.isna(per):
-            return "Non disponible"
-        if per < 15:
-            return "Attractive"
-        elif per > 30:
-            return "Élevée"
-        return "Moyenne"
-    
-    def _evaluate_risk(self, beta):
-        """Évalue le niveau de risque basé sur le beta"""
-        if pd.isna(beta):
-            return "Non disponible"
-        if beta < 0.8:
-            return "Faible"
-        elif beta > 1.2:
-            return "Élevé"
-        return "Moyen"
+    def get_sector_benchmark(self, secteur, statistic='mean'):
+        """Référence sectorielle (moyenne ou médiane) de chaque ratio"""
+        if secteur not in self.sector_stats.index:
+            return {ratio: np.nan for ratio in SECTOR_RATIOS}
+        row = self.sector_stats.loc[secteur]
+        return {ratio: row[(ratio, statistic)] for ratio in SECTOR_RATIOS}
 
     def create_stock_analysis(self, ticker):
         """Crée un dashboard d'analyse pour une action"""
-        if ticker not in self.metrics:
+        metrics = self._records.get(ticker)
+        if metrics is None:
             return None
-            
-        metrics = self.metrics[ticker]
+        
         secteur = metrics['secteur']
         
         # Création du layout avec subplots
@@ -107,8 +97,8 @@ class PortfolioAnalyzer:
                   [{'type': 'scatter'}, {'type': 'domain'}]]
         )
         
-        # Comparaison sectorielle
-        secteur_data = self.stocks[self.stocks['Secteur'] == secteur]
+        # Comparaison sectorielle (moyennes précalculées)
+        benchmark = self.get_sector_benchmark(secteur)
         fig.add_trace(
             go.Bar(
                 x=['PER', 'Beta', 'Rendement'],
@@ -122,9 +112,9 @@ class PortfolioAnalyzer:
         fig.add_trace(
             go.Bar(
                 x=['PER', 'Beta', 'Rendement'],
-                y=[secteur_data['PER historique'].mean(),
-                   secteur_data['Bêta'].mean(),
-                   secteur_data['Rendement du dividende'].mean()],
+                y=[benchmark['per'],
+                   benchmark['beta'],
+                   benchmark['rendement']],
                 name='Secteur',
                 marker_color='lightgray'
             ),
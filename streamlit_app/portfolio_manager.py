@@ -7,10 +7,41 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
-import yfinance as yf
 
 # Import local
 from portfolio_analyzer import PortfolioAnalyzer, add_technical_analysis
+from quote_service import get_quote_service, fetch_quotes
+from price_matrix import get_price_matrix, simulate_buy_and_hold
+from downsampling import downsample_series
+from fx_service import get_fx_service
+from history_store import get_history_store
+from risk_engine import get_risk_engine, compute_risk, returns_matrix, weights_key, drawdown_stats, \
+    BENCHMARK_TICKER, BENCHMARK_CURRENCY, TRADING_DAYS
+from optimizer import PortfolioOptimizer, get_optimization_cache
+from backtest import get_backtest_engine, static_weights, expanding_weights
+from monte_carlo import get_simulation_cache, gbm_parameters, simulate, summarize
+from rolling_metrics import get_rolling_metrics, VOLATILITY_WINDOW, BETA_WINDOW
+from clustering import get_clustering_cache, cluster_correlations, correlation_matrix, diversification_ratio, \
+    diversifiers, block_average, DEFAULT_CLUSTERS
+from multi_portfolio import get_multi_portfolio_engine, evaluate_portfolios, value_portfolios, weight_matrix, \
+    load_saved_portfolios, save_portfolio_definition
+
+# Stratégies dont les poids viennent de l'optimiseur moyenne-variance
+OPTIMIZED_STRATEGIES = ["Sharpe maximal", "Variance minimale", "Parité de risque"]
+BACKTEST_STRATEGIES = ["Équipondéré", "Score"] + OPTIMIZED_STRATEGIES
+
+# Méthode de l'optimiseur de chaque stratégie optimisée
+OPTIMIZER_METHODS = {
+    "Sharpe maximal": 'max_sharpe',
+    "Variance minimale": 'min_variance',
+    "Parité de risque": 'risk_parity'
+}
+
+# Stratégies sans historique de leurs poids : le Score du jour est appliqué à tout le passé
+IN_SAMPLE_STRATEGIES = ["Score"]
+
+# Historique antérieur au début du backtest utilisé pour la première estimation des poids
+FIT_LOOKBACK = timedelta(days=365)
 
 class PortfolioManager:
     def __init__(self):
@@ -31,37 +62,10 @@ class PortfolioManager:
             self.portfolio_data['weight'] = 1 / total_stocks
             self.portfolio_data['target_investment'] = self.INITIAL_INVESTMENT * self.portfolio_data['weight']
             
-            # Exchange rates
-            exchange_rates = {
-                'EUR': 1.0,
-                'USD': 0.93,
-                'GBP': 1.17,
-                'CHF': 1.07,
-                'JPY': 0.00622,
-                'AUD': 0.605,
-                'KRW': 0.000696
-            }
-            
-
-            # Déterminer la devise de chaque action
-            def get_currency(ticker):
-                if '.PA' in ticker or '.AS' in ticker or '.DE' in ticker or '.BR' in ticker or '.MC' in ticker:
-                    return 'EUR'
-                elif '.L' in ticker:
-                    return 'GBP'
-                elif '.SW' in ticker:
-                    return 'CHF'
-                elif '.T' in ticker:
-                    return 'JPY'
-                elif '.AX' in ticker:
-                    return 'AUD'
-                elif '.KS' in ticker:
-                    return 'KRW'
-                return 'USD'
-            
-            
-            self.portfolio_data['currency'] = self.portfolio_data['Ticker'].apply(get_currency)
-            self.portfolio_data['exchange_rate'] = self.portfolio_data['currency'].map(exchange_rates)
+            # Devise de cotation fournie par le CSV, taux du service de change (pence -> livre / 100)
+            fx = get_fx_service()
+            self.portfolio_data['currency'] = self.portfolio_data['Devise'].fillna('EUR')
+            self.portfolio_data['exchange_rate'] = self.portfolio_data['currency'].map(fx.price_rate)
             
             # Calcul du nombre d'actions
             self.portfolio_data['shares'] = (self.portfolio_data['target_investment'] / 
@@ -73,54 +77,126 @@ class PortfolioManager:
                                                     self.portfolio_data['shares'] * 
                                                     self.portfolio_data['exchange_rate'])
             
+            # Les positions sont suivies par le rafraîchisseur de cours en arrière-plan
+            get_quote_service().track(self.portfolio_data['Ticker'].tolist())
+            
         except Exception as e:
             st.error(f"Erreur lors du chargement des données : {str(e)}")
             self.portfolio_data = pd.DataFrame()
 
+    def get_current_prices(self):
+        """Derniers cours des positions : magasin partagé, complété par une seule requête groupée"""
+        quotes = get_quote_service().get_quotes()
+        prices = quotes['Prix'] if not quotes.empty else pd.Series(dtype='float64')
+        
+        missing = self.portfolio_data.loc[~self.portfolio_data['Ticker'].isin(prices.index), 'Ticker']
+        if len(missing) == len(self.portfolio_data):
+            # Magasin encore vide (démarrage) : un seul aller-retour pour toutes les positions
+            fetched = fetch_quotes(missing.tolist())
+            if not fetched.empty:
+                get_quote_service().publish(fetched)
+                prices = pd.concat([prices, fetched['Prix']])
+        return prices
+
+    def value_portfolio(self, prices):
+        """Valorisation vectorisée : actions × cours × taux de change, par position et au total"""
+        positions = self.portfolio_data[['Ticker', 'shares', 'exchange_rate', 'valeur_position']].copy()
+        positions['cours'] = positions['Ticker'].map(prices)
+        positions['valeur_position_actuelle'] = (
+            positions['shares'] * positions['cours'] * positions['exchange_rate']
+        ).fillna(positions['valeur_position'])  # Fallback sur la valeur du CSV
+        positions['variation'] = (positions['valeur_position_actuelle'] / positions['valeur_position'] - 1) * 100
+        
+        total_value = positions['valeur_position_actuelle'].sum()
+        initial_value = positions['valeur_position'].sum()
+        return {
+            'positions': positions,
+            'total_value': total_value,
+            'variation': (total_value / initial_value - 1) * 100
+        }
+
     def get_current_portfolio_value(self):
-        """Calcule la valeur actuelle du portefeuille en utilisant yfinance"""
+        """Calcule la valeur actuelle du portefeuille en un seul aller-retour au plus"""
         try:
-            # Pour chaque position
-            current_values = []
-            progress_bar = st.progress(0)
-            
-            for idx, row in self.portfolio_data.iterrows():
-                progress_bar.progress(idx/len(self.portfolio_data))
-                ticker = row['Ticker']
-                shares = row['shares']
-                exchange_rate = row['exchange_rate']
-                
-                try:
-                    # Récupérer le dernier prix via yfinance
-                    stock = yf.Ticker(ticker)
-                    hist = stock.history(period="1d")
-                    if not hist.empty:
-                        current_price = hist['Close'].iloc[-1]
-                        current_value = current_price * shares * exchange_rate
-                    else:
-                        current_value = row['valeur_position']  # Fallback sur la valeur du CSV
-                except Exception as e:
-                    st.warning(f"Erreur pour {ticker}: {str(e)}")
-                    current_value = row['valeur_position']  # Fallback sur la valeur du CSV
-                
-                current_values.append(current_value)
-            
-            progress_bar.empty()
+            valuation = self.value_portfolio(self.get_current_prices())
             
             # Mettre à jour les valeurs dans le DataFrame
-            self.portfolio_data['valeur_position_actuelle'] = current_values
-            
-            # Calculer la valeur totale actuelle
-            total_value = sum(current_values)
-            initial_value = self.portfolio_data['valeur_position'].sum()
-            variation = ((total_value/initial_value)-1)*100
+            self.portfolio_data['valeur_position_actuelle'] = valuation['positions']['valeur_position_actuelle']
             
-            return total_value, variation
+            return valuation['total_value'], valuation['variation']
             
         except Exception as e:
             st.error(f"Erreur lors du calcul de la valeur du portefeuille : {str(e)}")
             return self.portfolio_data['valeur_position'].sum(), 0.0
 
+    def get_quotes_age(self):
+        """Âge en secondes des cours utilisés pour la valorisation"""
+        return get_quote_service().age
+
+    def get_risk_report(self, start_date=None):
+        """Rapport de risque des positions en EUR, mis en cache par (version de la matrice, poids)"""
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        tickers = tuple(self.portfolio_data['Ticker'])
+        matrix = get_price_matrix(tickers)
+        closes = matrix.get_closes(start_date)
+        weights = self.portfolio_data['weight'].to_numpy()
+
+        def compute():
+            currencies = self.portfolio_data.set_index('Ticker')['currency']
+            closes_eur = get_fx_service().convert_to_eur(closes, currencies)
+            benchmark_returns = self._benchmark_returns(closes_eur.index, start_date)
+            return compute_risk(returns_matrix(closes_eur), weights, benchmark_returns)
+
+        return get_risk_engine().report((tickers, matrix.version), start_date, weights, compute)
+
+    def _benchmark_returns(self, index, start_date):
+        """Rendements de l'indice de référence en EUR, alignés sur les séances données (None si indisponible)"""
+        try:
+            fx = get_fx_service()
+            benchmark = get_history_store().close_matrix([BENCHMARK_TICKER], start_date)
+            benchmark = fx.convert_to_eur(benchmark, {BENCHMARK_TICKER: BENCHMARK_CURRENCY})[BENCHMARK_TICKER]
+            # Aligné sur les séances du portefeuille (dernier cours connu)
+            benchmark = benchmark.reindex(benchmark.index.union(index)).ffill().reindex(index)
+            return benchmark.pct_change(fill_method=None)
+        except Exception:
+            return None
+
+    def get_rolling_metrics(self, start_date=None):
+        """Indicateurs glissants du portefeuille (séries persistées, complétées à chaque nouvelle séance)"""
+        metrics = get_rolling_metrics()
+        positions = self.portfolio_data.set_index('Ticker')
+        key = metrics.register_portfolio('principal', positions['shares'], positions['currency'])
+        return metrics.series(key, start_date)
+
+    def create_rolling_chart(self, indicators):
+        """Volatilité, bêta et drawdown glissants du portefeuille"""
+        fig = make_subplots(
+            rows=3, cols=1,
+            shared_xaxes=True,
+            subplot_titles=(
+                f'Volatilité annualisée ({VOLATILITY_WINDOW} séances, %)',
+                f'Bêta ({BENCHMARK_TICKER}, {BETA_WINDOW} séances)',
+                'Drawdown (%)'
+            ),
+            vertical_spacing=0.08
+        )
+        traces = [
+            (indicators['volatility'].dropna() * 100, '#1f77b4', 1),
+            (indicators['beta'].dropna(), '#ff7f0e', 2),
+            (indicators['drawdown'] * 100, '#d62728', 3),
+        ]
+        for series, color, row in traces:
+            curve = downsample_series(series)
+            fig.add_trace(
+                go.Scatter(x=curve.index, y=curve, mode='lines', line=dict(color=color, width=1.5), showlegend=False),
+                row=row, col=1
+            )
+        fig.update_layout(height=650, paper_bgcolor='white', plot_bgcolor='white', hovermode='x unified')
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
+        return fig
+
     def get_current_values(self, start_date=None):
         """Récupère les valeurs actuelles et historiques du portefeuille"""
         if start_date is None:
@@ -184,74 +260,37 @@ class PortfolioManager:
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
             margin: 1rem 0;
         }
-        .progress-update {
-            padding: 1rem;
-            background: #e9ecef;
-            border-radius: 0.5rem;
-            margin-bottom: 1rem;
-        }
         </style>
         """, unsafe_allow_html=True)
         
-        # Dictionnaire pour stocker toutes les séries de données
-        all_series = {}
-        positions_data = []
+        # Matrice des cours partagée : changer de date ne fait que trancher la matrice en cache
+        try:
+            closes = get_price_matrix(tuple(self.portfolio_data['Ticker'])).get_closes(start_date)
+        except Exception as e:
+            st.error(f"Erreur lors du chargement de l'historique des cours : {str(e)}")
+            closes = pd.DataFrame(columns=self.portfolio_data['Ticker'], dtype='float64')
+        initial_values = self.portfolio_data.set_index('Ticker')['valeur_position']
         
-        st.markdown("""
-        <div class="progress-update">
-            <h3>📊 Mise à jour des valeurs...</h3>
-        </div>
-        """, unsafe_allow_html=True)
-        progress_bar = st.progress(0)
+        # Conversion en EUR au taux historique de chaque séance (jointure as-of, une opération)
+        currencies = self.portfolio_data.set_index('Ticker')['currency']
+        closes = get_fx_service().convert_to_eur(closes, currencies)
         
-        # [Code de récupération des données inchangé...]
-        for idx, stock in self.portfolio_data.iterrows():
-            progress_bar.progress(idx/len(self.portfolio_data))
-            
-            ticker = stock['Ticker']
-            initial_price = stock['Prix actuel']
-            shares = stock['shares']
-            exchange_rate = stock['exchange_rate']
-            initial_value = shares * initial_price * exchange_rate
-            
-            try:
-                hist_data = yf.Ticker(ticker).history(start=start_date)
-                if not hist_data.empty:
-                    first_price = hist_data['Close'].iloc[0]
-                    adjusted_shares = (stock['valeur_position'] / (first_price * exchange_rate))
-                    stock_values = hist_data['Close'] * adjusted_shares * exchange_rate
-                    all_series[ticker] = stock_values
-                    
-                    current_price = hist_data['Close'].iloc[-1]
-                    current_value = adjusted_shares * current_price * exchange_rate
-                    variation = ((current_value/stock['valeur_position'])-1)*100
-                else:
-                    current_price = initial_price
-                    current_value = initial_value
-                    variation = 0
-                
-                positions_data.append({
-                    'ticker': ticker,
-                    'variation': variation,
-                    'current_value': current_value
-                })
-                
-            except Exception as e:
-                st.error(f"Erreur pour {ticker}: {str(e)}")
-                positions_data.append({
-                    'ticker': ticker,
-                    'variation': 0,
-                    'current_value': initial_value
-                })
-
-        progress_bar.empty()
+        # Valeurs de chaque position normalisées sur la première date (vectorisé)
+        stock_values = simulate_buy_and_hold(closes, initial_values).dropna(axis=1, how='all')
+        
+        # Variation par position (positions sans historique : valeur initiale conservée)
+        current_values = stock_values.iloc[-1].reindex(initial_values.index) if not stock_values.empty \
+            else pd.Series(index=initial_values.index, dtype='float64')
+        current_values = current_values.fillna(initial_values)
+        positions_df = pd.DataFrame({
+            'ticker': initial_values.index,
+            'variation': ((current_values / initial_values - 1) * 100).to_numpy(),
+            'current_value': current_values.to_numpy()
+        })
 
         # Combiner toutes les séries
-        if all_series:
-            historical_values = pd.DataFrame(all_series)
-            historical_values = historical_values.fillna(method='bfill').fillna(method='ffill')
-            historical_values['Total'] = historical_values.sum(axis=1)
-            historical_values = historical_values[['Total']]
+        if not stock_values.empty:
+            historical_values = pd.DataFrame({'Total': stock_values.sum(axis=1)})
             
             # Calculs de performance
             total_current_value = historical_values['Total'].iloc[-1]
@@ -265,11 +304,14 @@ class PortfolioManager:
                 vertical_spacing=0.12
             )
 
+            # Courbes réduites par LTTB pour limiter les points envoyés au navigateur
+            total_curve = downsample_series(historical_values['Total'])
+            
             # Premier graphique - Valeur du portefeuille
             fig.add_trace(
                 go.Scatter(
-                    x=historical_values.index,
-                    y=historical_values['Total'],
+                    x=total_curve.index,
+                    y=total_curve,
                     mode='lines',
                     name='Valeur du Portefeuille',
                     line=dict(color='#1f77b4', width=2)
@@ -278,10 +320,10 @@ class PortfolioManager:
             )
 
             # Deuxième graphique - Performance cumulée
-            performance = (historical_values['Total'] / historical_values['Total'].iloc[0] - 1) * 100
+            performance = (total_curve / historical_values['Total'].iloc[0] - 1) * 100
             fig.add_trace(
                 go.Scatter(
-                    x=historical_values.index,
+                    x=performance.index,
                     y=performance,
                     mode='lines',
                     name='Performance Cumulée',
@@ -318,7 +360,6 @@ class PortfolioManager:
             """, unsafe_allow_html=True)
 
             # Top/Flop 5 avec style
-            positions_df = pd.DataFrame(positions_data)
             top5 = positions_df.nlargest(5, 'variation')
             flop5 = positions_df.nsmallest(5, 'variation')
             
@@ -351,10 +392,13 @@ class PortfolioManager:
                     """, unsafe_allow_html=True)
                 st.markdown("</div>", unsafe_allow_html=True)
 
-            # Métriques supplémentaires avec style
-            volatility = historical_values['Total'].pct_change().std() * np.sqrt(252) * 100
-            max_drawdown = ((historical_values['Total'] - historical_values['Total'].cummax()) / 
-                        historical_values['Total'].cummax()).min() * 100
+            # Volatilité et drawdown de la courbe affichée (positions achetées puis conservées)
+            total = historical_values['Total']
+            volatility = total.pct_change().std() * np.sqrt(TRADING_DAYS) * 100
+            max_drawdown = drawdown_stats(total.to_numpy())['max_drawdown'] * 100
+
+            # Ratios du moteur de risque (rapport en cache), calculés à poids constants
+            risk = self.get_risk_report(start_date)
 
             col1, col2, col3 = st.columns(3)
             
@@ -382,6 +426,31 @@ class PortfolioManager:
                 </div>
                 """, unsafe_allow_html=True)
 
+            risk_metrics = [
+                (f"{risk['beta']:.2f}", f"Bêta réalisé ({BENCHMARK_TICKER})"),
+                (f"{risk['sharpe']:.2f}", "Ratio de Sharpe"),
+                (f"{risk['sortino']:.2f}", "Ratio de Sortino"),
+                (f"{risk['var_historical'] * 100:.2f}% / {risk['cvar_historical'] * 100:.2f}%", "VaR / CVaR 95% (1 jour)")
+            ]
+            for col, (value, label) in zip(st.columns(len(risk_metrics)), risk_metrics):
+                with col:
+                    st.markdown(f"""
+                    <div class="performance-metric">
+                        <h3>{value}</h3>
+                        <p>{label}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+            st.caption("Bêta, Sharpe, Sortino et VaR : portefeuille aux poids initiaux constants "
+                       "(rééquilibré chaque jour), et non la courbe achat-conservation ci-dessus.")
+
+            # Indicateurs glissants précalculés (aucun recalcul de l'historique à l'affichage)
+            try:
+                indicators = self.get_rolling_metrics(start_date)
+            except Exception:
+                indicators = pd.DataFrame()
+            if not indicators.empty:
+                st.plotly_chart(self.create_rolling_chart(indicators), use_container_width=True)
+
     def create_portfolio_overview(self):
         """Crée une vue d'ensemble du portefeuille"""
         fig = make_subplots(
@@ -436,4 +505,370 @@ class PortfolioManager:
             )
         )
         
-        return fig
\ No newline at end of file
+        return fig
+
+    def get_clustering(self, n_clusters=DEFAULT_CLUSTERS, start_date=None):
+        """Groupes de corrélation des positions et ratio de diversification (rapport de risque en cache)"""
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        tickers = tuple(self.portfolio_data['Ticker'])
+        weights = self.portfolio_data['weight'].to_numpy()
+        key = ('portefeuille', tickers, get_price_matrix(tickers).version, str(start_date),
+               weights_key(weights), n_clusters)
+
+        def run():
+            risk = self.get_risk_report(start_date)
+            result = cluster_correlations(risk['correlation'], n_clusters, weights)
+            result['heatmap'] = block_average(result['ordered'])
+            result['diversification_ratio'] = diversification_ratio(
+                weights, risk['asset_volatility'], risk['covariance']
+            )
+            return result
+
+        return get_clustering_cache().get_or_run(key, run)
+
+    def get_universe_clustering(self, n_assets=None, n_clusters=DEFAULT_CLUSTERS, start_date=None):
+        """Corrélations de l'univers filtré (plus grandes capitalisations) et candidats diversifiants"""
+        from market_analyzer import get_market_analyzer
+        if start_date is None:
+            start_date = datetime.now() - timedelta(days=365)
+        start_date = pd.Timestamp(start_date).normalize()
+        market = get_market_analyzer().market_data.drop_duplicates('Ticker')
+        if n_assets is not None:
+            market = market.nlargest(n_assets, 'Capitalisation_boursiere')
+        holdings = self.portfolio_data['Ticker'].tolist()
+        tickers = tuple(dict.fromkeys(list(market['Ticker']) + holdings))
+        matrix = get_price_matrix(tickers)
+        key = ('univers', tickers, matrix.version, str(start_date), n_clusters)
+
+        def run():
+            closes = matrix.get_closes(start_date)
+            currencies = market.set_index('Ticker')['Devise'].astype(str).to_dict()
+            currencies.update(self.portfolio_data.set_index('Ticker')['currency'].to_dict())
+            closes = get_fx_service().convert_to_eur(closes.dropna(axis=1, how='all'), currencies)
+            correlation = correlation_matrix(returns_matrix(closes))
+            result = cluster_correlations(correlation, n_clusters)
+            result['heatmap'] = block_average(result['ordered'])
+            candidates = diversifiers(correlation, holdings)
+            candidates['groupe'] = candidates['Ticker'].map(result['labels'])
+            names = market.set_index('Ticker')
+            candidates['Nom_complet'] = candidates['Ticker'].map(names['Nom_complet'])
+            candidates['Secteur'] = candidates['Ticker'].map(names['Secteur']).astype(str)
+            candidates['Score'] = candidates['Ticker'].map(names['Score'].astype('float64'))
+            result['candidates'] = candidates
+            return result
+
+        return get_clustering_cache().get_or_run(key, run)
+
+    def create_correlation_heatmap(self, clustering, title):
+        """Carte de chaleur des corrélations dans l'ordre hiérarchique (blocs moyennés pour un grand univers)"""
+        heatmap = clustering['heatmap']
+        fig = go.Figure(go.Heatmap(
+            z=heatmap.to_numpy(),
+            x=heatmap.columns,
+            y=heatmap.index,
+            zmin=-1,
+            zmax=1,
+            colorscale='RdBu_r',
+            colorbar=dict(title='ρ')
+        ))
+        fig.update_layout(
+            title=title,
+            height=700,
+            yaxis=dict(autorange='reversed'),
+            xaxis=dict(showticklabels=len(heatmap) <= 60),
+            paper_bgcolor='white',
+            plot_bgcolor='white'
+        )
+        if len(heatmap) > 60:
+            fig.update_yaxes(showticklabels=False)
+        return fig
+
+    def get_optimization(self, start_date=None, max_weight=None, sector_cap=None):
+        """Frontière efficiente et portefeuilles optimaux, en cache par (matrice, début, contraintes)"""
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        risk = self.get_risk_report(start_date)
+        tickers = tuple(self.portfolio_data['Ticker'])
+        key = (tickers, get_price_matrix(tickers).version, str(start_date), max_weight, sector_cap)
+
+        def run():
+            optimizer = PortfolioOptimizer(
+                risk['mean_returns'],
+                risk['covariance'],
+                sectors=self.portfolio_data.set_index('Ticker')['Secteur'],
+                max_weight=max_weight,
+                sector_caps=sector_cap
+            )
+            return optimizer.run()
+
+        return get_optimization_cache().get_or_run(key, run)
+
+    def create_frontier_chart(self, optimization, current=None):
+        """Nuage de portefeuilles aléatoires, frontière efficiente et portefeuilles remarquables"""
+        cloud = optimization['cloud']
+        frontier = optimization['frontier']
+        fig = go.Figure()
+        fig.add_trace(go.Scattergl(
+            x=cloud['volatilite'] * 100,
+            y=cloud['rendement'] * 100,
+            mode='markers',
+            name='Portefeuilles aléatoires',
+            marker=dict(size=4, color=cloud['sharpe'], colorscale='Viridis', opacity=0.5,
+                        colorbar=dict(title='Sharpe'))
+        ))
+        fig.add_trace(go.Scatter(
+            x=frontier['volatilite'] * 100,
+            y=frontier['rendement'] * 100,
+            mode='lines',
+            name='Frontière efficiente',
+            line=dict(color='#d62728', width=3)
+        ))
+        points = optimization['portfolios']
+        if current is not None:
+            points = pd.concat([points, pd.DataFrame([current], index=['Portefeuille actuel'])])
+        fig.add_trace(go.Scatter(
+            x=points['volatilite'] * 100,
+            y=points['rendement'] * 100,
+            mode='markers+text',
+            name='Portefeuilles',
+            text=points.index,
+            textposition='top center',
+            marker=dict(size=12, symbol='star', color='#1f77b4')
+        ))
+        fig.update_layout(
+            title_text="Frontière efficiente (annualisée)",
+            xaxis_title="Volatilité (%)",
+            yaxis_title="Rendement (%)",
+            height=550,
+            paper_bgcolor='white',
+            plot_bgcolor='white'
+        )
+        return fig
+
+    def get_strategy_weights(self, strategy, start_date=None):
+        """Poids cibles d'une stratégie : équipondérée, Score du marché ou sortie de l'optimiseur"""
+        tickers = self.portfolio_data['Ticker']
+        if strategy == "Score":
+            from market_analyzer import get_market_analyzer
+            market = get_market_analyzer().market_data
+            scores = tickers.map(market.set_index('Ticker')['Score'].astype('float64').groupby(level=0).first())
+            return scores.fillna(scores.median()).fillna(1.0).to_numpy()
+        if strategy in OPTIMIZED_STRATEGIES:
+            weights = self.get_optimization(start_date)['weights'][strategy]
+            return weights.reindex(tickers).fillna(0.0).to_numpy()
+        return np.ones(len(tickers))
+
+    def run_backtest(self, start_date=None, strategy="Équipondéré", schedule=None, threshold=None, cost_bps=0.0):
+        """Backtest de la stratégie sur les cours bruts en EUR, dividendes versés en espèces"""
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        tickers = tuple(self.portfolio_data['Ticker'])
+        if strategy in OPTIMIZED_STRATEGIES:
+            # Poids réestimés à chaque rééquilibrage sur les seuls cours antérieurs (pas d'anticipation)
+            weight_fn = self._expanding_optimizer(strategy, start_date)
+            weights = ()
+        else:
+            weights = self.get_strategy_weights(strategy, start_date)
+            weight_fn = static_weights(weights)
+
+        def load():
+            # Cours non ajustés : les dividendes sont comptés en espèces, pas dans les cours
+            store = get_history_store()
+            fx = get_fx_service()
+            currencies = self.portfolio_data.set_index('Ticker')['currency']
+            closes = fx.convert_to_eur(store.close_matrix(tickers, start_date, adjusted=False), currencies)
+            dividends = fx.convert_to_eur(store.dividend_matrix(tickers, start_date), currencies)
+            return closes, dividends
+
+        # Clé : données du jour, stratégie et poids ; les paramètres sont ajoutés par le moteur
+        key = (tickers, str(start_date), datetime.now().date(), strategy, weights_key(weights))
+        return get_backtest_engine().run(
+            key, load, weight_fn,
+            schedule=schedule, threshold=threshold, cost=cost_bps / 10_000
+        )
+
+    def _expanding_optimizer(self, strategy, start_date):
+        """Fonction de poids qui réoptimise sur les cours ajustés en EUR connus à chaque rééquilibrage"""
+        tickers = tuple(self.portfolio_data['Ticker'])
+        positions = self.portfolio_data.set_index('Ticker')
+        fit_start = pd.Timestamp(start_date) - FIT_LOOKBACK
+        closes = get_price_matrix(tickers).get_closes(fit_start).reindex(columns=list(tickers))
+        closes = get_fx_service().convert_to_eur(closes, positions['currency'])
+        method = OPTIMIZER_METHODS[strategy]
+
+        def fit(known):
+            returns = returns_matrix(known)
+            optimizer = PortfolioOptimizer(
+                returns.mean() * TRADING_DAYS,
+                returns.cov() * TRADING_DAYS,
+                sectors=positions['Secteur']
+            )
+            return getattr(optimizer, method)()
+
+        return expanding_weights(closes, fit)
+
+    def create_backtest_chart(self, backtest, strategy):
+        """Courbe de valeur du backtest (réduite par LTTB)"""
+        curve = downsample_series(backtest['values'])
+        fig = go.Figure(go.Scatter(
+            x=curve.index,
+            y=curve,
+            mode='lines',
+            name=strategy,
+            line=dict(color='#1f77b4', width=2)
+        ))
+        fig.update_layout(
+            title_text=f"Backtest : {strategy}",
+            yaxis_title="Valeur (€)",
+            height=450,
+            paper_bgcolor='white',
+            plot_bgcolor='white',
+            hovermode='x unified'
+        )
+        return fig
+
+    def get_projection(self, method='bootstrap', years=1, n_paths=10_000, seed=42):
+        """Projection Monte Carlo de la valeur actuelle, calibrée sur l'historique depuis la date d'investissement"""
+        risk = self.get_risk_report()
+        tickers = tuple(self.portfolio_data['Ticker'])
+        horizon = int(years * TRADING_DAYS)
+        initial_value = float(self.portfolio_data.get('valeur_position_actuelle', self.portfolio_data['valeur_position']).sum())
+        key = (tickers, get_price_matrix(tickers).version, method, horizon, n_paths, seed, round(initial_value))
+
+        def run():
+            if method == 'bootstrap':
+                params = {'returns': risk['portfolio_returns'].to_numpy()}
+            else:
+                params = gbm_parameters(risk['mean_returns'], risk['covariance'], self.portfolio_data['weight'])
+            paths = simulate(method, params, horizon, n_paths, seed=seed, initial_value=initial_value)
+            return summarize(paths, horizon, initial_value)
+
+        return get_simulation_cache().get_or_run(key, run)
+
+    def create_projection_charts(self, projection):
+        """Éventail des percentiles et distribution de la valeur finale"""
+        fan = projection['fan']
+        dates = pd.bdate_range(datetime.now().date(), periods=int(fan.index[-1]) + 1)[fan.index]
+        fig = make_subplots(
+            rows=1, cols=2,
+            column_widths=[0.65, 0.35],
+            subplot_titles=('Projection de la valeur (€)', 'Distribution de la valeur finale')
+        )
+        # Bandes 5-95 % et 25-75 % puis médiane
+        for low, high, color in ((5, 95, 'rgba(31,119,180,0.15)'), (25, 75, 'rgba(31,119,180,0.35)')):
+            fig.add_trace(go.Scatter(x=dates, y=fan[high], mode='lines', line=dict(width=0),
+                                     showlegend=False, hoverinfo='skip'), row=1, col=1)
+            fig.add_trace(go.Scatter(x=dates, y=fan[low], mode='lines', line=dict(width=0),
+                                     fill='tonexty', fillcolor=color, name=f"{low}-{high} %"), row=1, col=1)
+        fig.add_trace(go.Scatter(x=dates, y=fan[50], mode='lines', name='Médiane',
+                                 line=dict(color='#1f77b4', width=2)), row=1, col=1)
+        fig.add_trace(go.Histogram(x=projection['terminal'], nbinsx=80, name='Valeur finale',
+                                   marker_color='#2ca02c', showlegend=False), row=1, col=2)
+        fig.update_layout(height=450, paper_bgcolor='white', plot_bgcolor='white', hovermode='x unified')
+        return fig
+
+    def get_model_portfolios(self, start_date=None):
+        """Poids (portefeuilles × tickers), capitaux et portefeuilles in-sample
+
+        Les stratégies optimisées sont estimées sur les seuls cours antérieurs à start_date ;
+        le Score du jour et les définitions enregistrées après start_date voient la période évaluée.
+        """
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        start = pd.Timestamp(start_date)
+        tickers = self.portfolio_data['Ticker']
+        definitions, capital, in_sample = {}, {}, []
+        for strategy in BACKTEST_STRATEGIES:
+            try:
+                if strategy in OPTIMIZED_STRATEGIES:
+                    weights = self._weights_known_at(strategy, start)
+                else:
+                    weights = self.get_strategy_weights(strategy, start_date)
+            except ValueError:
+                continue
+            definitions[strategy] = dict(zip(tickers, weights))
+            capital[strategy] = self.INITIAL_INVESTMENT
+            if strategy in IN_SAMPLE_STRATEGIES:
+                in_sample.append(strategy)
+        for name, saved in load_saved_portfolios().items():
+            definitions[name] = saved['weights']
+            capital[name] = saved['capital'] or self.INITIAL_INVESTMENT
+            if saved.get('created') is None or pd.Timestamp(saved['created']) > start:
+                in_sample.append(name)
+        weights = weight_matrix(definitions)
+        in_sample = [name for name in in_sample if name in weights.index]
+        return weights, pd.Series(capital, dtype='float64').reindex(weights.index), in_sample
+
+    def _weights_known_at(self, strategy, date):
+        """Poids d'une stratégie optimisée estimés sur les cours connus à `date` (en cache)"""
+        tickers = tuple(self.portfolio_data['Ticker'])
+        key = ('date', tickers, get_price_matrix(tickers).version, str(date), strategy)
+        return get_optimization_cache().get_or_run(
+            key, lambda: self._expanding_optimizer(strategy, date)(date, None)
+        )
+
+    def save_model_portfolio(self, name, strategy, start_date=None, description=None):
+        """Enregistre en base les poids d'une stratégie sous un nom de portefeuille modèle"""
+        weights = dict(zip(self.portfolio_data['Ticker'], self.get_strategy_weights(strategy, start_date)))
+        save_portfolio_definition(name, weights, self.INITIAL_INVESTMENT, description or f"Stratégie {strategy}")
+
+    def _currencies(self, tickers):
+        """Devise de cotation de chaque ticker : positions, puis données du marché pour les autres"""
+        currencies = self.portfolio_data.set_index('Ticker')['currency'].to_dict()
+        missing = [ticker for ticker in tickers if ticker not in currencies]
+        if missing:
+            from market_analyzer import get_market_analyzer
+            market = get_market_analyzer().market_data.drop_duplicates('Ticker').set_index('Ticker')
+            currencies.update(market['Devise'].astype(str).reindex(missing).fillna('EUR').to_dict())
+        return currencies
+
+    def get_portfolios_report(self, start_date=None):
+        """Courbes, risque et valeur actuelle de tous les portefeuilles modèles en une évaluation matricielle"""
+        if start_date is None:
+            start_date = self.INVESTMENT_DATE
+        weights, capital, in_sample = self.get_model_portfolios(start_date)
+        if weights.empty:
+            raise ValueError("Aucun portefeuille modèle à évaluer")
+        tickers = tuple(weights.columns)
+        matrix = get_price_matrix(tickers)
+        key = (tickers, matrix.version, str(start_date), tuple(weights.index),
+               weights_key(weights.to_numpy().ravel()), weights_key(capital.to_numpy()))
+
+        def run():
+            closes_eur = get_fx_service().convert_to_eur(matrix.get_closes(start_date), self._currencies(tickers))
+            report = evaluate_portfolios(
+                closes_eur, weights, capital.to_numpy(), self._benchmark_returns(closes_eur.index, start_date)
+            )
+            report['last_prices'] = closes_eur.ffill().iloc[-1]
+            return report
+
+        report = dict(get_multi_portfolio_engine().get_or_run(key, run))
+
+        # Valeur actuelle : cours du magasin partagé pour les positions, dernière clôture pour les autres
+        positions = self.portfolio_data.set_index('Ticker')
+        live = self.get_current_prices()
+        live = live[~live.index.duplicated(keep='last')].reindex(positions.index) * positions['exchange_rate']
+        prices = report['last_prices'].copy()
+        prices.update(live.dropna())
+        report['current'] = value_portfolios(report['shares'], prices)
+        report['in_sample'] = in_sample
+        return report
+
+    def create_portfolios_chart(self, report):
+        """Courbes de valeur de tous les portefeuilles modèles (réduites par LTTB)"""
+        fig = go.Figure()
+        for name, values in report['equity'].items():
+            curve = downsample_series(values)
+            fig.add_trace(go.Scatter(x=curve.index, y=curve, mode='lines', name=name, line=dict(width=2)))
+        fig.update_layout(
+            title_text="Valeur des portefeuilles modèles",
+            yaxis_title="Valeur (€)",
+            height=500,
+            paper_bgcolor='white',
+            plot_bgcolor='white',
+            hovermode='x unified'
+        )
+        fig.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
+        fig.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#f0f0f0')
+        return fig
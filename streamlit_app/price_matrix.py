@@ -0,0 +1,142 @@
+# price_matrix.py
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import streamlit as st
+from history_store import get_history_store
+
+# Profondeur d'historique chargée au démarrage (étendue à la demande vers le passé)
+DEFAULT_HISTORY_YEARS = 5
+
+# Délai après lequel la matrice est complétée avec les dernières séances
+MATRIX_TTL = timedelta(hours=1)
+
+# Nombre de jours rechargés à l'extension pour intégrer les corrections de clôture
+OVERLAP_DAYS = 5
+
+def download_closes(tickers, start, end=None):
+    """Clôtures ajustées de plusieurs tickers en une seule requête groupée (dates × tickers)"""
+    tickers = list(tickers)
+    data = yf.download(
+        tickers,
+        start=start,
+        end=end,
+        interval="1d",
+        auto_adjust=True,
+        progress=False,
+        threads=True
+    )
+    if data is None or data.empty:
+        return pd.DataFrame(columns=tickers, dtype='float64')
+
+    closes = data['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    if closes.index.tz is not None:
+        closes.index = closes.index.tz_localize(None)
+    return closes.reindex(columns=tickers)
+
+def normalize_date(value):
+    """Convertit une date (str, date, datetime) en Timestamp sans fuseau"""
+    timestamp = pd.Timestamp(value)
+    if timestamp.tz is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.normalize()
+
+class PriceMatrix:
+    """Matrice des cours de clôture alignés (dates × tickers), chargée une fois puis étendue"""
+
+    def __init__(self, tickers, start=None, loader=download_closes):
+        self.tickers = list(dict.fromkeys(tickers))
+        self.start = normalize_date(start or datetime.now() - timedelta(days=365 * DEFAULT_HISTORY_YEARS))
+        self.loader = loader
+        self.version = 0
+        self._closes = None
+        self._updated_at = None
+        self._lock = threading.RLock()
+
+    def _publish(self, closes):
+        """Remplace la matrice et incrémente sa version (clé des caches dérivés)"""
+        self._closes = closes.sort_index()
+        self._updated_at = datetime.now()
+        self.version += 1
+
+    def load(self):
+        """Chargement initial en une requête groupée"""
+        with self._lock:
+            self._publish(self.loader(self.tickers, self.start))
+
+    def extend(self):
+        """Complète la matrice avec les séances manquantes depuis la dernière date connue"""
+        with self._lock:
+            if self._closes is None or self._closes.empty:
+                self.load()
+                return
+            since = self._closes.index[-1] - timedelta(days=OVERLAP_DAYS)
+            recent = self.loader(self.tickers, since)
+            if recent.empty:
+                self._updated_at = datetime.now()
+            elif self._adjustment_changed(recent):
+                # Nouveau détachement : tout l'historique ajusté est à réévaluer, rechargement complet
+                self.load()
+            else:
+                self._publish(recent.combine_first(self._closes))
+
+    def _adjustment_changed(self, recent, tolerance=1e-6):
+        """Vrai si les clôtures ajustées communes aux deux matrices ont changé (dividende, split)"""
+        overlap = recent.index.intersection(self._closes.index)
+        if overlap.empty:
+            return False
+        old = self._closes.loc[overlap].reindex(columns=recent.columns)
+        new = recent.loc[overlap]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (new / old).to_numpy(dtype='float64')
+        ratio = ratio[np.isfinite(ratio)]
+        return bool(ratio.size) and bool((np.abs(ratio - 1) > tolerance).any())
+
+    def ensure_start(self, start_date):
+        """Étend la matrice vers le passé si la date demandée précède l'historique chargé"""
+        start_date = normalize_date(start_date)
+        with self._lock:
+            if self._closes is not None and start_date >= self.start:
+                return
+            if self._closes is None:
+                self.start = min(self.start, start_date)
+                self.load()
+                return
+            older = self.loader(self.tickers, start_date, self.start)
+            self.start = start_date
+            if not older.empty:
+                self._publish(self._closes.combine_first(older))
+
+    def get_closes(self, start_date=None):
+        """Tranche de la matrice depuis start_date (vue, sans téléchargement si déjà couverte)"""
+        with self._lock:
+            if start_date is not None:
+                self.ensure_start(start_date)
+            elif self._closes is None:
+                self.load()
+            if datetime.now() - self._updated_at > MATRIX_TTL:
+                self.extend()
+            closes = self._closes
+
+        if start_date is None:
+            return closes
+        return closes.loc[normalize_date(start_date):]
+
+def simulate_buy_and_hold(closes, initial_values):
+    """Valeur historique de positions achetées à la première date, normalisation vectorisée"""
+    if closes.empty:
+        return closes
+    filled = closes.ffill().bfill()
+    first_prices = filled.iloc[0]
+    # valeur = valeur initiale × cours / premier cours (cours déjà convertis en EUR)
+    values = filled / first_prices * initial_values.reindex(closes.columns)
+    return values
+
+@st.cache_resource
+def get_price_matrix(tickers):
+    """Matrice de cours partagée par toutes les sessions, alimentée par le stock d'historiques local"""
+    return PriceMatrix(tickers, loader=get_history_store().close_matrix)
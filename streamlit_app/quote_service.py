@@ -0,0 +1,161 @@
+# quote_service.py
+import threading
+from datetime import datetime
+import pandas as pd
+import yfinance as yf
+import streamlit as st
+
+# Durée de validité d'un instantané de cotations (5 minutes)
+QUOTES_TTL = 300
+
+# Période d'actualisation du rafraîchisseur en arrière-plan
+REFRESH_INTERVAL = 120
+
+QUOTE_COLUMNS = ['Prix', 'Cloture_precedente', 'Variation', 'Date', 'Horodatage']
+
+def fetch_quotes(tickers, period="5d"):
+    """Récupère en une seule requête groupée les deux dernières clôtures de chaque ticker"""
+    tickers = list(tickers)
+    data = yf.download(
+        tickers,
+        period=period,
+        interval="1d",
+        auto_adjust=False,
+        progress=False,
+        threads=True
+    )
+    if data is None or data.empty:
+        return pd.DataFrame(columns=QUOTE_COLUMNS)
+
+    close = data['Close']
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+
+    # Les places boursières n'ont pas les mêmes jours de cotation : on prend les deux dernières valeurs connues
+    rows = {}
+    for ticker in close.columns:
+        series = close[ticker].dropna()
+        if len(series) >= 2:
+            rows[ticker] = {
+                'Prix': float(series.iloc[-1]),
+                'Cloture_precedente': float(series.iloc[-2]),
+                'Date': series.index[-1]
+            }
+
+    quotes = pd.DataFrame.from_dict(rows, orient='index')
+    if quotes.empty:
+        return pd.DataFrame(columns=QUOTE_COLUMNS)
+    quotes['Variation'] = (quotes['Prix'] / quotes['Cloture_precedente'] - 1) * 100
+    quotes['Horodatage'] = datetime.now()
+    return quotes[QUOTE_COLUMNS]
+
+class QuoteService:
+    """Magasin de cotations en mémoire partagé par toutes les sessions, horodaté par ticker"""
+
+    def __init__(self, tickers, ttl=QUOTES_TTL):
+        self.ttl = ttl
+        self._tickers = list(dict.fromkeys(tickers))
+        self._quotes = None
+        self._fetched_at = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refresher = None
+
+    @property
+    def tickers(self):
+        return list(self._tickers)
+
+    @property
+    def fetched_at(self):
+        """Date du dernier instantané publié (None avant le premier chargement)"""
+        return self._fetched_at
+
+    @property
+    def age(self):
+        """Âge de l'instantané en secondes"""
+        if self._fetched_at is None:
+            return None
+        return (datetime.now() - self._fetched_at).total_seconds()
+
+    def track(self, tickers):
+        """Ajoute des tickers au suivi ; le rafraîchisseur est réveillé s'il y en a de nouveaux"""
+        with self._lock:
+            new_tickers = [t for t in tickers if t not in self._tickers]
+            self._tickers.extend(new_tickers)
+        if new_tickers and self.refresher is not None:
+            self.refresher.wake()
+
+    def refresh(self):
+        """Recharge les cotations en une requête groupée et les fusionne dans le magasin"""
+        try:
+            quotes = fetch_quotes(self.tickers)
+            if not quotes.empty:
+                self.publish(quotes)
+        except Exception:
+            pass
+        finally:
+            self._refreshing = False
+        return self._quotes
+
+    def publish(self, quotes):
+        """Publie de nouvelles cotations ; les tickers absents conservent leur dernière valeur"""
+        with self._lock:
+            if self._quotes is None:
+                merged = quotes
+            else:
+                merged = pd.concat([self._quotes.drop(quotes.index, errors='ignore'), quotes])
+            self._quotes = merged
+            self._fetched_at = datetime.now()
+
+    def _refresh_in_background(self):
+        """Lance une seule actualisation ponctuelle à la fois"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, name="quote-refresh", daemon=True).start()
+
+    def get_quotes(self):
+        """Cotations courantes, lues instantanément sans jamais attendre le réseau"""
+        refresher_alive = self.refresher is not None and self.refresher.is_alive()
+        if not refresher_alive and (self._quotes is None or self.age > self.ttl):
+            # Sans rafraîchisseur actif : stale-while-revalidate
+            self._refresh_in_background()
+
+        quotes = self._quotes
+        if quotes is None:
+            return pd.DataFrame(columns=QUOTE_COLUMNS)
+        return quotes
+
+class PriceRefresher(threading.Thread):
+    """Thread d'arrière-plan qui actualise périodiquement le magasin de cotations"""
+
+    def __init__(self, service, interval=REFRESH_INTERVAL):
+        super().__init__(name="price-refresher", daemon=True)
+        self.service = service
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.service.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def wake(self):
+        """Déclenche une actualisation immédiate"""
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+@st.cache_resource
+def get_quote_service():
+    """Magasin de cotations unique pour tout le processus, alimenté en arrière-plan"""
+    from stock_analyzer import TRACKED_COMPANIES
+    service = QuoteService(TRACKED_COMPANIES.values())
+    service.refresher = PriceRefresher(service)
+    service.refresher.start()
+    return service
@@ -0,0 +1,35 @@
+# result_cache.py
+import threading
+from collections import OrderedDict
+
+class ResultCache:
+    """Résultats de calcul mis en cache (LRU) et partagés entre sessions
+
+    Les clés incluent la version des données (matrice de cours...) : une mise à jour
+    produit de nouvelles clés, les anciennes sortent par l'ancienneté.
+    """
+
+    def __init__(self, max_cached=16):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_run(self, key, run):
+        """Résultat en cache ; `run` n'est appelé qu'en cas d'absence (hors verrou)"""
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                return result
+
+        result = run()
+
+        with self._lock:
+            self._cache[key] = result
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
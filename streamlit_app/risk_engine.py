@@ -0,0 +1,133 @@
+# risk_engine.py
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import streamlit as st
+from result_cache import ResultCache
+
+TRADING_DAYS = 252
+
+# Taux sans risque annuel (EUR) utilisé par les ratios de Sharpe et de Sortino
+RISK_FREE_RATE = 0.03
+
+# Niveau de confiance des VaR / CVaR quotidiennes
+VAR_LEVEL = 0.95
+
+# Indice de référence du bêta réalisé (ETF MSCI World)
+BENCHMARK_TICKER = "URTH"
+BENCHMARK_CURRENCY = "USD"
+
+def returns_matrix(closes):
+    """Rendements quotidiens alignés (dates × actifs) ; un actif non coté un jour a un rendement nul"""
+    filled = closes.ffill()
+    returns = filled.pct_change(fill_method=None).iloc[1:]
+    return returns.fillna(0.0)
+
+def weights_key(weights):
+    """Clé de cache d'un vecteur de poids (arrondi pour absorber le bruit numérique)"""
+    return tuple(np.round(np.asarray(weights, dtype='float64'), 10))
+
+def drawdown_stats(values):
+    """Drawdown courant, maximum et plus longue période sous le plus haut (en séances)"""
+    running_max = np.maximum.accumulate(values)
+    drawdown = values / running_max - 1
+    underwater = drawdown < 0
+    if underwater.any():
+        # Chaque remontée au plus haut ouvre un nouvel épisode
+        episodes = np.cumsum(~underwater)[underwater]
+        longest = int(np.bincount(episodes).max())
+    else:
+        longest = 0
+    return {
+        'drawdown': drawdown,
+        'max_drawdown': float(drawdown.min()),
+        'current_drawdown': float(drawdown[-1]),
+        'longest_drawdown': longest
+    }
+
+def compute_risk(returns, weights, benchmark=None, risk_free=RISK_FREE_RATE, level=VAR_LEVEL):
+    """Statistiques de risque d'un portefeuille à poids constants, en une passe matricielle"""
+    assets = returns.columns
+    R = returns.to_numpy(dtype='float64')
+    w = np.asarray(weights, dtype='float64')
+    w = w / w.sum()
+    n_days = R.shape[0]
+
+    # Covariance et corrélation (annualisées) par produit matriciel
+    means = R.mean(axis=0)
+    centered = R - means
+    cov = centered.T @ centered / max(n_days - 1, 1) * TRADING_DAYS
+    asset_vol = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(asset_vol, asset_vol)
+
+    # Rendements et volatilité du portefeuille
+    portfolio = R @ w
+    portfolio_vol = float(np.sqrt(w @ cov @ w))
+    annual_return = float(portfolio.mean() * TRADING_DAYS)
+    daily_rf = risk_free / TRADING_DAYS
+    excess = portfolio - daily_rf
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2) * TRADING_DAYS)
+
+    # VaR / CVaR quotidiennes exprimées en pertes positives
+    alpha = 1 - level
+    var_hist = -float(np.quantile(portfolio, alpha))
+    tail = portfolio[portfolio <= -var_hist]
+    cvar_hist = -float(tail.mean()) if tail.size else var_hist
+    mu, sigma = float(portfolio.mean()), float(portfolio.std(ddof=1))
+    z = NormalDist().inv_cdf(alpha)
+    var_param = -(mu + z * sigma)
+    cvar_param = -(mu - sigma * NormalDist().pdf(z) / alpha)
+
+    # Bêta réalisé de chaque actif et du portefeuille face à l'indice de référence
+    asset_beta = pd.Series(np.nan, index=assets)
+    beta = np.nan
+    if benchmark is not None:
+        b = benchmark.reindex(returns.index).fillna(0.0).to_numpy(dtype='float64')
+        b_centered = b - b.mean()
+        b_var = b_centered @ b_centered
+        if b_var > 0:
+            asset_beta = pd.Series(centered.T @ b_centered / b_var, index=assets)
+            beta = float(asset_beta.to_numpy() @ w)
+
+    drawdowns = drawdown_stats(np.cumprod(1 + portfolio))
+
+    return {
+        'covariance': pd.DataFrame(cov, index=assets, columns=assets),
+        'correlation': pd.DataFrame(corr, index=assets, columns=assets),
+        'mean_returns': pd.Series(means * TRADING_DAYS, index=assets),
+        'asset_volatility': pd.Series(asset_vol, index=assets),
+        'asset_beta': asset_beta,
+        'portfolio_returns': pd.Series(portfolio, index=returns.index),
+        'annual_return': annual_return,
+        'volatility': portfolio_vol,
+        'beta': beta,
+        'sharpe': (annual_return - risk_free) / portfolio_vol if portfolio_vol > 0 else np.nan,
+        'sortino': (annual_return - risk_free) / downside if downside > 0 else np.nan,
+        'var_historical': var_hist,
+        'cvar_historical': cvar_hist,
+        'var_parametric': var_param,
+        'cvar_parametric': cvar_param,
+        'max_drawdown': drawdowns['max_drawdown'],
+        'current_drawdown': drawdowns['current_drawdown'],
+        'longest_drawdown': drawdowns['longest_drawdown'],
+        'drawdown': pd.Series(drawdowns['drawdown'], index=returns.index),
+    }
+
+class RiskEngine:
+    """Rapports de risque mis en cache par (matrice et sa version, début, poids)"""
+
+    def __init__(self, max_cached=64):
+        self._results = ResultCache(max_cached)
+
+    def report(self, matrix_key, start, weights, compute):
+        """Rapport mis en cache ; `compute` n'est appelé qu'en cas d'absence"""
+        return self._results.get_or_run((matrix_key, str(start), weights_key(weights)), compute)
+
+    def clear(self):
+        self._results.clear()
+
+@st.cache_resource
+def get_risk_engine():
+    """Cache des rapports de risque partagé par toutes les sessions"""
+    return RiskEngine()
@@ -0,0 +1,557 @@
+# rolling_metrics.py
+import bisect
+import json
+import os
+import re
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import streamlit as st
+from history_store import HISTORY_DIR, get_history_store
+from fx_service import FALLBACK_RATES, fx_ticker, main_currency, subunit_factor, get_fx_service
+from risk_engine import TRADING_DAYS, BENCHMARK_TICKER, BENCHMARK_CURRENCY
+
+# Séries d'indicateurs persistées à côté des historiques (un dossier par clé, un fichier Feather par mois)
+METRICS_DIR = os.path.join(os.path.dirname(HISTORY_DIR), 'metrics')
+
+# Fenêtres glissantes, en séances
+VOLATILITY_WINDOW = 63
+BETA_WINDOW = 252
+MOVING_AVERAGES = (20, 50, 200)
+
+# Séances nécessaires pour reconstituer l'état glissant depuis la fin d'une série
+STATE_DEPTH = max(VOLATILITY_WINDOW, BETA_WINDOW, *MOVING_AVERAGES)
+
+METRIC_COLUMNS = [
+    'close', 'dividend', 'return', 'benchmark_level', 'benchmark_return',
+    'index', 'running_max', 'drawdown', 'volatility', 'beta'
+] + [f'ma_{window}' for window in MOVING_AVERAGES]
+
+PORTFOLIO_PREFIX = 'portfolio:'
+
+EPOCH = pd.Timestamp('1970-01-01')
+
+def compute_metrics(close, dividends=None, benchmark_level=None):
+    """Indicateurs de toute une série en une passe vectorisée (construction initiale ou reconstruction)
+
+    Rendement total à la Yahoo : cours / (cours précédent - dividende détaché) - 1, identique
+    aux clôtures ajustées du stock d'historiques.
+    """
+    close = close.astype('float64')
+    dividend = dividends.reindex(close.index).fillna(0.0) if dividends is not None \
+        else pd.Series(0.0, index=close.index)
+    bench = benchmark_level.reindex(close.index) if benchmark_level is not None \
+        else pd.Series(np.nan, index=close.index)
+
+    returns = close / (close.shift(1) - dividend) - 1
+    bench_returns = bench / bench.shift(1) - 1
+    index = (1 + returns.fillna(0.0)).cumprod()
+    running_max = index.cummax()
+
+    # Mêmes sommes glissantes que la mise à jour incrémentale (fenêtres complètes uniquement)
+    moments = pd.DataFrame({'r': returns, 'r2': returns ** 2}).rolling(VOLATILITY_WINDOW, min_periods=VOLATILITY_WINDOW).sum()
+    n = VOLATILITY_WINDOW
+    variance = ((moments['r2'] - moments['r'] ** 2 / n) / (n - 1)).clip(lower=0)
+
+    pairs = pd.DataFrame({
+        'x': returns, 'y': bench_returns, 'xy': returns * bench_returns, 'yy': bench_returns ** 2
+    })
+    pairs = pairs.where(returns.notna() & bench_returns.notna())
+    sums = pairs.rolling(BETA_WINDOW, min_periods=BETA_WINDOW).sum()
+    m = BETA_WINDOW
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = (sums['xy'] - sums['x'] * sums['y'] / m) / (sums['yy'] - sums['y'] ** 2 / m)
+
+    metrics = pd.DataFrame({
+        'close': close,
+        'dividend': dividend,
+        'return': returns,
+        'benchmark_level': bench,
+        'benchmark_return': bench_returns,
+        'index': index,
+        'running_max': running_max,
+        'drawdown': index / running_max - 1,
+        'volatility': np.sqrt(variance * TRADING_DAYS),
+        'beta': beta.replace([np.inf, -np.inf], np.nan)
+    })
+    for window in MOVING_AVERAGES:
+        metrics[f'ma_{window}'] = close.rolling(window, min_periods=window).mean()
+    metrics.index.name = 'Date'
+    return metrics[METRIC_COLUMNS]
+
+class RollingSums:
+    """Sommes de termes sur les `window` dernières séances, mises à jour en O(1)"""
+
+    def __init__(self, window, width):
+        self.window = window
+        self.terms = deque()
+        self.sums = [0.0] * width
+
+    @property
+    def full(self):
+        return len(self.terms) == self.window
+
+    def push(self, terms):
+        self.terms.append(terms)
+        for i, term in enumerate(terms):
+            self.sums[i] += term
+        if len(self.terms) > self.window:
+            for i, term in enumerate(self.terms.popleft()):
+                self.sums[i] -= term
+
+class MetricsAccumulator:
+    """État glissant d'une série (valeur ou portefeuille) : chaque nouvelle séance est intégrée en O(1)"""
+
+    def __init__(self):
+        self.last_date = None
+        self.last_close = np.nan
+        self.last_benchmark = np.nan
+        self.level = 1.0
+        self.peak = 1.0
+        self.returns = RollingSums(VOLATILITY_WINDOW, 2)
+        self.pairs = RollingSums(BETA_WINDOW, 5)
+        self.closes = {window: RollingSums(window, 1) for window in MOVING_AVERAGES}
+
+    def _push(self, close, ret, bench_ret):
+        """Ajoute une séance aux fenêtres glissantes"""
+        if not np.isnan(ret):
+            self.returns.push((ret, ret * ret))
+            if np.isnan(bench_ret):
+                self.pairs.push((0.0, 0.0, 0.0, 0.0, 0))
+            else:
+                self.pairs.push((ret, bench_ret, ret * bench_ret, bench_ret * bench_ret, 1))
+        for window in self.closes.values():
+            window.push((close,))
+
+    def update(self, date, close, dividend=0.0, benchmark_level=np.nan):
+        """Intègre une nouvelle séance et retourne sa ligne d'indicateurs"""
+        if self.last_date is None:
+            ret = np.nan
+            self.level = self.peak = 1.0
+        else:
+            ret = close / (self.last_close - dividend) - 1
+            self.level *= 1 + ret
+            self.peak = max(self.peak, self.level)
+        bench_ret = benchmark_level / self.last_benchmark - 1
+        self._push(close, ret, bench_ret)
+        self.last_date, self.last_close, self.last_benchmark = date, close, benchmark_level
+        return self._row(close, dividend, ret, benchmark_level, bench_ret)
+
+    def _row(self, close, dividend, ret, benchmark_level, bench_ret):
+        row = {
+            'close': close,
+            'dividend': dividend,
+            'return': ret,
+            'benchmark_level': benchmark_level,
+            'benchmark_return': bench_ret,
+            'index': self.level,
+            'running_max': self.peak,
+            'drawdown': self.level / self.peak - 1,
+            'volatility': np.nan,
+            'beta': np.nan
+        }
+        if self.returns.full:
+            s, s2 = self.returns.sums
+            n = self.returns.window
+            row['volatility'] = np.sqrt(max((s2 - s * s / n) / (n - 1), 0.0) * TRADING_DAYS)
+        if self.pairs.full and self.pairs.sums[4] == self.pairs.window:
+            sx, sy, sxy, syy, _ = self.pairs.sums
+            m = self.pairs.window
+            variance = syy - sy * sy / m
+            if variance > 0:
+                row['beta'] = (sxy - sx * sy / m) / variance
+        for window, sums in self.closes.items():
+            row[f'ma_{window}'] = sums.sums[0] / window if sums.full else np.nan
+        return row
+
+    @classmethod
+    def from_series(cls, series):
+        """Reconstitue l'état à partir des STATE_DEPTH dernières lignes d'une série persistée"""
+        accumulator = cls()
+        if series is None or series.empty:
+            return accumulator
+        tail = series.iloc[-STATE_DEPTH:]
+        for close, ret, bench_ret in zip(tail['close'], tail['return'], tail['benchmark_return']):
+            accumulator._push(close, ret, bench_ret)
+        last = series.iloc[-1]
+        accumulator.last_date = series.index[-1]
+        accumulator.last_close = last['close']
+        accumulator.last_benchmark = last['benchmark_level']
+        accumulator.level = last['index']
+        accumulator.peak = last['running_max']
+        return accumulator
+
+class RollingMetricsStore:
+    """Indicateurs glissants par ticker et par portefeuille, tenus à jour à chaque ajout de barres"""
+
+    def __init__(self, store=None, root=METRICS_DIR, benchmark=BENCHMARK_TICKER,
+                 benchmark_currency=BENCHMARK_CURRENCY, fx=None):
+        self.store = store or get_history_store()
+        self.root = root
+        self.benchmark = benchmark
+        self.benchmark_currency = benchmark_currency
+        self.fx = fx or get_fx_service()
+        self._accumulators = {}
+        self._currencies = {}
+        self._portfolios = {}
+        self._checked = set()
+        self._lock = threading.RLock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # --- Fichiers ---
+
+    def _path(self, key, extension='.feather'):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9._-]', '_', key) + extension)
+
+    def _segments(self, key, start=None, as_of=False):
+        """Segments mensuels d'une série (chemins triés), à partir du mois de `start`
+
+        as_of : inclut aussi le segment précédent, qui porte la dernière ligne antérieure à `start`.
+        """
+        directory = self._path(key, '')
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(name for name in os.listdir(directory) if name.endswith('.feather'))
+        if start is not None:
+            lo = bisect.bisect_left(names, pd.Timestamp(start).strftime('%Y-%m') + '.feather')
+            names = names[max(lo - 1, 0) if as_of else lo:]
+        return [os.path.join(directory, name) for name in names]
+
+    def _read(self, key, columns=None, start=None, as_of=False):
+        """Lignes de la série à partir de `start` : lecture memory-map des seuls segments concernés
+
+        as_of : la dernière ligne antérieure à `start` est conservée (jointures as-of).
+        """
+        segments = self._segments(key, start, as_of)
+        if not segments:
+            return None
+        if columns is not None:
+            columns = ['Date'] + list(columns)
+        table = pa.concat_tables([feather.read_table(path, columns=columns, memory_map=True) for path in segments])
+        if start is not None:
+            dates = table.column('Date').to_numpy()
+            lo = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), side='left')
+            table = table.slice(max(lo - 1, 0) if as_of else lo)
+        return table.to_pandas()
+
+    def _tail(self, key, n):
+        """Les `n` dernières lignes de la série, lues depuis les derniers segments seulement"""
+        tables, rows = [], 0
+        for path in reversed(self._segments(key)):
+            table = feather.read_table(path, memory_map=True)
+            tables.insert(0, table)
+            rows += table.num_rows
+            if rows >= n:
+                break
+        if not tables:
+            return None
+        return pa.concat_tables(tables).slice(max(rows - n, 0)).to_pandas()
+
+    def _edge_date(self, key, position):
+        segments = self._segments(key)
+        if not segments:
+            return None
+        dates = feather.read_table(segments[position], columns=['Date'], memory_map=True).column('Date')
+        return pd.Timestamp(dates[position].as_py())
+
+    def _first_date(self, key):
+        return self._edge_date(key, 0)
+
+    def _last_date(self, key):
+        return self._edge_date(key, -1)
+
+    def _write_segment(self, path, rows):
+        tmp_path = path + '.tmp'
+        table = pa.Table.from_pandas(rows[METRIC_COLUMNS].astype('float64'), preserve_index=True)
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+    def _append(self, key, rows):
+        """Ajoute des séances postérieures à la série : seuls les segments de leurs mois sont réécrits"""
+        directory = self._path(key, '')
+        os.makedirs(directory, exist_ok=True)
+        rows = rows.rename_axis('Date')
+        for month, month_rows in rows.groupby(rows.index.strftime('%Y-%m')):
+            path = os.path.join(directory, month + '.feather')
+            if os.path.exists(path):
+                month_rows = pd.concat([feather.read_table(path).to_pandas(), month_rows])
+            self._write_segment(path, month_rows)
+
+    def _truncate(self, key, since):
+        """Supprime les séances à partir de `since` (retour arrière avant une correction)"""
+        for path in self._segments(key, since):
+            kept = feather.read_table(path).to_pandas()
+            kept = kept[kept.index < since]
+            if kept.empty:
+                os.remove(path)
+            else:
+                self._write_segment(path, kept)
+
+    def _replace(self, key, series):
+        """Remplace toute la série (construction ou reconstruction vectorisée)"""
+        for path in self._segments(key):
+            os.remove(path)
+        # Ancien format : un seul fichier par clé
+        if os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+        if not series.empty:
+            self._append(key, series)
+
+    # --- Niveaux du benchmark ---
+
+    def _benchmark_levels(self, dates, currency):
+        """Indice de rendement total du benchmark à chaque date (dernier niveau connu), dans `currency`"""
+        if not len(dates):
+            return pd.Series(np.nan, index=dates)
+        bench = self._read(self.benchmark, ['index'], start=dates.min(), as_of=True)
+        if bench is None or bench.empty:
+            return pd.Series(np.nan, index=dates)
+        positions = bench.index.searchsorted(dates, side='right') - 1
+        levels = np.where(positions >= 0, bench['index'].to_numpy()[positions.clip(min=0)], np.nan)
+        if currency != self.benchmark_currency and len(dates):
+            # Taux du service de change, jointure as-of (stock local seulement : appelé depuis un abonné)
+            rates = self.fx.rates_table([self.benchmark_currency, currency],
+                                        dates.min() - pd.Timedelta(days=7), dates.max(), fetch=False)
+            rates = rates.reindex(rates.index.union(dates)).ffill().bfill().reindex(dates)
+            levels = levels * (rates[self.benchmark_currency] / rates[currency]).to_numpy()
+        return pd.Series(levels, index=dates)
+
+    def _ticker_currency(self, ticker):
+        """Devise dans laquelle le benchmark d'un ticker est exprimé (celle de ses cours)"""
+        if ticker not in self._currencies:
+            path = self._path(ticker, '.json')
+            currency = self.benchmark_currency
+            if os.path.exists(path):
+                with open(path) as f:
+                    currency = json.load(f).get('benchmark_currency', currency)
+            self._currencies[ticker] = currency
+        return self._currencies[ticker]
+
+    def _set_ticker_currency(self, ticker, currency):
+        self._currencies[ticker] = currency
+        path = self._path(ticker, '.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'benchmark_currency': currency}, f)
+        os.replace(tmp_path, path)
+
+    def _series_currency(self, key):
+        """Portefeuilles valorisés en EUR ; tickers dans leur devise de cotation"""
+        return 'EUR' if key.startswith(PORTFOLIO_PREFIX) else self._ticker_currency(key)
+
+    # --- Mises à jour ---
+
+    def _extend(self, key, since, frame_after):
+        """Rejoue les séances à partir de `since` ; reconstruction vectorisée si tout l'historique change
+
+        frame_after(date) retourne les séances postérieures à `date` (None : toutes) avec les
+        colonnes close et dividend. Une nouvelle séance coûte O(1) : l'état glissant est gardé
+        en mémoire et seul le segment du mois en cours est réécrit.
+        """
+        first = self._first_date(key)
+        if first is None or since <= first:
+            frame = frame_after(None)
+            if frame.empty:
+                series = pd.DataFrame(columns=METRIC_COLUMNS, dtype='float64')
+            else:
+                benchmark = None if key == self.benchmark else \
+                    self._benchmark_levels(frame.index, self._series_currency(key))
+                series = compute_metrics(frame['close'], frame['dividend'], benchmark)
+            self._accumulators[key] = MetricsAccumulator.from_series(series)
+            self._replace(key, series)
+            return
+
+        last = self._last_date(key)
+        if since <= last:
+            # Correction ou complément d'une séance déjà intégrée : retour à l'état antérieur
+            self._truncate(key, since)
+            last = self._last_date(key)
+            self._accumulators.pop(key, None)
+        accumulator = self._accumulators.get(key)
+        if accumulator is None or accumulator.last_date != last:
+            # Premier accès ou retour arrière : état reconstitué depuis les derniers segments
+            accumulator = MetricsAccumulator.from_series(self._tail(key, STATE_DEPTH))
+            self._accumulators[key] = accumulator
+
+        frame = frame_after(accumulator.last_date)
+        if frame.empty:
+            return
+        benchmark = pd.Series(np.nan, index=frame.index) if key == self.benchmark \
+            else self._benchmark_levels(frame.index, self._series_currency(key))
+        rows = [
+            accumulator.update(date, close, dividend, level)
+            for date, close, dividend, level in zip(frame.index, frame['close'], frame['dividend'], benchmark)
+        ]
+        self._append(key, pd.DataFrame(rows, index=frame.index))
+
+    def _ticker_frame(self, ticker):
+        def frame_after(date):
+            start = EPOCH if date is None else date + pd.Timedelta(days=1)
+            bars = self.store.history(ticker, start, fetch=False)
+            frame = pd.DataFrame({'close': bars['Close'], 'dividend': bars['Dividends'].fillna(0.0)})
+            return frame.dropna(subset=['close']).astype('float64')
+        return frame_after
+
+    def _portfolio_frame(self, name):
+        """Valeur (EUR) et dividendes versés d'un portefeuille aux séances de ses valeurs"""
+        definition = self._portfolios[name]
+
+        def frame_after(date):
+            # Séances postérieures à `date` seulement, plus la dernière antérieure (cours as-of)
+            start = None if date is None else date + pd.Timedelta(days=1)
+            columns = {
+                ticker: self._read(ticker, ['close', 'dividend'], start=start, as_of=True)
+                for ticker in definition['shares']
+            }
+            indexes = [series.index for series in columns.values() if series is not None]
+            if len(indexes) < len(columns):
+                return pd.DataFrame(columns=['close', 'dividend'], dtype='float64')
+            dates = indexes[0].append(indexes[1:]).unique().sort_values()
+            if date is not None:
+                dates = dates[dates > date]
+
+            value = np.zeros(len(dates))
+            dividend = np.zeros(len(dates))
+            for ticker, shares in definition['shares'].items():
+                series = columns[ticker]
+                positions = series.index.searchsorted(dates, side='right') - 1
+                close = np.where(positions >= 0, series['close'].to_numpy()[positions.clip(min=0)], np.nan)
+                rate = self._price_rates(definition['currencies'][ticker], dates)
+                value += shares * close * rate
+                dividend += shares * series['dividend'].reindex(dates).fillna(0.0).to_numpy() * rate
+            # Séances où toutes les positions ont un cours
+            return pd.DataFrame({'close': value, 'dividend': dividend}, index=dates).dropna(subset=['close'])
+        return frame_after
+
+    def _price_rates(self, currency, dates):
+        """Taux EUR d'une devise de cotation aux dates données (sous-unités comprises)"""
+        main = main_currency(currency)
+        factor = subunit_factor(currency)
+        if main == 'EUR' or not len(dates):
+            return np.full(len(dates), factor)
+        rates = self._read(fx_ticker(main), ['close'], start=dates.min(), as_of=True)
+        fallback = FALLBACK_RATES.get(main, np.nan)
+        if rates is None or rates.empty:
+            return np.full(len(dates), fallback * factor)
+        positions = rates.index.searchsorted(dates, side='right') - 1
+        # Avant la première cotation de la paire : premier taux connu
+        values = rates['close'].to_numpy()[positions.clip(min=0)]
+        return values * factor
+
+    def on_bars(self, updates):
+        """Abonné du stock d'historiques : {ticker: première date ajoutée}"""
+        with self._lock:
+            updates = {ticker: pd.Timestamp(since) for ticker, since in updates.items()}
+            benchmark_since = updates.pop(self.benchmark, None)
+            if benchmark_since is not None:
+                self._extend(self.benchmark, benchmark_since, self._ticker_frame(self.benchmark))
+                # Les séances déjà intégrées après cette date ont un niveau de benchmark périmé
+                for ticker in self.store.tickers():
+                    if ticker in updates or ticker == self.benchmark:
+                        continue
+                    last = self._last_date(ticker)
+                    if last is not None and last >= benchmark_since:
+                        updates[ticker] = benchmark_since
+            for ticker, since in updates.items():
+                self._extend(ticker, since, self._ticker_frame(ticker))
+                self._checked.add(ticker)
+
+            if benchmark_since is not None:
+                updates[self.benchmark] = benchmark_since
+            for name, definition in self._portfolios.items():
+                touched = [updates[t] for t in definition['sources'] if t in updates]
+                if touched:
+                    self._extend(name, min(touched), self._portfolio_frame(name))
+
+    def catch_up(self, tickers, currencies=None):
+        """Intègre les barres stockées avant l'abonnement (premier accès dans le processus)
+
+        currencies : devise de cotation par ticker ; un changement reconstruit la série
+        (niveaux du benchmark convertis dans cette devise).
+        """
+        with self._lock:
+            updates = {}
+            for ticker in tickers:
+                currency = (currencies or {}).get(ticker)
+                if currency is not None and main_currency(currency) != self._ticker_currency(ticker):
+                    self._set_ticker_currency(ticker, main_currency(currency))
+                    if self._last_date(ticker) is not None:
+                        updates[ticker] = EPOCH
+                if ticker in self._checked:
+                    continue
+                self._checked.add(ticker)
+                stored = self.store.history(ticker, EPOCH, fetch=False)
+                if stored.empty:
+                    continue
+                last = self._last_date(ticker)
+                if (last is None or last < stored.index[-1]) and ticker not in updates:
+                    updates[ticker] = stored.index[0] if last is None else last
+            if updates:
+                self.on_bars(updates)
+
+    def register_portfolio(self, name, shares, currencies):
+        """Déclare un portefeuille (actions détenues et devises par ticker) ; série reconstruite s'il change"""
+        key = PORTFOLIO_PREFIX + name
+        shares = {ticker: float(n) for ticker, n in dict(shares).items()}
+        currencies = {ticker: str(c) for ticker, c in dict(currencies).items()}
+        sources = set(shares) | {fx_ticker(main_currency(c)) for c in currencies.values()
+                                 if main_currency(c) != 'EUR'} | {self.benchmark, fx_ticker(self.benchmark_currency)}
+        definition = {'shares': shares, 'currencies': currencies, 'sources': sources}
+
+        with self._lock:
+            self.catch_up(sorted(sources), currencies)
+            current = self._portfolios.get(key, {})
+            if current.get('shares') == shares and current.get('currencies') == currencies:
+                return key
+            self._portfolios[key] = definition
+
+            path = self._path(key, '.json')
+            saved = None
+            if os.path.exists(path):
+                with open(path) as f:
+                    saved = json.load(f)
+            # Le benchmark est converti en EUR : les séries persistées sans cette mention sont reconstruites
+            stored = {'shares': shares, 'currencies': currencies, 'benchmark_currency': 'EUR'}
+            if saved != stored or self._last_date(key) is None:
+                self._extend(key, EPOCH, self._portfolio_frame(key))
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(stored, f)
+                os.replace(tmp_path, path)
+            else:
+                # Séances des valeurs postérieures à la dernière ligne persistée
+                self._extend(key, self._last_date(key) + pd.Timedelta(days=1), self._portfolio_frame(key))
+        return key
+
+    # --- Lecture ---
+
+    def series(self, key, start=None, currency=None):
+        """Série d'indicateurs persistée d'un ticker ou d'un portefeuille (lecture memory-map)
+
+        currency : devise de cotation du ticker (bêta mesuré face au benchmark converti).
+        """
+        if not key.startswith(PORTFOLIO_PREFIX):
+            self.catch_up([key], {key: currency} if currency else None)
+        with self._lock:
+            series = self._read(key, start=start)
+        if series is None:
+            return pd.DataFrame(columns=METRIC_COLUMNS, dtype='float64')
+        return series
+
+    def latest(self, key):
+        """Dernière ligne d'indicateurs (None si la série est vide)"""
+        if not key.startswith(PORTFOLIO_PREFIX):
+            self.catch_up([key])
+        with self._lock:
+            tail = self._tail(key, 1)
+        return None if tail is None or tail.empty else tail.iloc[-1]
+
+@st.cache_resource
+def get_rolling_metrics():
+    """Indicateurs glissants partagés, abonnés aux ajouts de barres du stock d'historiques"""
+    metrics = RollingMetricsStore()
+    metrics.store.subscribe(metrics.on_bars)
+    return metrics
@@ -0,0 +1,264 @@
+# scoring.py
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+# Facteurs proposés : colonne -> (libellé, sens, valeurs strictement positives uniquement)
+# Sens +1 : une valeur élevée améliore le score ; -1 : une valeur basse l'améliore
+FACTOR_CATALOG = {
+    'PER_historique': ("PER", -1, True),
+    'Rendement_du_dividende': ("Rendement du dividende", 1, False),
+    'Variation_52_semaines': ("Variation 52 semaines", 1, False),
+    'Ratio_cours_valeur_comptable': ("Cours / valeur comptable", -1, True),
+    'Beta': ("Bêta", -1, False),
+    'Capitalisation_boursiere': ("Capitalisation", 1, True),
+    'Nombre_d_avis_analystes': ("Nombre d'avis d'analystes", 1, False),
+}
+
+NORMALIZATIONS = {
+    "Rang (percentile)": 'rank',
+    "Z-score": 'zscore'
+}
+
+# Bornes des z-scores (limite l'effet des valeurs extrêmes)
+Z_CLIP = 3.0
+
+def make_score_config(factors, method='rank', by_sector=False):
+    """Configuration hashable : facteurs triés (colonne, poids, sens), normalisation, par secteur
+
+    factors : {colonne: poids} ou itérable de (colonne, poids[, sens]) ; le sens par défaut
+    vient du catalogue (+1 pour une colonne hors catalogue).
+    """
+    items = factors.items() if isinstance(factors, dict) else factors
+    normalized = []
+    for item in items:
+        column, weight = item[0], float(item[1])
+        direction = item[2] if len(item) > 2 else FACTOR_CATALOG.get(column, (column, 1, False))[1]
+        if weight > 0:
+            normalized.append((column, weight, int(direction)))
+    if not normalized:
+        raise ValueError("Au moins un facteur de poids positif est requis")
+    if method not in NORMALIZATIONS.values():
+        raise ValueError(f"Normalisation inconnue : {method}")
+    return (tuple(sorted(normalized)), method, bool(by_sector))
+
+# Score historique : PER bas (40 %) et rendement du dividende élevé (60 %), en rangs
+DEFAULT_SCORE_CONFIG = make_score_config({'PER_historique': 0.4, 'Rendement_du_dividende': 0.6})
+
+def factor_values(data, column):
+    """Valeurs numériques d'un facteur ; hors domaine (PER négatif ou nul...) -> manquant"""
+    values = pd.to_numeric(data[column], errors='coerce').to_numpy(dtype='float64', copy=True)
+    if FACTOR_CATALOG.get(column, (column, 1, False))[2]:
+        values = np.where(values > 0, values, np.nan)
+    return values
+
+class FactorState:
+    """Normalisation d'un facteur par groupe, avec structures permettant la mise à jour partielle
+
+    rank : valeurs valides triées par groupe ; zscore : sommes et effectifs par groupe.
+    """
+
+    def __init__(self, values, groups, n_groups, method, direction):
+        self.values = values.copy()
+        self.groups = groups
+        self.n_groups = n_groups
+        self.method = method
+        self.direction = direction
+        self.normalized = np.empty(len(values))
+        self._build()
+        self._normalize(np.ones(len(values), dtype=bool))
+
+    def _build(self):
+        valid = ~np.isnan(self.values)
+        if self.method == 'rank':
+            self.sorted = [np.sort(self.values[valid & (self.groups == g)]) for g in range(self.n_groups)]
+        else:
+            v = np.where(valid, self.values, 0.0)
+            self.count = np.bincount(self.groups, weights=valid.astype('float64'), minlength=self.n_groups)
+            self.total = np.bincount(self.groups, weights=v, minlength=self.n_groups)
+            self.total_sq = np.bincount(self.groups, weights=v * v, minlength=self.n_groups)
+
+    def _normalize(self, mask):
+        """Recalcule la note des lignes sélectionnées à partir des structures de groupe"""
+        values = self.values[mask]
+        groups = self.groups[mask]
+        result = np.full(len(values), np.nan)
+        if self.method == 'rank':
+            # Rang moyen (ex aequo) par recherche dichotomique dans le groupe, en percentile 0-100
+            for g in np.unique(groups):
+                in_group = groups == g
+                ordered = self.sorted[g]
+                v = values[in_group]
+                lo = np.searchsorted(ordered, v, side='left')
+                hi = np.searchsorted(ordered, v, side='right')
+                size = len(ordered)
+                pct = (lo + hi - 1) / 2 / (size - 1) * 100 if size > 1 else np.full(len(v), 50.0)
+                result[in_group] = pct if self.direction > 0 else 100 - pct
+            result = np.where(np.isnan(values), 50.0, result)
+        else:
+            count = self.count[groups]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = self.total[groups] / count
+                std = np.sqrt(np.maximum(self.total_sq[groups] - count * mean ** 2, 0) / (count - 1))
+                z = np.clip((values - mean) / std, -Z_CLIP, Z_CLIP) * self.direction
+            result = np.where(np.isfinite(z), z, 0.0)
+        self.normalized[mask] = result
+
+    def update(self, positions, new_values):
+        """Remplace des valeurs ; seules les lignes des groupes touchés sont renormalisées"""
+        old_values = self.values[positions]
+        groups = self.groups[positions]
+        self.values[positions] = new_values
+        touched = np.unique(groups)
+        if self.method == 'rank':
+            for g in touched:
+                in_group = groups == g
+                ordered = self.sorted[g]
+                removed = old_values[in_group]
+                removed = removed[~np.isnan(removed)]
+                if len(removed):
+                    # Une occurrence retirée par valeur remplacée (décalage pour les ex aequo)
+                    removed = np.sort(removed)
+                    duplicates = np.arange(len(removed)) - np.searchsorted(removed, removed, side='left')
+                    ordered = np.delete(ordered, np.searchsorted(ordered, removed, side='left') + duplicates)
+                added = new_values[in_group]
+                added = np.sort(added[~np.isnan(added)])
+                self.sorted[g] = np.insert(ordered, np.searchsorted(ordered, added), added)
+        else:
+            for values, sign in ((old_values, -1.0), (new_values, 1.0)):
+                valid = ~np.isnan(values)
+                v = np.where(valid, values, 0.0)
+                self.count += sign * np.bincount(groups, weights=valid.astype('float64'), minlength=self.n_groups)
+                self.total += sign * np.bincount(groups, weights=v, minlength=self.n_groups)
+                self.total_sq += sign * np.bincount(groups, weights=v * v, minlength=self.n_groups)
+        self._normalize(np.isin(self.groups, touched))
+
+class ScoreResult:
+    """Notes par facteur et score composite (0-100) d'une configuration"""
+
+    def __init__(self, config, columns, groups, n_groups):
+        self.config = config
+        factors, method, _ = config
+        self.method = method
+        self.weights = np.array([weight for _, weight, _ in factors])
+        self.weights = self.weights / self.weights.sum()
+        self.factors = {
+            column: FactorState(columns[column], groups, n_groups, method, direction)
+            for column, _, direction in factors
+        }
+        self._combine()
+
+    def _combine(self):
+        notes = np.column_stack([state.normalized for state in self.factors.values()])
+        composite = notes @ self.weights
+        # z-scores combinés ramenés sur 0-100 par la loi normale
+        self.score = composite if self.method == 'rank' else 100 * ndtr(composite)
+
+    def update(self, positions, changes):
+        for column, new_values in changes.items():
+            if column in self.factors:
+                self.factors[column].update(positions, new_values)
+        self._combine()
+
+    def notes(self):
+        """Notes par facteur sur 0-100"""
+        return {
+            column: state.normalized if self.method == 'rank' else 100 * ndtr(state.normalized)
+            for column, state in self.factors.items()
+        }
+
+class ScoringEngine:
+    """Scores multi-facteurs de l'univers, évalués en bloc et mis en cache par configuration"""
+
+    def __init__(self, market_data, load_columns=None, max_cached=32):
+        self.tickers = market_data['Ticker'].to_numpy()
+        self.index = market_data.index
+        self.positions = pd.Series(np.arange(len(market_data)), index=market_data['Ticker'])
+        self.positions = self.positions[~self.positions.index.duplicated()]
+        self.sector_codes, self.sectors = pd.factorize(market_data['Secteur'].astype(str))
+        self.market_data = market_data
+        self.load_columns = load_columns
+        self.max_cached = max_cached
+        self._columns = {}
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _column(self, column):
+        """Valeurs d'un facteur, colonnes absentes chargées à la demande"""
+        if column not in self._columns:
+            if column in self.market_data.columns:
+                source = self.market_data
+            elif self.load_columns is not None:
+                source = self.load_columns([column])
+            else:
+                raise KeyError(f"Colonne inconnue : {column}")
+            self._columns[column] = factor_values(source, column)
+        return self._columns[column]
+
+    def result(self, config):
+        """Résultat en cache pour une configuration (évaluation vectorisée sur tout l'univers)"""
+        with self._lock:
+            result = self._cache.get(config)
+            if result is not None:
+                self._cache.move_to_end(config)
+                return result
+
+            factors, _, by_sector = config
+            columns = {column: self._column(column) for column, _, _ in factors}
+            if by_sector:
+                groups, n_groups = self.sector_codes, len(self.sectors)
+            else:
+                groups, n_groups = np.zeros(len(self.tickers), dtype='int64'), 1
+            result = ScoreResult(config, columns, groups, n_groups)
+
+            self._cache[config] = result
+            if len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+            return result
+
+    def scores(self, config):
+        """Score composite aligné sur les données du marché"""
+        return pd.Series(self.result(config).score, index=self.index, name='Score')
+
+    def ranking(self, config, positions=None, n=None):
+        """Tableau trié : ticker, nom, secteur, notes par facteur et score"""
+        result = self.result(config)
+        table = pd.DataFrame({
+            'Ticker': self.tickers,
+            'Nom_complet': self.market_data['Nom_complet'].to_numpy(),
+            'Secteur': self.market_data['Secteur'].astype(str).to_numpy()
+        })
+        for column, notes in result.notes().items():
+            table[FACTOR_CATALOG.get(column, (column,))[0]] = notes
+        table['Score'] = result.score
+        if positions is not None:
+            table = table.iloc[positions]
+        table = table.sort_values('Score', ascending=False)
+        return table.head(n) if n is not None else table
+
+    def update(self, changes):
+        """Nouvelles valeurs de facteurs pour quelques tickers (DataFrame indexé par ticker)
+
+        Les configurations en cache sont mises à jour sur place : seuls les groupes
+        (univers ou secteurs) contenant une valeur modifiée sont renormalisés.
+        """
+        found = self.positions.index.get_indexer(changes.index)
+        changes = changes[found >= 0]
+        if changes.empty:
+            return
+        positions = self.positions.to_numpy()[found[found >= 0]]
+        with self._lock:
+            new_values = {}
+            for column in changes.columns:
+                if column in self._columns:
+                    values = factor_values(changes, column)
+                    self._columns[column][positions] = values
+                    new_values[column] = values
+            for result in self._cache.values():
+                result.update(positions, new_values)
+
+def compute_scores(data, config=DEFAULT_SCORE_CONFIG):
+    """Score composite d'un tableau de marché (sans cache)"""
+    return ScoringEngine(data).scores(config)
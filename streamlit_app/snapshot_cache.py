@@ -0,0 +1,125 @@
+# snapshot_cache.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import yfinance as yf
+import streamlit as st
+
+# Durée de fraîcheur d'un instantané d'entreprise (5 minutes)
+SNAPSHOT_TTL = 300
+
+# Nombre de requêtes simultanées lors du préchauffage
+PREWARM_WORKERS = 8
+
+def fetch_snapshot(ticker):
+    """Instantané d'une entreprise : fiche yfinance et variation sur les deux dernières séances"""
+    stock = yf.Ticker(ticker)
+    info = stock.info if hasattr(stock, 'info') else {}
+    hist = stock.history(period="2d")
+    variation = 0
+    if len(hist) >= 2:
+        variation = ((hist['Close'].iloc[-1] - hist['Close'].iloc[-2]) / hist['Close'].iloc[-2]) * 100
+
+    return {
+        "Nom": info.get("longName", ticker),
+        "Industrie": info.get("industry", "N/A"),
+        "Pays": info.get("country", "N/A"),
+        "Prix actuel": info.get("currentPrice", hist['Close'].iloc[-1] if not hist.empty else "N/A"),
+        "Variation": round(variation, 2),
+        "PER historique": info.get("trailingPE", "N/A"),
+        "BPA historique": info.get("trailingEps", "N/A"),
+        "Rendement dividende": round(info.get("dividendYield", 0) * 100, 2) if info.get("dividendYield") else "N/A",
+        "Plus haut 52 sem.": info.get("fiftyTwoWeekHigh", "N/A"),
+        "Plus bas 52 sem.": info.get("fiftyTwoWeekLow", "N/A"),
+        "Cap. Boursière (Mds)": round(info.get("marketCap", 0) / 1e9, 2) if info.get("marketCap") else "N/A",
+        "Analystes": info.get("numberOfAnalystOpinions", "N/A")
+    }
+
+class SnapshotCache:
+    """Instantanés d'entreprises partagés entre sessions : servis périmés pendant l'actualisation"""
+
+    def __init__(self, fetcher=fetch_snapshot, ttl=SNAPSHOT_TTL):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self._snapshots = {}
+        self._fetched_at = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def age(self, ticker):
+        """Âge de l'instantané en secondes (None s'il n'a jamais été chargé)"""
+        fetched_at = self._fetched_at.get(ticker)
+        if fetched_at is None:
+            return None
+        return (datetime.now() - fetched_at).total_seconds()
+
+    def _load(self, ticker, done):
+        """Une seule requête amont par ticker ; les appels concurrents attendent son résultat"""
+        try:
+            snapshot = self.fetcher(ticker)
+            with self._lock:
+                self._snapshots[ticker] = snapshot
+                self._fetched_at[ticker] = datetime.now()
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._inflight.pop(ticker, None)
+            done.set()
+
+    def _start_load(self, ticker):
+        """Retourne l'événement du chargement en cours, ou en démarre un (coalescence)"""
+        with self._lock:
+            done = self._inflight.get(ticker)
+            if done is not None:
+                return done, False
+            done = threading.Event()
+            self._inflight[ticker] = done
+        return done, True
+
+    def refresh(self, ticker):
+        """Recharge un instantané de façon synchrone (requêtes concurrentes fusionnées)"""
+        done, leader = self._start_load(ticker)
+        if leader:
+            self._load(ticker, done)
+        else:
+            done.wait()
+        return self._snapshots.get(ticker)
+
+    def _refresh_in_background(self, ticker):
+        done, leader = self._start_load(ticker)
+        if leader:
+            threading.Thread(target=self._load, args=(ticker, done), name=f"snapshot-{ticker}", daemon=True).start()
+
+    def get(self, ticker):
+        """Instantané courant : immédiat s'il existe (actualisé en arrière-plan s'il est périmé)"""
+        snapshot = self._snapshots.get(ticker)
+        if snapshot is None:
+            # Premier accès : on attend la requête, partagée avec les autres sessions
+            snapshot = self.refresh(ticker)
+            if snapshot is None:
+                raise LookupError(f"Aucune donnée disponible pour {ticker}")
+            return snapshot
+        if self.age(ticker) > self.ttl:
+            self._refresh_in_background(ticker)
+        return snapshot
+
+    def prewarm(self, tickers, workers=PREWARM_WORKERS):
+        """Charge en arrière-plan les instantanés absents, quelques requêtes à la fois"""
+        missing = [t for t in tickers if t not in self._snapshots]
+
+        def run():
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-prewarm") as pool:
+                list(pool.map(self.refresh, missing))
+
+        thread = threading.Thread(target=run, name="snapshot-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+@st.cache_resource
+def get_snapshot_cache():
+    """Cache d'instantanés unique pour le processus, préchauffé avec les valeurs suivies"""
+    from stock_analyzer import TRACKED_COMPANIES
+    cache = SnapshotCache()
+    cache.prewarm(TRACKED_COMPANIES.values())
+    return cache
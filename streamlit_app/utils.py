@@ -2,35 +2,12 @@ import pandas as pd
 import yfinance as yf
 import streamlit as st
 import numpy as np
+from fx_service import get_fx_service, main_currency
+from scoring import compute_scores, DEFAULT_SCORE_CONFIG
 
 def get_exchange_rates():
-    """Taux de change par rapport à l'EUR"""
-    return {
-        'EUR': 1.0,
-        'USD': 0.93,
-        'KRW': 0.000696,
-        'JPY': 0.00622,
-        'GBP': 1.17,
-        'CHF': 1.07,
-        'CNY': 0.129,
-        'HKD': 0.119,
-        'TWD': 0.0295,
-        'SGD': 0.69,
-        'BRL': 0.186,
-        'CAD': 0.69,
-        'AUD': 0.605,
-        'INR': 0.0112,
-        'ZAR': 0.049,
-    }
-
-def normalize_metric(series, reverse=False):
-    """Normalise une série de données entre 0 et 100"""
-    min_val = series.min()
-    max_val = series.max()
-    if max_val == min_val:
-        return series * 0
-    normalized = (series - min_val) / (max_val - min_val) * 100
-    return 100 - normalized if reverse else normalized
+    """Taux de change par rapport à l'EUR (derniers cours du service de change)"""
+    return get_fx_service().latest_rates()
 
 def prepare_market_data(df):
     """Prépare les données du marché"""
@@ -38,12 +15,12 @@ def prepare_market_data(df):
     exchange_rates = get_exchange_rates()
     
     # Conversion des capitalisations
+    # (les capitalisations des titres cotés en pence sont publiées en livres : devise principale)
     df['Capitalisation_origine'] = df['Capitalisation_boursiere']
-    for index, row in df.iterrows():
-        if pd.notna(row['Devise']) and row['Devise'] in exchange_rates:
-            if pd.notna(row['Capitalisation_boursiere']):
-                if row['Devise'] != 'EUR':
-                    df.at[index, 'Capitalisation_boursiere'] = row['Capitalisation_boursiere'] * exchange_rates[row['Devise']]
+    rates = df['Devise'].map(main_currency).map(exchange_rates)
+    df['Capitalisation_boursiere'] = df['Capitalisation_boursiere'].where(
+        rates.isna(), df['Capitalisation_boursiere'] * rates
+    )
     
     # Nettoyage des colonnes numériques
     numeric_columns = {
@@ -76,31 +53,72 @@ def prepare_market_data(df):
     df['Nom_complet'] = df['Nom_complet'].fillna(df['Ticker'])
     df['Nom_complet'] = df['Nom_complet'].str.strip()
     
-    # Calcul du score composite
-    df['PER_norm'] = normalize_metric(df['PER_historique'].clip(0, 100), reverse=True)
-    df['Rendement_norm'] = normalize_metric(df['Rendement_du_dividende'].clip(0, 15))
-    df['Score'] = (
-        df['PER_norm'] * 0.4 +
-        df['Rendement_norm'] * 0.6
-    )
-    
     # Filtrage et tri
     df = df[df['Capitalisation_boursiere'] > 0]
     df = df.sort_values('Capitalisation_boursiere', ascending=False)
     
+    # Score composite par défaut (rangs PER / rendement), calculé sur l'univers retenu
+    df['Score'] = compute_scores(df, DEFAULT_SCORE_CONFIG)
+    
+    return df
+
+# Colonnes utilisées par les pages, chargées immédiatement en mode compact
+MARKET_COLUMNS = [
+    'Ticker', 'Nom_complet', 'Secteur', 'Industrie', 'Pays', 'Bourse', 'Devise',
+    'Prix_actuel', 'Capitalisation_boursiere', 'Volume', 'PER_historique',
+    'Rendement_du_dividende', 'Variation_52_semaines', 'Ratio_cours_valeur_comptable',
+    'Nombre_d_avis_analystes', 'Recommandation_cle', 'Beta'
+]
+
+# Dimensions textuelles répétées pour chaque ticker
+CATEGORY_COLUMNS = ['Secteur', 'Industrie', 'Pays', 'Bourse', 'Devise', 'Recommandation_cle']
+
+# Montants dont l'ordre de grandeur dépasse la précision du float32
+FLOAT64_COLUMNS = ['Capitalisation_boursiere', 'Capitalisation_origine', 'Volume']
+
+def compact_market_data(df):
+    """Réduit l'empreinte mémoire : catégories pour les dimensions, float32 pour les ratios"""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    float_columns = df.select_dtypes('float64').columns.difference(FLOAT64_COLUMNS)
+    df[float_columns] = df[float_columns].astype('float32')
     return df
 
+def memory_report(df):
+    """Occupation mémoire par colonne, triée par taille décroissante"""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Type': df.dtypes.astype(str),
+        'Octets': usage
+    })
+    report['Part (%)'] = report['Octets'] / report['Octets'].sum() * 100
+    return report.sort_values('Octets', ascending=False)
+
+def format_age(seconds):
+    """Âge lisible d'une donnée (ex. « il y a 3 min »)"""
+    if seconds is None:
+        return "en attente de la première actualisation"
+    if seconds < 60:
+        return "il y a moins d'une minute"
+    if seconds < 3600:
+        return f"il y a {int(seconds // 60)} min"
+    return f"il y a {int(seconds // 3600)} h {int(seconds % 3600 // 60):02d}"
+
 def initialize_ticker_data():
-    """Initialise les données du ticker une seule fois par session"""
-    if 'ticker_data' not in st.session_state:
-        from stock_analyzer import StockAnalyzer
-        analyzer = StockAnalyzer()
-        st.session_state.ticker_data = analyzer.get_ticker_prices()
+    """Éléments du bandeau issus de l'instantané de cotations partagé entre sessions"""
+    from stock_analyzer import get_ticker_band
+    from snapshot_cache import get_snapshot_cache
+    # Premier affichage du processus : lance aussi le préchauffage des fiches entreprises
+    get_snapshot_cache()
+    return get_ticker_band()
 
 def add_news_ticker():
     """Ajoute le bandeau de news à la page en utilisant les données en cache"""
-    # S'assure que les données sont initialisées
-    initialize_ticker_data()
+    # Instantané partagé : aucune requête réseau bloquante une fois le processus démarré
+    ticker_data = initialize_ticker_data()
     
     # Styles CSS pour le bandeau
     st.markdown("""
@@ -133,7 +151,7 @@ def add_news_ticker():
     """, unsafe_allow_html=True)
     
     # Affichage du bandeau avec les données en cache
-    ticker_html = ' '.join([f"<span>{item}</span>" for item in st.session_state.ticker_data])
+    ticker_html = ' '.join([f"<span>{item}</span>" for item in ticker_data])
     st.markdown(f"""
     <div class="ticker-container">
         <div class="ticker-item">
@@ -141,6 +159,9 @@ def add_news_ticker():
         </div>
     </div>
     """, unsafe_allow_html=True)
+    
+    from quote_service import get_quote_service
+    st.caption(f"Cours actualisés {format_age(get_quote_service().age)}")
 
 def render_footer():
     st.markdown("---")